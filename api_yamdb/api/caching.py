@@ -0,0 +1,105 @@
+import logging
+import threading
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import permissions
+
+from .snapshots import schedule_snapshots
+
+logger = logging.getLogger(__name__)
+
+CACHEABLE_STATUSES = (200, 404)
+
+SURROGATE_KEY_URLS = {
+    'categories': '/api/v1/categories/',
+    'genres': '/api/v1/genres/',
+    'titles': '/api/v1/titles/',
+    'title': '/api/v1/titles/{pk}/',
+}
+
+
+class SurrogateKeyMixin:
+    """
+    Заголовки для кеширования ответов каталога на nginx.
+
+    Анонимные GET-запросы получают Cache-Control: public и Surrogate-Key
+    с ключами, по которым ответ сбрасывается при изменении данных.
+    Ответы авторизованным пользователям не кешируются.
+    """
+
+    surrogate_list_key = None
+    surrogate_detail_key = None
+
+    def get_surrogate_keys(self):
+        if self.detail:
+            pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            return [f'{self.surrogate_detail_key}-{pk}']
+        return [self.surrogate_list_key]
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        response['Vary'] = 'Authorization'
+        if (
+            request.method in permissions.SAFE_METHODS
+            and not request.user.is_authenticated
+            and response.status_code in CACHEABLE_STATUSES
+        ):
+            response['Cache-Control'] = (
+                f'public, max-age={settings.CATALOG_CACHE_MAX_AGE}'
+            )
+            response['Surrogate-Key'] = ' '.join(self.get_surrogate_keys())
+        else:
+            response['Cache-Control'] = 'private, no-store'
+        return response
+
+
+def get_surrogate_key_urls(keys):
+    urls = []
+    for key in keys:
+        name, _, pk = key.partition('-')
+        if name in SURROGATE_KEY_URLS:
+            urls.append(SURROGATE_KEY_URLS[name].format(pk=pk))
+    return urls
+
+
+def refresh_urls(urls):
+    """
+    Перезапрос адресов через служебный server nginx, который всегда
+    идет в приложение и перезаписывает запись кеша. Host - публичный,
+    иначе ссылки next/previous в кеше вели бы на служебный адрес.
+    """
+    host = urlsplit(settings.PUBLIC_BASE_URL).netloc
+    for url in urls:
+        request = Request(
+            settings.CACHE_REFRESH_URL + url, headers={'Host': host}
+        )
+        try:
+            urlopen(request, timeout=5).close()
+        except HTTPError as error:
+            error.close()
+        except (URLError, OSError) as error:
+            logger.warning('Cache refresh of %s failed: %s', url, error)
+
+
+def purge_surrogate_keys(keys):
+    """
+    Сброс кеша nginx по ключам после фиксации транзакции
+    и перерисовка снимков каталога этих ключей.
+    """
+    schedule_snapshots(keys)
+    if not settings.CACHE_REFRESH_URL:
+        return
+    urls = get_surrogate_key_urls(keys)
+
+    def start_refresh():
+        threading.Thread(
+            target=refresh_urls, args=(urls,), daemon=True
+        ).start()
+
+    transaction.on_commit(start_refresh)
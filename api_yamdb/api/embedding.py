@@ -0,0 +1,103 @@
+"""
+Отзывы и комментарии в ответе /titles/{id}/?include=reviews,comments.
+
+include=reviews добавляет первые TITLE_EMBEDDED_REVIEWS отзывов,
+include=reviews,comments - еще и первые TITLE_EMBEDDED_COMMENTS
+комментариев каждого из них. Число запросов не зависит от числа
+отзывов: один запрос на отзывы и один на комментарии всех отзывов.
+Ссылка next продолжает список параметром ?after=<id последнего>.
+"""
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from django.urls import reverse
+from rest_framework.utils.urls import replace_query_param
+from reviews.models import Comment, Review
+
+from .serializers import CommentSerializer, ReviewSerializer
+from .utils import AFTER_QUERY_PARAM
+
+
+def get_next_link(request, url_name, url_kwargs, rows, has_next):
+    if not has_next:
+        return None
+    url = request.build_absolute_uri(reverse(url_name, kwargs=url_kwargs))
+    return replace_query_param(url, AFTER_QUERY_PARAM, rows[-1].pk)
+
+
+def get_first_comments(review_ids, size):
+    """
+    Первые size комментариев каждого отзыва одним запросом.
+    Номер комментария внутри отзыва считает оконная функция.
+    """
+    numbered = Comment.objects.filter(review_id__in=review_ids).annotate(
+        row_number=Window(
+            RowNumber(),
+            partition_by=[F('review_id')],
+            order_by=F('id').asc()
+        )
+    ).values('id', 'row_number')
+    sql, params = numbered.query.sql_with_params()
+    first_ids = RawSQL(
+        f'SELECT id FROM ({sql}) numbered WHERE row_number <= %s',
+        (*params, size)
+    )
+    comments = {}
+    for comment in Comment.objects.filter(id__in=first_ids).select_related(
+        'author'
+    ).order_by('id'):
+        comments.setdefault(comment.review_id, []).append(comment)
+    return comments
+
+
+def get_embedded_comments(review, comments, request):
+    size = settings.TITLE_EMBEDDED_COMMENTS
+    page = comments[:size]
+    for comment in page:
+        comment.review = review
+    url_kwargs = {'title_id': review.title_id, 'review_id': review.pk}
+    return {
+        'next': get_next_link(
+            request, 'api:comments-list', url_kwargs,
+            page, len(comments) > size
+        ),
+        'results': CommentSerializer(
+            page, many=True, context={'request': request}
+        ).data,
+    }
+
+
+def get_embedded_reviews(title, request, with_comments=False):
+    """
+    Блок reviews ответа: {'next': ..., 'results': [...]}.
+    Строк выбирается на одну больше размера, чтобы узнать о следующих.
+    """
+    size = settings.TITLE_EMBEDDED_REVIEWS
+    rows = list(
+        Review.objects.filter(title=title).select_related(
+            'author'
+        ).order_by('id')[:size + 1]
+    )
+    reviews = rows[:size]
+    for review in reviews:
+        review.title = title
+    results = ReviewSerializer(
+        reviews, many=True, context={'request': request}
+    ).data
+    if with_comments and reviews:
+        comments = get_first_comments(
+            [review.pk for review in reviews],
+            settings.TITLE_EMBEDDED_COMMENTS + 1
+        )
+        for review, data in zip(reviews, results):
+            data['comments'] = get_embedded_comments(
+                review, comments.get(review.pk, []), request
+            )
+    return {
+        'next': get_next_link(
+            request, 'api:reviews-list', {'title_id': title.pk},
+            reviews, len(rows) > size
+        ),
+        'results': results,
+    }
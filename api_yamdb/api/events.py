@@ -0,0 +1,286 @@
+"""
+События изменения отзывов и комментариев для потока /titles/{id}/events/.
+
+Сохранение (сигнал post_save) и удаление через API публикуют сообщение
+после фиксации транзакции через бэкенд EVENTS_BACKEND. Обработчик
+post_delete для комментариев не подключается: он отключил бы быстрое
+каскадное удаление. События deleted для комментариев удаленного отзыва
+и для объектов массовой модерации и фонового удаления строит
+get_deleted_messages по id.
+
+Бэкенды:
+
+- LocalBackend - доставка в брокер того же процесса (runserver,
+  один ASGI-процесс, обслуживающий и запись);
+- PostgresBackend - pg_notify в канал EVENTS_CHANNEL; ASGI-процесс
+  слушает канал (LISTEN) в отдельном потоке.
+
+Брокер ASGI-процесса нумерует события, хранит последние
+EVENTS_BUFFER_SIZE для продолжения потока по Last-Event-ID и раздает
+их подписчикам произведения.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from collections import defaultdict, deque, namedtuple
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils.module_loading import import_string
+from reviews.models import Comment, Review
+
+from .serializers import CommentSerializer, ReviewSerializer
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_PAYLOAD_LIMIT = 7900
+LISTEN_TIMEOUT = 60
+RECONNECT_DELAY = 5
+
+Event = namedtuple('Event', ('id', 'seq', 'title_id', 'type', 'data'))
+
+
+class Subscription:
+    """Очередь событий одного клиента."""
+
+    def __init__(self, title_id):
+        self.title_id = title_id
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self.closed = asyncio.Event()
+
+    def put(self, event):
+        """
+        Переполненная очередь закрывает поток: клиент переподключится
+        и получит пропущенное по Last-Event-ID.
+        """
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.closed.set()
+
+
+class EventBroker:
+    """
+    Брокер событий процесса. Идентификатор события - '<boot>.<seq>':
+    boot меняется при запуске процесса и переподключении к бэкенду,
+    после чего продолжить поток по старому идентификатору нельзя.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.boot = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.buffer = deque(maxlen=settings.EVENTS_BUFFER_SIZE)
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, title_id):
+        subscription = Subscription(title_id)
+        self.subscriptions[title_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self.subscriptions[subscription.title_id]
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self.subscriptions[subscription.title_id]
+
+    def dispatch(self, message):
+        self.seq += 1
+        event = Event(
+            f'{self.boot}.{self.seq}', self.seq,
+            message['title'], message['event'], message['data']
+        )
+        self.buffer.append(event)
+        for subscription in self.subscriptions.get(event.title_id, ()):
+            subscription.put(event)
+
+    def dispatch_threadsafe(self, message):
+        self.loop.call_soon_threadsafe(self.dispatch, message)
+
+    def restart(self):
+        """
+        События могли быть пропущены: новый boot и закрытие потоков,
+        клиенты переподключатся и получат reset.
+        """
+        self.boot = uuid.uuid4().hex[:8]
+        self.buffer.clear()
+        for subscriptions in self.subscriptions.values():
+            for subscription in subscriptions:
+                subscription.closed.set()
+
+    def replay(self, title_id, last_event_id):
+        """
+        События произведения после last_event_id или None,
+        если продолжить с него нельзя.
+        """
+        boot, _, seq = last_event_id.partition('.')
+        if boot != self.boot or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if self.buffer and seq < self.buffer[0].seq - 1:
+            return None
+        return [
+            event for event in self.buffer
+            if event.seq > seq and event.title_id == title_id
+        ]
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_backend():
+    return import_string(settings.EVENTS_BACKEND)()
+
+
+def get_broker():
+    """Брокер процесса; создается в цикле событий ASGI-сервера."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = EventBroker(asyncio.get_event_loop())
+            get_backend().start(_broker)
+    return _broker
+
+
+class LocalBackend:
+    """Доставка событий в брокер текущего процесса."""
+
+    def send(self, message):
+        if _broker is not None:
+            _broker.dispatch_threadsafe(message)
+
+    def start(self, broker):
+        pass
+
+
+class PostgresBackend:
+    """Доставка событий между процессами через LISTEN/NOTIFY."""
+
+    def send(self, message):
+        payload = json.dumps(message, default=str)
+        if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            # Большой текст не влезает в уведомление: клиент получит
+            # только id и запросит объект сам.
+            payload = json.dumps(
+                dict(message, data={'id': message['data']['id']})
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)',
+                [settings.EVENTS_CHANNEL, payload]
+            )
+
+    def start(self, broker):
+        threading.Thread(
+            target=self.listen, args=(broker,), daemon=True
+        ).start()
+
+    def listen(self, broker):
+        wrapper = connections['default']
+        restart = False
+        while True:
+            db = None
+            try:
+                db = wrapper.get_new_connection(
+                    wrapper.get_connection_params()
+                )
+                db.autocommit = True
+                with db.cursor() as cursor:
+                    cursor.execute(f'LISTEN {settings.EVENTS_CHANNEL}')
+                if restart:
+                    broker.loop.call_soon_threadsafe(broker.restart)
+                restart = True
+                self.receive(db, broker)
+            except (wrapper.Database.Error, OSError) as error:
+                logger.warning('Events listener failed: %s', error)
+                if db is not None:
+                    db.close()
+                time.sleep(RECONNECT_DELAY)
+
+    def receive(self, db, broker):
+        while True:
+            if select.select([db], [], [], LISTEN_TIMEOUT) == ([], [], []):
+                continue
+            db.poll()
+            while db.notifies:
+                notify = db.notifies.pop(0)
+                broker.dispatch_threadsafe(json.loads(notify.payload))
+
+
+def get_event_message(instance, action):
+    if isinstance(instance, Review):
+        name, title_id = 'review', instance.title_id
+        data = {'id': instance.pk}
+        serializer_class = ReviewSerializer
+    else:
+        name, title_id = 'comment', instance.review.title_id
+        data = {'id': instance.pk, 'review': instance.review_id}
+        serializer_class = CommentSerializer
+    if action != 'deleted':
+        data = serializer_class(instance).data
+    return {'title': title_id, 'event': f'{name}.{action}', 'data': data}
+
+
+def get_deleted_messages(model, ids, with_comments=False):
+    """
+    События deleted для не скрытых модераторами объектов из ids без
+    загрузки объектов; with_comments - и для комментариев отзывов из ids.
+    Объекты удаляемых авторов включаются: открытые потоки узнают о них
+    только при фоновом удалении. Читаются до удаления или скрытия.
+    """
+    messages = []
+    if model is Review:
+        messages += [
+            {'title': title_id, 'event': 'review.deleted',
+             'data': {'id': pk}}
+            for pk, title_id in Review.all_objects.filter(
+                pk__in=ids, is_hidden=False
+            ).values_list('pk', 'title_id')
+        ]
+        if not with_comments:
+            return messages
+        comments = Comment.all_objects.filter(review_id__in=ids)
+    else:
+        comments = Comment.all_objects.filter(pk__in=ids)
+    messages += [
+        {'title': title_id, 'event': 'comment.deleted',
+         'data': {'id': pk, 'review': review_id}}
+        for pk, review_id, title_id in comments.filter(
+            is_hidden=False
+        ).values_list(
+            'pk', 'review_id', 'review__title_id'
+        )
+    ]
+    return messages
+
+
+def publish_messages(messages):
+    """
+    Отправка событий после фиксации транзакции; события одной
+    транзакции отправляются вместе.
+    """
+    if not messages:
+        return
+    backend = get_backend()
+
+    def send():
+        with transaction.atomic():
+            for message in messages:
+                backend.send(message)
+
+    transaction.on_commit(send)
+
+
+def publish_change(instance, action):
+    """
+    Публикация события после фиксации транзакции.
+    Скрытый модератором объект для клиентов удален.
+    """
+    if instance.is_hidden:
+        action = 'deleted'
+    publish_messages([get_event_message(instance, action)])
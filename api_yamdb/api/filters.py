@@ -1,5 +1,14 @@
 from django_filters import rest_framework as filters
-from reviews.models import Title
+from reviews.models import Comment, Genre, Review, Title
+from reviews.search import search_texts
+from reviews.slugs import get_slug_lookup
+
+GENRE_MODE_ALL = 'all'
+GENRE_MODE_ANY = 'any'
+GENRE_MODES = (
+    (GENRE_MODE_ALL, 'Все жанры'),
+    (GENRE_MODE_ANY, 'Любой из жанров'),
+)
 
 
 class TitleFilter(filters.FilterSet):
@@ -11,15 +20,64 @@ class TitleFilter(filters.FilterSet):
         field_name='category__slug',
         lookup_expr='icontains'
     )
-    genre = filters.CharFilter(
-        field_name='genre__slug',
-        lookup_expr='icontains'
-    )
-    year = filters.NumberFilter(
-        field_name='year',
-        lookup_expr='icontains'
+    genre = filters.CharFilter(method='filter_genre')
+    genre_mode = filters.ChoiceFilter(
+        choices=GENRE_MODES,
+        method='filter_genre_mode'
     )
+    year = filters.NumberFilter(field_name='year')
 
     class Meta:
         model = Title
-        fields = ['name', 'category', 'genre', 'year']
+        fields = ['name', 'category', 'genre', 'genre_mode', 'year']
+
+    def filter_genre(self, queryset, name, value):
+        """
+        ?genre=drama,comedy - произведения со всеми (genre_mode=all)
+        или любым (genre_mode=any, по умолчанию) из жанров.
+        Проверяется колонка genre_ids, без JOIN с жанрами;
+        id жанров берутся из кеша reviews.slugs.
+        """
+        slugs = {slug.strip() for slug in value.split(',') if slug.strip()}
+        if not slugs:
+            return queryset
+        genre_ids = list(get_slug_lookup(Genre).resolve(slugs).values())
+        mode = self.form.cleaned_data.get('genre_mode') or GENRE_MODE_ANY
+        if mode == GENRE_MODE_ALL:
+            if len(genre_ids) < len(slugs):
+                return queryset.none()
+            return queryset.filter(genre_ids__all=genre_ids)
+        return queryset.filter(genre_ids__any=genre_ids)
+
+    def filter_genre_mode(self, queryset, name, value):
+        return queryset
+
+
+class ReviewSearchFilter(filters.FilterSet):
+    q = filters.CharFilter(method='filter_text')
+    title = filters.NumberFilter(field_name='title_id')
+    author = filters.CharFilter(field_name='author__username')
+    date_from = filters.DateTimeFilter(
+        field_name='pub_date',
+        lookup_expr='gte'
+    )
+    date_to = filters.DateTimeFilter(
+        field_name='pub_date',
+        lookup_expr='lte'
+    )
+
+    class Meta:
+        model = Review
+        fields = ['q', 'title', 'author', 'date_from', 'date_to']
+
+    def filter_text(self, queryset, name, value):
+        return search_texts(queryset, value)
+
+
+class CommentSearchFilter(ReviewSearchFilter):
+    title = filters.NumberFilter(field_name='review__title_id')
+    review = filters.NumberFilter(field_name='review_id')
+
+    class Meta:
+        model = Comment
+        fields = ['q', 'title', 'review', 'author', 'date_from', 'date_to']
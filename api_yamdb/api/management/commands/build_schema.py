@@ -0,0 +1,31 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api_yamdb.schema import SCHEMA_FILE_NAME, SCHEMA_FORMATS, render_schema
+
+
+class Command(BaseCommand):
+    help = 'Сборка OpenAPI-схемы в статические файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-dir',
+            default=settings.API_SCHEMA_DIR,
+            help='Каталог для файлов схемы'
+        )
+
+    def handle(self, *args, **options):
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+        for format in SCHEMA_FORMATS:
+            path = os.path.join(
+                output_dir, SCHEMA_FILE_NAME.format(format=format)
+            )
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'wb') as schema_file:
+                schema_file.write(render_schema(format))
+            os.replace(tmp_path, path)
+            self.stdout.write(f'Схема записана в {path}')
+        self.stdout.write(self.style.SUCCESS('Схема собрана.'))
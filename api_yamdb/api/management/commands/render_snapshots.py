@@ -0,0 +1,22 @@
+from api.snapshots import get_all_keys, is_snapshot_key, render_key
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Снимки каталога в статических файлах для nginx'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'keys', nargs='*',
+            help='Ключи кеша (titles, title-1); по умолчанию все'
+        )
+
+    def handle(self, *args, **options):
+        keys = options['keys'] or get_all_keys()
+        unknown = [key for key in keys if not is_snapshot_key(key)]
+        if unknown:
+            raise CommandError(f'Неизвестные ключи: {", ".join(unknown)}')
+        written = sum(render_key(key) for key in keys)
+        self.stdout.write(self.style.SUCCESS(
+            f'Записано снимков: {written}, ключей: {len(keys)}.'
+        ))
@@ -1,4 +1,7 @@
+from django.conf import settings
 from rest_framework import mixins, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 
 
 class CustomMixinSet(mixins.CreateModelMixin,
@@ -6,3 +9,58 @@ class CustomMixinSet(mixins.CreateModelMixin,
                      mixins.ListModelMixin,
                      viewsets.GenericViewSet,):
     pass
+
+
+class BatchGetMixin:
+    """
+    Пакетное получение объектов списка: ?ids=1,2,3.
+
+    Объекты выбираются одним запросом через in_bulk и возвращаются
+    без пагинации в запрошенном порядке, ненайденные ключи - в поле
+    missing. Ключей в запросе не больше BATCH_GET_MAX_SIZE.
+    """
+
+    batch_query_param = 'ids'
+    batch_field = 'pk'
+    batch_key_type = int
+
+    def get_batch_keys(self, value):
+        keys = []
+        for key in value.split(','):
+            key = key.strip()
+            if not key:
+                continue
+            try:
+                key = self.batch_key_type(key)
+            except ValueError:
+                raise ValidationError(
+                    {self.batch_query_param: f'Некорректный ключ: {key}.'}
+                )
+            if key not in keys:
+                keys.append(key)
+        if len(keys) > settings.BATCH_GET_MAX_SIZE:
+            raise ValidationError({
+                self.batch_query_param: 'Не больше {} ключей.'.format(
+                    settings.BATCH_GET_MAX_SIZE
+                )
+            })
+        return keys
+
+    def get_batch_queryset(self):
+        return self.get_queryset()
+
+    def list(self, request, *args, **kwargs):
+        value = request.query_params.get(self.batch_query_param)
+        if value is None:
+            return super().list(request, *args, **kwargs)
+        keys = self.get_batch_keys(value)
+        found = self.get_batch_queryset().in_bulk(
+            keys, field_name=self.batch_field
+        )
+        serializer = self.get_serializer(
+            [found[key] for key in keys if key in found], many=True
+        )
+        return Response({
+            'results': serializer.data,
+            'missing': [key for key in keys if key not in found],
+        })
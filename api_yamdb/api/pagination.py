@@ -0,0 +1,280 @@
+from collections import OrderedDict
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       LimitOffsetPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATED = 'estimated'
+COUNT_NONE = 'none'
+COUNT_MODES = (COUNT_EXACT, COUNT_ESTIMATED, COUNT_NONE)
+
+
+class CountModeMixin:
+    """
+    Выбор способа подсчёта общего количества объектов в выдаче.
+
+    - exact: точный COUNT(*) по отфильтрованной выборке;
+    - estimated: оценка планировщика для запросов без фильтров
+      и закешированный на count_cache_timeout секунд COUNT(*) для остальных;
+    - none: поле count не возвращается, наличие следующей страницы
+      определяется выборкой на одну строку больше размера страницы.
+
+    Режим по умолчанию задается атрибутом вьюсета pagination_count_mode,
+    клиент может переопределить его параметром запроса ?count=.
+    """
+
+    count_mode = COUNT_EXACT
+    count_mode_query_param = 'count'
+    count_cache_timeout = 60
+
+    def get_count_mode(self, request, view=None):
+        mode = request.query_params.get(self.count_mode_query_param)
+        if mode in COUNT_MODES:
+            return mode
+        return getattr(view, 'pagination_count_mode', self.count_mode)
+
+    def get_planner_count(self, queryset):
+        """Оценка числа строк таблицы по статистике Postgres."""
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] <= 0:
+            return None
+        return row[0]
+
+    def is_unfiltered(self, queryset):
+        """
+        Выборка без фильтров, кроме фильтра менеджера по умолчанию
+        (is_deleted=False): ее оценивает статистика таблицы, строки,
+        помеченные удаленными, дают небольшую погрешность.
+        """
+        base_where = queryset.model._default_manager.all().query.where
+        return (
+            queryset.query.where == base_where
+            and not queryset.query.distinct
+        )
+
+    def get_estimated_count(self, queryset):
+        if self.is_unfiltered(queryset):
+            count = self.get_planner_count(queryset)
+            if count is not None:
+                return count
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = 'pagination-count:{}'.format(
+            md5(f'{queryset.db}:{sql}:{params}'.encode()).hexdigest()
+        )
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    def slice_queryset(self, queryset, offset, size):
+        """Возвращает строки страницы и признак наличия следующей."""
+        rows = list(queryset[offset:offset + size + 1])
+        return rows[:size], len(rows) > size
+
+    def get_count_mode_response(self, count, data):
+        fields = [
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]
+        if self.mode != COUNT_NONE:
+            fields.insert(0, ('count', count))
+        return Response(OrderedDict(fields))
+
+
+class CountModeLimitOffsetPagination(CountModeMixin, LimitOffsetPagination):
+    """LimitOffsetPagination с выбором режима подсчёта count."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.mode = self.get_count_mode(request, view)
+        self.has_next = None
+        if self.mode == COUNT_EXACT:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        results, self.has_next = self.slice_queryset(
+            queryset, self.offset, self.limit
+        )
+        self.count = None
+        if self.mode == COUNT_ESTIMATED:
+            self.count = self.get_estimated_count(queryset)
+        return results
+
+    def get_next_link(self):
+        if self.has_next is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_paginated_response(self, data):
+        return self.get_count_mode_response(self.count, data)
+
+
+class CountModePageNumberPagination(CountModeMixin, PageNumberPagination):
+    """PageNumberPagination с выбором режима подсчёта count."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.mode = self.get_count_mode(request, view)
+        self.has_next = None
+        if self.mode == COUNT_EXACT:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        page_number = request.query_params.get(self.page_query_param, 1)
+        try:
+            self.page_number = int(page_number)
+            if self.page_number < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message='Invalid page number.'
+            ))
+
+        self.request = request
+        results, self.has_next = self.slice_queryset(
+            queryset, (self.page_number - 1) * page_size, page_size
+        )
+        if not results and self.page_number > 1:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number,
+                message='That page contains no results'
+            ))
+        self.count = None
+        if self.mode == COUNT_ESTIMATED:
+            self.count = self.get_estimated_count(queryset)
+        return results
+
+    def get_next_link(self):
+        if self.has_next is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.page_query_param, self.page_number + 1
+        )
+
+    def get_previous_link(self):
+        if self.has_next is None:
+            return super().get_previous_link()
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.page_query_param, self.page_number - 1
+        )
+
+    def get_paginated_response(self, data):
+        if self.has_next is None:
+            return self.get_count_mode_response(
+                self.page.paginator.count, data
+            )
+        return self.get_count_mode_response(self.count, data)
+
+
+class ActivityCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация лент отзывов и комментариев пользователя:
+    страница выбирается условием по pub_date с использованием индекса
+    (author, pub_date), без OFFSET и COUNT(*).
+    """
+
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+def format_change_cursor(change):
+    return f'{change.txid}.{change.id}'
+
+
+class ChangeFeedPagination(BasePagination):
+    """
+    Лента журнала изменений. Курсор '<txid>.<id>' указывает на последнюю
+    полученную запись, ?since=<курсор> возвращает записи после нее.
+    Поле cursor ответа передается в следующий запрос, даже если новых
+    записей нет.
+    """
+
+    cursor_query_param = 'since'
+    page_size_query_param = 'limit'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.CHANGES_PAGE_SIZE
+        return min(max(size, 1), settings.CHANGES_MAX_PAGE_SIZE)
+
+    def filter_after_cursor(self, queryset):
+        txid, _, change_id = self.cursor.partition('.')
+        if not (txid.isdigit() and change_id.isdigit()):
+            raise ValidationError(
+                {self.cursor_query_param: 'Некорректный курсор.'}
+            )
+        return queryset.filter(txid__gte=txid).exclude(
+            txid=txid, id__lte=change_id
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor = request.query_params.get(self.cursor_query_param)
+        if self.cursor:
+            queryset = self.filter_after_cursor(queryset)
+        size = self.get_page_size(request)
+        rows = list(queryset[:size + 1])
+        self.has_next = len(rows) > size
+        page = rows[:size]
+        if page:
+            self.cursor = format_change_cursor(page[-1])
+        return page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param, self.cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('cursor', self.cursor),
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -28,3 +28,16 @@ class IsAdminModeratorAuthorOrReadOnly(permissions.BasePermission):
             or request.user.is_moderator
             or request.user.is_admin
         )
+
+
+class IsAdminOrModerator(permissions.BasePermission):
+    """
+    Доступ только для модераторов и администраторов.
+    """
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and (
+            request.user.is_moderator
+            or request.user.is_admin
+            or request.user.is_superuser
+        )
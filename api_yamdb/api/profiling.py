@@ -0,0 +1,159 @@
+"""
+Профилирование запросов.
+
+Запрос профилируется, если администратор передал ?_profile=1 или
+заголовок X-Profile: 1, либо если он попал в выборку с долей
+PROFILE_SAMPLE_RATE. Отчет с деревом вызовов cProfile и выполненными
+SQL-запросами сохраняется в PROFILE_DIR, его имя возвращается
+в заголовке X-Profile-Report. Отчеты доступны администраторам
+по /api/v1/profiles/.
+
+При PROFILING_ENABLED = False middleware не подключается.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import uuid
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from users.authentication import RevocableJWTAuthentication
+
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_REPORT_HEADER = 'X-Profile-Report'
+REPORT_SUFFIX = '.txt'
+STATS_SUFFIX = '.prof'
+REPORT_STATS_LINES = 60
+
+
+def is_admin_request(request):
+    """
+    Проверка прав до DRF: пользователь сессии или владелец JWT.
+    Выполняется только для запросов с флагом профилирования.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = RevocableJWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        if result is None:
+            return False
+        user = result[0]
+    return user.is_admin or user.is_superuser
+
+
+def get_report_path(name, suffix=REPORT_SUFFIX):
+    return os.path.join(settings.PROFILE_DIR, f'{name}{suffix}')
+
+
+def list_reports():
+    """Имена сохраненных отчетов, новые первыми."""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    return sorted(
+        (
+            file_name[:-len(REPORT_SUFFIX)]
+            for file_name in os.listdir(settings.PROFILE_DIR)
+            if file_name.endswith(REPORT_SUFFIX)
+        ),
+        reverse=True
+    )
+
+
+def remove_old_reports():
+    for name in list_reports()[settings.PROFILE_KEEP:]:
+        for suffix in (REPORT_SUFFIX, STATS_SUFFIX):
+            try:
+                os.remove(get_report_path(name, suffix))
+            except FileNotFoundError:
+                pass
+
+
+def save_report(request, response, profiler, queries, elapsed, reason):
+    name = '{:%Y%m%d-%H%M%S}-{}'.format(timezone.now(), uuid.uuid4().hex[:8])
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    profiler.dump_stats(get_report_path(name, STATS_SUFFIX))
+
+    sql_time = sum(duration for duration, _ in queries)
+    lines = [
+        f'{request.method} {request.get_full_path()}',
+        f'status: {response.status_code}, reason: {reason}',
+        f'time: {elapsed * 1000:.1f} ms, '
+        f'sql: {len(queries)} queries, {sql_time * 1000:.1f} ms',
+        '',
+        'SQL:',
+    ]
+    lines += [
+        f'{duration * 1000:8.2f} ms  {sql}' for duration, sql in queries
+    ]
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats('cumulative')
+    stream.write('\nCalls (cumulative):\n')
+    stats.print_stats(REPORT_STATS_LINES)
+    stream.write('\nCall tree (callees):\n')
+    stats.print_callees(REPORT_STATS_LINES)
+    lines.append(stream.getvalue())
+    with open(get_report_path(name), 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines))
+    remove_old_reports()
+    return name
+
+
+class ProfilingMiddleware:
+    """Профилирование запроса по флагу администратора или по выборке."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def get_profile_reason(self, request):
+        if (
+            request.GET.get(PROFILE_QUERY_PARAM) == '1'
+            or request.headers.get(PROFILE_HEADER) == '1'
+        ):
+            return 'admin' if is_admin_request(request) else None
+        rate = settings.PROFILE_SAMPLE_RATE
+        if rate > 0 and random.random() < rate:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        reason = self.get_profile_reason(request)
+        if reason is None:
+            return self.get_response(request)
+
+        queries = []
+
+        def record_query(execute, sql, params, many, context):
+            start = perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append((perf_counter() - start, sql))
+
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_query))
+            start = perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            elapsed = perf_counter() - start
+        response[PROFILE_REPORT_HEADER] = save_report(
+            request, response, profiler, queries, elapsed, reason
+        )
+        return response
@@ -1,7 +1,71 @@
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
-from reviews.models import Category, Comment, Genre, Review, Title
+from rest_framework.relations import MANY_RELATION_KWARGS
+from reviews.jobs import enqueue_job
+from reviews.models import (Category, Change, Comment, DuplicateCandidate,
+                            Genre, Job, Review, ScoreHistogram, SimilarTitle,
+                            Title)
+from reviews.moderation import (MODERATION_ACTIONS, MODERATION_JOB,
+                                MODERATION_TARGETS)
+from reviews.posters import get_image_extension, get_poster_urls
+from reviews.search import highlight, render_headline
+from reviews.slugs import get_slug_lookup
+from users.models import User
+
+from .pagination import format_change_cursor
+from .utils import get_includes
+
+
+class CachedManySlugRelatedField(serializers.ManyRelatedField):
+    """Список slug, разрешаемый целиком, а не по одному."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        return self.child_relation.to_internal_values(data)
+
+
+class CachedSlugRelatedField(serializers.SlugRelatedField):
+    """
+    SlugRelatedField по кешу reviews.slugs: slug превращаются
+    в объекты с id без запроса к БД, many=True разрешает все slug
+    списка сразу.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return CachedManySlugRelatedField(**list_kwargs)
+
+    def to_internal_values(self, slugs):
+        if not all(isinstance(slug, str) for slug in slugs):
+            self.fail('invalid')
+        queryset = self.get_queryset()
+        model = queryset.model
+        ids = get_slug_lookup(model).resolve(slugs)
+        for slug in slugs:
+            if slug not in ids:
+                self.fail(
+                    'does_not_exist', slug_name=self.slug_field, value=slug
+                )
+        # Объекты как загруженные из БД, но только с id и slug.
+        return [
+            model.from_db(
+                queryset.db, ('id', self.slug_field), (ids[slug], slug)
+            )
+            for slug in slugs
+        ]
+
+    def to_internal_value(self, data):
+        return self.to_internal_values([data])[0]
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -18,6 +82,13 @@ class GenreSerializer(serializers.ModelSerializer):
         model = Genre
 
 
+def get_histogram(title):
+    try:
+        return title.score_histogram
+    except ScoreHistogram.DoesNotExist:
+        return ScoreHistogram(title=title)
+
+
 class TitleGetSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     genre = GenreSerializer(
@@ -25,27 +96,92 @@ class TitleGetSerializer(serializers.ModelSerializer):
         many=True
     )
     rating = serializers.IntegerField(read_only=True)
+    poster = serializers.SerializerMethodField()
 
     class Meta:
-        fields = '__all__'
+        exclude = ('is_deleted', 'poster_variants', 'genre_ids')
         model = Title
 
+    def get_poster(self, title):
+        return get_poster_urls(title)
 
-class TitlePostSerializer(serializers.ModelSerializer):
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'histogram' in get_includes(self.context.get('request')):
+            data['histogram'] = get_histogram(instance).counts()
+        return data
+
+
+class SimilarTitleSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='similar.id')
+    name = serializers.CharField(source='similar.name')
+    year = serializers.IntegerField(source='similar.year')
     category = serializers.SlugRelatedField(
+        source='similar.category', slug_field='slug', read_only=True
+    )
+
+    class Meta:
+        fields = ('id', 'name', 'year', 'category', 'score')
+        model = SimilarTitle
+
+
+class TitlePostSerializer(serializers.ModelSerializer):
+    category = CachedSlugRelatedField(
         queryset=Category.objects.all(),
         slug_field='slug'
     )
-    genre = serializers.SlugRelatedField(
+    genre = CachedSlugRelatedField(
         queryset=Genre.objects.all(),
         slug_field='slug',
         many=True
     )
 
     class Meta:
-        fields = '__all__'
+        exclude = ('is_deleted', 'poster', 'poster_variants', 'genre_ids')
         model = Title
 
+    def save(self, **kwargs):
+        """
+        Копия slug другого процесса может вернуть id уже удаленной
+        категории или жанра. Тогда копии сбрасываются, slug проверяются
+        заново по БД и запись повторяется один раз.
+        """
+        instance = self.instance
+        try:
+            return self.save_checked(**kwargs)
+        except IntegrityError:
+            get_slug_lookup(Category).forget()
+            get_slug_lookup(Genre).forget()
+            self.instance = instance
+            del self._validated_data
+            self.is_valid(raise_exception=True)
+            return self.save_checked(**kwargs)
+
+    def save_checked(self, **kwargs):
+        with transaction.atomic():
+            super().save(**kwargs)
+            # Внешние ключи проверяются при фиксации, здесь - сразу.
+            connection.check_constraints(table_names=[
+                Title._meta.db_table, Title.genre.through._meta.db_table
+            ])
+        return self.instance
+
+
+class TitlePosterSerializer(serializers.Serializer):
+    poster = serializers.FileField()
+
+    def validate_poster(self, value):
+        """Проверка размера и сигнатуры без декодирования изображения."""
+        if value.size > settings.POSTER_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Размер файла больше {settings.POSTER_MAX_SIZE} байт.'
+            )
+        if get_image_extension(value) is None:
+            raise serializers.ValidationError(
+                'Поддерживаются JPEG, PNG, GIF и WebP.'
+            )
+        return value
+
 
 class ReviewSerializer(serializers.ModelSerializer):
     title = serializers.SlugRelatedField(
@@ -58,7 +194,7 @@ class ReviewSerializer(serializers.ModelSerializer):
     )
 
     class Meta:
-        fields = '__all__'
+        exclude = ('search_vector', 'is_hidden')
         model = Review
 
     def validate(self, data):
@@ -66,7 +202,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         author = request.user
         title_id = self.context.get('view').kwargs.get('title_id')
         title = get_object_or_404(Title, pk=title_id)
-        review_exist = Review.objects.filter(
+        review_exist = Review.all_objects.filter(
             title=title,
             author=author
         ).exists()
@@ -77,15 +213,168 @@ class ReviewSerializer(serializers.ModelSerializer):
 
 
 class CommentSerializer(serializers.ModelSerializer):
-    review = serializers.SlugRelatedField(
-        slug_field='text',
+    """review - id отзыва, ?include=review_text добавляет его текст."""
+    review = serializers.PrimaryKeyRelatedField(read_only=True)
+    author = serializers.SlugRelatedField(
+        slug_field='username',
+        read_only=True
+    )
+
+    class Meta:
+        exclude = ('search_vector', 'is_hidden')
+        model = Comment
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'review_text' in get_includes(self.context.get('request')):
+            data['review_text'] = instance.review.text
+        return data
+
+
+class HeadlineMixin(serializers.Serializer):
+    """
+    Фрагмент текста с подсветкой совпадений поискового запроса:
+    экранированный HTML, совпадения в <b>.
+    """
+    headline = serializers.SerializerMethodField()
+
+    def get_headline(self, obj):
+        if hasattr(obj, 'headline'):
+            return render_headline(obj.headline)
+        query = self.context['request'].query_params.get('q')
+        if not query:
+            return None
+        return render_headline(highlight(obj.text, query))
+
+
+class ReviewSearchSerializer(HeadlineMixin, serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(
+        slug_field='username',
         read_only=True
     )
+    title_name = serializers.CharField(source='title.name', read_only=True)
+
+    class Meta:
+        fields = ('id', 'title', 'title_name', 'author', 'text', 'score',
+                  'pub_date', 'headline')
+        model = Review
+
+
+class CommentSearchSerializer(HeadlineMixin, serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         slug_field='username',
         read_only=True
     )
+    title = serializers.IntegerField(source='review.title_id', read_only=True)
 
     class Meta:
-        fields = '__all__'
+        fields = ('id', 'title', 'review', 'author', 'text', 'pub_date',
+                  'headline')
         model = Comment
+
+
+class UserReviewSerializer(serializers.ModelSerializer):
+    title_name = serializers.CharField(source='title.name', read_only=True)
+
+    class Meta:
+        fields = ('id', 'title', 'title_name', 'text', 'score', 'pub_date')
+        model = Review
+
+
+class UserCommentSerializer(serializers.ModelSerializer):
+    title = serializers.IntegerField(source='review.title_id', read_only=True)
+    title_name = serializers.CharField(
+        source='review.title.name', read_only=True
+    )
+
+    class Meta:
+        fields = ('id', 'title', 'title_name', 'review', 'text', 'pub_date')
+        model = Comment
+
+
+class DuplicateCandidateSerializer(serializers.ModelSerializer):
+    """Пара почти одинаковых текстов; text у удаленных объектов - null."""
+    text = serializers.CharField(read_only=True)
+    duplicate_text = serializers.CharField(read_only=True)
+
+    class Meta:
+        fields = (
+            'id', 'kind', 'object_id', 'text', 'duplicate_kind',
+            'duplicate_id', 'duplicate_text', 'similarity', 'created'
+        )
+        model = DuplicateCandidate
+
+
+class ModerationJobSerializer(serializers.ModelSerializer):
+    """
+    Задача массовой модерации: action применяется ко всем объектам
+    target, подходящим под author, title и ids одновременно.
+    """
+    action = serializers.ChoiceField(
+        choices=MODERATION_ACTIONS, write_only=True
+    )
+    target = serializers.ChoiceField(
+        choices=list(MODERATION_TARGETS), write_only=True
+    )
+    author = serializers.SlugRelatedField(
+        slug_field='username',
+        queryset=User.objects.all(),
+        required=False,
+        write_only=True
+    )
+    title = serializers.PrimaryKeyRelatedField(
+        queryset=Title.objects.all(),
+        required=False,
+        write_only=True
+    )
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=10000,
+        write_only=True
+    )
+
+    class Meta:
+        fields = ('id', 'action', 'target', 'author', 'title', 'ids',
+                  'params', 'status', 'total', 'processed', 'error',
+                  'created', 'started', 'finished')
+        read_only_fields = ('params', 'status', 'total', 'processed',
+                            'error', 'created', 'started', 'finished')
+        model = Job
+
+    def validate(self, data):
+        if not any(key in data for key in ('author', 'title', 'ids')):
+            raise serializers.ValidationError(
+                'Укажите author, title или ids.'
+            )
+        return data
+
+    def create(self, validated_data):
+        params = {
+            'action': validated_data['action'],
+            'target': validated_data['target'],
+        }
+        if 'author' in validated_data:
+            params['author'] = validated_data['author'].pk
+        if 'title' in validated_data:
+            params['title'] = validated_data['title'].pk
+        if 'ids' in validated_data:
+            params['ids'] = validated_data['ids']
+        return enqueue_job(
+            MODERATION_JOB, params, user=self.context['request'].user
+        )
+
+
+class ChangeSerializer(serializers.ModelSerializer):
+    cursor = serializers.SerializerMethodField()
+
+    class Meta:
+        fields = (
+            'cursor', 'model', 'action', 'object_id', 'slug',
+            'title_id', 'review_id', 'changed_at'
+        )
+        model = Change
+
+    def get_cursor(self, obj):
+        return format_change_cursor(obj)
@@ -0,0 +1,58 @@
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from reviews.models import Category, Comment, Genre, Review, Title
+
+from .caching import purge_surrogate_keys
+from .events import publish_change
+
+
+@receiver(request_started)
+def check_persistent_connections(**kwargs):
+    """
+    Проверка постоянных соединений перед повторным использованием
+    (в Django 3.2 нет CONN_HEALTH_CHECKS): соединение, разорванное
+    сервером БД, закрывается, и запрос открывает новое.
+    """
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and not connection.in_atomic_block
+            and not connection.is_usable()
+        ):
+            connection.close()
+
+
+@receiver((post_save, post_delete), sender=Title)
+def purge_title(sender, instance, **kwargs):
+    purge_surrogate_keys(['titles', f'title-{instance.pk}'])
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def purge_title_genres(sender, instance, action, **kwargs):
+    if action.startswith('post_') and isinstance(instance, Title):
+        purge_surrogate_keys(['titles', f'title-{instance.pk}'])
+
+
+@receiver((post_save, post_delete), sender=Category)
+@receiver((post_save, post_delete), sender=Genre)
+def purge_category_or_genre(sender, instance, **kwargs):
+    keys = ['categories' if sender is Category else 'genres', 'titles']
+    if kwargs['signal'] is post_save:
+        keys += [
+            f'title-{pk}'
+            for pk in instance.titles.values_list('pk', flat=True)
+        ]
+    purge_surrogate_keys(keys)
+
+
+@receiver((post_save, post_delete), sender=Review)
+def purge_review(sender, instance, **kwargs):
+    purge_surrogate_keys(['titles', f'title-{instance.title_id}'])
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Comment)
+def publish_saved(sender, instance, created, **kwargs):
+    publish_change(instance, 'created' if created else 'updated')
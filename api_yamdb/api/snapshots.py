@@ -0,0 +1,191 @@
+"""
+Снимки каталога в статических файлах для nginx.
+
+Ответы анонимным GET-запросам к спискам категорий, жанров, произведений
+(в том числе ?category=<slug>) и к страницам произведений сохраняются
+в SNAPSHOT_ROOT по пути запроса: /api/v1/titles/ -> api/v1/titles/
+index.json, ?category=movie&limit=5&offset=5 -> index.category=movie&
+limit=5&offset=5.json. Параметры идут в порядке ссылок next/previous
+API. Списки сохраняются на SNAPSHOT_PAGES страниц, дальние страницы
+и запросы с другими параметрами nginx отдает из приложения.
+
+Изменения каталога отмечают ключи кеша (api.caching) в задаче
+snapshots; воркер run_jobs перерисовывает только снимки этих ключей.
+Файл пишется во временный и переименовывается, nginx не видит
+недописанных снимков.
+"""
+import os
+import tempfile
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import resolve
+from reviews.jobs import job_handler, report_progress
+from reviews.models import Category, Job, Title
+
+SNAPSHOT_JOB = 'snapshots'
+SNAPSHOT_FILE = 'index'
+
+LIST_PATHS = {
+    'categories': '/api/v1/categories/',
+    'genres': '/api/v1/genres/',
+    'titles': '/api/v1/titles/',
+}
+TITLE_PATH = '/api/v1/titles/{pk}/'
+
+
+def get_request_factory():
+    base_url = urlsplit(settings.SNAPSHOT_BASE_URL)
+    return RequestFactory(**{
+        'HTTP_HOST': base_url.netloc,
+        'wsgi.url_scheme': base_url.scheme,
+    })
+
+
+def render(path, query=''):
+    """Ответ API анонимному пользователю: (статус, тело, данные)."""
+    request = get_request_factory().get(f'{path}?{query}' if query else path)
+    match = resolve(path)
+    response = match.func(request, *match.args, **match.kwargs)
+    response.render()
+    return response.status_code, response.content, response.data
+
+
+def get_snapshot_path(path, query=''):
+    name = f'{SNAPSHOT_FILE}.{query}' if query else SNAPSHOT_FILE
+    return os.path.join(
+        settings.SNAPSHOT_ROOT, path.strip('/'), f'{name}.json'
+    )
+
+
+def write_snapshot(file_path, content):
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as temp_file:
+            temp_file.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def remove_snapshot(file_path):
+    try:
+        os.unlink(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def get_link_query(url):
+    return urlsplit(url).query if url else None
+
+
+def render_list(path, query=''):
+    """
+    Первые SNAPSHOT_PAGES страниц списка по ссылкам next. Первая
+    страница сохраняется и под ссылкой previous второй страницы.
+    Возвращает пути записанных файлов.
+    """
+    written = []
+    first_query, first_content = query, None
+    for page in range(settings.SNAPSHOT_PAGES):
+        status, content, data = render(path, query)
+        if status != 200:
+            break
+        written.append(get_snapshot_path(path, query))
+        write_snapshot(written[-1], content)
+        if page == 0:
+            first_content = content
+        elif page == 1:
+            previous = get_link_query(data.get('previous'))
+            if previous and previous != first_query:
+                written.append(get_snapshot_path(path, previous))
+                write_snapshot(written[-1], first_content)
+        query = get_link_query(data.get('next'))
+        if not query:
+            break
+    return written
+
+
+def remove_stale_pages(path, written):
+    """Удаление страниц списка, которых больше нет в снимке."""
+    directory = os.path.join(settings.SNAPSHOT_ROOT, path.strip('/'))
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        file_path = os.path.join(directory, name)
+        if name.endswith('.json') and file_path not in written:
+            remove_snapshot(file_path)
+
+
+def render_key(key):
+    """Перерисовка снимков одного ключа; возвращает число файлов."""
+    name, _, pk = key.partition('-')
+    if name == 'title':
+        path = TITLE_PATH.format(pk=pk)
+        status, content, _ = render(path)
+        if status == 200:
+            write_snapshot(get_snapshot_path(path), content)
+            return 1
+        remove_snapshot(get_snapshot_path(path))
+        return 0
+    path = LIST_PATHS[name]
+    written = render_list(path)
+    if name == 'titles':
+        for slug in Category.objects.values_list('slug', flat=True):
+            written += render_list(path, f'category={slug}')
+    remove_stale_pages(path, set(written))
+    return len(written)
+
+
+def is_snapshot_key(key):
+    name, _, pk = key.partition('-')
+    return name in LIST_PATHS and not pk or name == 'title' and pk.isdigit()
+
+
+def get_all_keys():
+    return [
+        *LIST_PATHS,
+        *(f'title-{pk}' for pk in Title.objects.values_list('pk', flat=True)),
+    ]
+
+
+@job_handler(SNAPSHOT_JOB)
+def render_snapshots(job):
+    keys = job.params['keys']
+    report_progress(job, 0, total=len(keys))
+    for processed, key in enumerate(keys, start=1):
+        render_key(key)
+        if processed % 100 == 0:
+            report_progress(job, processed)
+    report_progress(job, len(keys))
+
+
+def schedule_snapshots(keys):
+    """
+    Добавление ключей в ожидающую задачу snapshots или новая задача.
+    Выполняется после фиксации транзакции изменения, блокировка задачи
+    держится только на время ее обновления.
+    """
+    if not settings.SNAPSHOTS_ENABLED:
+        return
+    keys = [key for key in keys if is_snapshot_key(key)]
+
+    def merge_keys():
+        with transaction.atomic():
+            job = Job.objects.select_for_update().filter(
+                kind=SNAPSHOT_JOB, status=Job.PENDING
+            ).first()
+            if job is None:
+                Job.objects.create(kind=SNAPSHOT_JOB, params={'keys': keys})
+                return
+            job.params['keys'] = sorted(set(job.params['keys']) | set(keys))
+            job.save(update_fields=('params',))
+
+    if keys:
+        transaction.on_commit(merge_keys)
@@ -0,0 +1,163 @@
+"""
+Поток server-sent events /api/v1/titles/{id}/events/ на ASGI.
+
+Клиент держит одно соединение вместо периодического опроса списков
+отзывов и комментариев. События: review.created, review.updated,
+review.deleted и comment.* с теми же полями, что в API. Каждые
+EVENTS_HEARTBEAT секунд отправляется комментарий-heartbeat.
+При переподключении с заголовком Last-Event-ID пропущенные события
+досылаются из буфера брокера; если это невозможно, отправляется
+событие reset - клиенту нужно перечитать списки.
+
+Django 3.2 не поддерживает асинхронную отдачу StreamingHttpResponse,
+поэтому поток обслуживается ASGI-приложением до Django.
+"""
+import asyncio
+import json
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from reviews.models import Title
+
+from .events import get_broker
+
+EVENTS_PATH = re.compile(r'^/api/v1/titles/(?P<title_id>\d+)/events/$')
+RESET_EVENT = 'reset'
+
+
+def format_event(event_type, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [
+        f'event: {event_type}',
+        'data: ' + json.dumps(data, ensure_ascii=False, default=str),
+    ]
+    return '\n'.join(lines) + '\n\n'
+
+
+@sync_to_async
+def title_exists(title_id):
+    try:
+        return Title.objects.filter(pk=title_id).exists()
+    finally:
+        close_old_connections()
+
+
+async def send_response(send, status, body, content_type):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type)],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class EventStream:
+    """Одно SSE-соединение клиента."""
+
+    def __init__(self, send, title_id, last_event_id):
+        self.send = send
+        self.title_id = title_id
+        self.last_event_id = last_event_id
+        self.last_seq = 0
+
+    async def write(self, chunk):
+        await self.send({
+            'type': 'http.response.body',
+            'body': chunk.encode(),
+            'more_body': True,
+        })
+
+    async def write_event(self, event):
+        # События, уже отправленные из буфера, в очереди пропускаются.
+        if event.seq <= self.last_seq:
+            return
+        self.last_seq = event.seq
+        await self.write(format_event(event.type, event.data, event.id))
+
+    async def replay(self, broker):
+        events = broker.replay(self.title_id, self.last_event_id)
+        if events is None:
+            await self.write(format_event(RESET_EVENT, {}))
+            return
+        for event in events:
+            await self.write_event(event)
+
+    async def run(self, receive):
+        await self.send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await self.write(f'retry: {settings.EVENTS_RETRY_MS}\n\n')
+        broker = get_broker()
+        subscription = broker.subscribe(self.title_id)
+        tasks = {
+            asyncio.ensure_future(wait_disconnect(receive)),
+            asyncio.ensure_future(subscription.closed.wait()),
+        }
+        try:
+            if self.last_event_id:
+                await self.replay(broker)
+            await self.stream(subscription, tasks)
+        finally:
+            broker.unsubscribe(subscription)
+            for task in tasks:
+                task.cancel()
+        await self.send({'type': 'http.response.body', 'body': b''})
+
+    async def stream(self, subscription, stop_tasks):
+        while True:
+            get_event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {get_event, *stop_tasks},
+                timeout=settings.EVENTS_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if get_event in done:
+                await self.write_event(get_event.result())
+                continue
+            get_event.cancel()
+            if done:
+                return
+            await self.write(': heartbeat\n\n')
+
+
+class EventStreamMiddleware:
+    """Отдает поток событий, остальные запросы передает Django."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        match = None
+        if scope['type'] == 'http':
+            match = EVENTS_PATH.match(scope['path'])
+        if match is None:
+            await self.application(scope, receive, send)
+        elif scope['method'] != 'GET':
+            await send_response(
+                send, 405, b'{"detail": "Method not allowed."}',
+                b'application/json'
+            )
+        elif not await title_exists(int(match['title_id'])):
+            await send_response(
+                send, 404, b'{"detail": "Not found."}', b'application/json'
+            )
+        else:
+            headers = dict(scope['headers'])
+            stream = EventStream(
+                send, int(match['title_id']),
+                headers.get(b'last-event-id', b'').decode()
+            )
+            await stream.run(receive)
@@ -1,8 +1,10 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (CategoryViewSet, CommentViewSet, GenreViewSet,
-                    ReviewViewSet, TitleViewSet)
+from .views import (CategoryViewSet, ChangeViewSet, CommentSearchViewSet,
+                    CommentViewSet, DuplicateCandidateViewSet, GenreViewSet,
+                    ModerationJobViewSet, ProfileReportViewSet,
+                    ReviewSearchViewSet, ReviewViewSet, TitleViewSet)
 
 app_name = 'api'
 
@@ -33,6 +35,36 @@ router_v1.register(
     CommentViewSet,
     basename='comments'
 )
+router_v1.register(
+    'search/reviews',
+    ReviewSearchViewSet,
+    basename='search-reviews'
+)
+router_v1.register(
+    'search/comments',
+    CommentSearchViewSet,
+    basename='search-comments'
+)
+router_v1.register(
+    'moderation/jobs',
+    ModerationJobViewSet,
+    basename='moderation-jobs'
+)
+router_v1.register(
+    'moderation/duplicates',
+    DuplicateCandidateViewSet,
+    basename='moderation-duplicates'
+)
+router_v1.register(
+    'changes',
+    ChangeViewSet,
+    basename='changes'
+)
+router_v1.register(
+    'profiles',
+    ProfileReportViewSet,
+    basename='profiles'
+)
 
 urlpatterns = [
     path('v1/', include(router_v1.urls)),
@@ -0,0 +1,26 @@
+from rest_framework.exceptions import ValidationError
+
+INCLUDE_QUERY_PARAM = 'include'
+AFTER_QUERY_PARAM = 'after'
+
+
+def get_includes(request):
+    """Набор дополнительных блоков ответа из параметра ?include=a,b."""
+    if request is None:
+        return set()
+    value = request.query_params.get(INCLUDE_QUERY_PARAM, '')
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def filter_after(queryset, request):
+    """
+    ?after=<id> - продолжение выдачи, упорядоченной по id,
+    после последнего полученного объекта.
+    """
+    value = request.query_params.get(AFTER_QUERY_PARAM)
+    if value is None:
+        return queryset
+    try:
+        return queryset.filter(id__gt=int(value))
+    except ValueError:
+        raise ValidationError({AFTER_QUERY_PARAM: 'Ожидается целое число.'})
@@ -1,76 +1,221 @@
-from api.filters import TitleFilter
-from django.db.models import Avg
+import os
+
+from api.filters import CommentSearchFilter, ReviewSearchFilter, TitleFilter
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, FloatField, OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter
-from rest_framework.pagination import LimitOffsetPagination
-from reviews.models import Category, Genre, Review, Title
+from rest_framework.response import Response
+from reviews.autocomplete import get_title_autocomplete
+from reviews.deletion import schedule_deletion
+from reviews.duplicates import attach_texts
+from reviews.models import (Category, Change, Comment, DuplicateCandidate,
+                            Genre, Job, Review, SimilarTitle, Title)
+from reviews.moderation import MODERATION_JOB
+from reviews.posters import delete_poster, set_poster
+from users.permissions import SuperUserOrAdmin
 
-from .mixins import CustomMixinSet
-from .permissions import IsAdminModeratorAuthorOrReadOnly, IsAdminOrReadOnly
-from .serializers import (CategorySerializer, CommentSerializer,
-                          GenreSerializer, ReviewSerializer,
-                          TitleGetSerializer, TitlePostSerializer)
+from . import profiling
+from .caching import SurrogateKeyMixin
+from .embedding import get_embedded_reviews
+from .events import get_deleted_messages, publish_change, publish_messages
+from .mixins import BatchGetMixin, CustomMixinSet
+from .pagination import (COUNT_ESTIMATED, COUNT_NONE, ChangeFeedPagination,
+                         CountModeLimitOffsetPagination)
+from .permissions import (IsAdminModeratorAuthorOrReadOnly, IsAdminOrModerator,
+                          IsAdminOrReadOnly)
+from .serializers import (CategorySerializer, ChangeSerializer,
+                          CommentSearchSerializer, CommentSerializer,
+                          DuplicateCandidateSerializer, GenreSerializer,
+                          ModerationJobSerializer, ReviewSearchSerializer,
+                          ReviewSerializer, SimilarTitleSerializer,
+                          TitleGetSerializer, TitlePosterSerializer,
+                          TitlePostSerializer, get_histogram)
+from .utils import filter_after, get_includes
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(SurrogateKeyMixin, BatchGetMixin, viewsets.ModelViewSet):
     """
     Получить список всех объектов. Права доступа: Доступно без токена
+    ?ids=1,2,3 - произведения по списку id.
     """
 
+    # Рейтинг - подзапросом, а не JOIN с GROUP BY: страница считает его
+    # только для своих строк, COUNT(*) не читает отзывы.
     queryset = Title.objects.annotate(
-        rating=Avg('reviews__score')
+        rating=Subquery(
+            Review.objects.filter(title=OuterRef('pk')).order_by().values(
+                'title'
+            ).annotate(avg=Avg('score')).values('avg'),
+            output_field=FloatField()
+        )
     ).all()
-    pagination_class = LimitOffsetPagination
+    pagination_class = CountModeLimitOffsetPagination
+    pagination_count_mode = COUNT_ESTIMATED
+    surrogate_list_key = 'titles'
+    surrogate_detail_key = 'title'
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TitleFilter
     http_method_names = ['get', 'post', 'patch', 'delete']
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            queryset = queryset.select_related(
+                'category'
+            ).prefetch_related('genre')
+        elif self.request.method == 'PATCH':
+            queryset = queryset.select_related('category')
+        if 'histogram' in get_includes(self.request):
+            return queryset.select_related('score_histogram')
+        return queryset
+
     def get_serializer_class(self):
+        if self.action == 'poster':
+            return TitlePosterSerializer
         if self.request.method in ('POST', 'PATCH'):
             return TitlePostSerializer
         return TitleGetSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        ?include=reviews,comments - первые отзывы и комментарии к ним
+        со ссылками next на продолжение списков.
+        """
+        title = self.get_object()
+        data = self.get_serializer(title).data
+        includes = get_includes(request)
+        if 'reviews' in includes:
+            data['reviews'] = get_embedded_reviews(
+                title, request, with_comments='comments' in includes
+            )
+        return Response(data)
+
+    def perform_destroy(self, instance):
+        schedule_deletion(instance, self.request.user)
+
+    @action(
+        methods=('POST', 'DELETE'),
+        detail=True,
+        url_path='poster')
+    def poster(self, request, pk=None):
+        """
+        POST - загрузка постера (multipart, поле poster), варианты
+        готовятся в фоне. DELETE - удаление постера.
+        Права доступа: Администратор.
+        """
+        title = self.get_object()
+        if request.method == 'DELETE':
+            delete_poster(title)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        set_poster(title, serializer.validated_data['poster'], request.user)
+        return Response(
+            TitleGetSerializer(title, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=True, url_path='histogram')
+    def histogram(self, request, pk=None):
+        """Распределение оценок произведения."""
+        title = get_object_or_404(
+            Title.objects.select_related('score_histogram'), pk=pk
+        )
+        counts = get_histogram(title).counts()
+        return Response({
+            'title': title.pk,
+            'total': sum(counts.values()),
+            'scores': counts,
+        })
+
+    @action(detail=True, url_path='similar')
+    def similar(self, request, pk=None):
+        """
+        Похожие произведения, рассчитанные командой build_similar_titles.
+        """
+        neighbours = SimilarTitle.objects.filter(
+            title_id=pk, similar__is_deleted=False
+        ).select_related('similar__category').order_by('rank')
+        return Response(
+            SimilarTitleSerializer(neighbours, many=True).data
+        )
+
+    @action(detail=False, url_path='autocomplete')
+    def autocomplete(self, request):
+        """
+        ?prefix=<начало названия> - самые популярные произведения
+        с таким началом из индекса в памяти, без запросов к БД.
+        """
+        prefix = request.query_params.get('prefix', '').strip()
+        if not prefix:
+            raise ValidationError({'prefix': 'Обязательный параметр.'})
+        return Response([
+            {'id': pk, 'name': name}
+            for pk, name in get_title_autocomplete().search(
+                prefix, settings.AUTOCOMPLETE_LIMIT
+            )
+        ])
 
-class CategoryViewSet(CustomMixinSet):
+
+class CategoryViewSet(SurrogateKeyMixin, CustomMixinSet):
     """
     Получить список всех категорий. Права доступа: Доступно без токена
     """
 
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    surrogate_list_key = 'categories'
     permission_classes = (IsAdminOrReadOnly, )
-    pagination_class = LimitOffsetPagination
+    pagination_class = CountModeLimitOffsetPagination
     filter_backends = (SearchFilter, )
     search_fields = ('name', )
     lookup_field = 'slug'
 
 
-class GenreViewSet(CustomMixinSet):
+class GenreViewSet(SurrogateKeyMixin, CustomMixinSet):
     """
     Получить список всех жанров. Права доступа: Доступно без токена
     """
 
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
+    surrogate_list_key = 'genres'
     permission_classes = (IsAdminOrReadOnly, )
-    pagination_class = LimitOffsetPagination
+    pagination_class = CountModeLimitOffsetPagination
     filter_backends = (SearchFilter,)
     search_fields = ('name', )
     lookup_field = 'slug'
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(BatchGetMixin, viewsets.ModelViewSet):
+    """
+    Отзывы произведения, ?ids=1,2,3 - отзывы по списку id.
+    """
+
     serializer_class = ReviewSerializer
     permission_classes = (IsAdminModeratorAuthorOrReadOnly, )
 
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Review.objects.none()
         title = get_object_or_404(
             Title,
             id=self.kwargs.get('title_id'))
-        return title.reviews.order_by('id')
+        # Менеджер title.reviews подставляет в отзывы уже загруженное
+        # произведение, авторы выбираются тем же запросом.
+        return filter_after(
+            title.reviews.select_related('author').order_by('id'),
+            self.request
+        )
 
     def perform_create(self, serializer):
         title = get_object_or_404(
@@ -78,19 +223,170 @@ class ReviewViewSet(viewsets.ModelViewSet):
             id=self.kwargs.get('title_id'))
         serializer.save(author=self.request.user, title=title)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            publish_messages(get_deleted_messages(
+                Comment, instance.comments.values('pk')
+            ))
+            publish_change(instance, 'deleted')
+            instance.delete()
+
 
 class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = (IsAdminModeratorAuthorOrReadOnly, )
 
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Comment.objects.none()
         review = get_object_or_404(
             Review,
             id=self.kwargs.get('review_id'))
-        return review.comments.order_by('id')
+        return filter_after(
+            review.comments.select_related('author').order_by('id'),
+            self.request
+        )
 
     def perform_create(self, serializer):
         review = get_object_or_404(
             Review,
             id=self.kwargs.get('review_id'))
         serializer.save(author=self.request.user, review=review)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            publish_change(instance, 'deleted')
+            instance.delete()
+
+
+class ReviewSearchViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Поиск отзывов по тексту (?q=) с фильтрами title, author,
+    date_from, date_to. Права доступа: Модератор, Администратор.
+    """
+
+    queryset = Review.objects.filter(
+        title__is_deleted=False
+    ).select_related('author', 'title').order_by('-pub_date', '-id')
+    serializer_class = ReviewSearchSerializer
+    permission_classes = (IsAdminOrModerator,)
+    pagination_class = CountModeLimitOffsetPagination
+    pagination_count_mode = COUNT_NONE
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = ReviewSearchFilter
+
+
+class CommentSearchViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Поиск комментариев по тексту (?q=) с фильтрами title, review, author,
+    date_from, date_to. Права доступа: Модератор, Администратор.
+    """
+
+    queryset = Comment.objects.filter(
+        review__title__is_deleted=False
+    ).select_related('author', 'review').order_by('-pub_date', '-id')
+    serializer_class = CommentSearchSerializer
+    permission_classes = (IsAdminOrModerator,)
+    pagination_class = CountModeLimitOffsetPagination
+    pagination_count_mode = COUNT_NONE
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = CommentSearchFilter
+
+
+class ModerationJobViewSet(mixins.CreateModelMixin,
+                           mixins.ListModelMixin,
+                           mixins.RetrieveModelMixin,
+                           viewsets.GenericViewSet):
+    """
+    Массовое удаление, скрытие и восстановление отзывов и комментариев
+    по автору, произведению или списку id. Задача выполняется в фоне,
+    прогресс - в полях status, processed и total.
+    Права доступа: Модератор, Администратор.
+    """
+
+    queryset = Job.objects.filter(kind=MODERATION_JOB)
+    serializer_class = ModerationJobSerializer
+    permission_classes = (IsAdminOrModerator,)
+    pagination_class = CountModeLimitOffsetPagination
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+
+class DuplicateCandidateViewSet(mixins.ListModelMixin,
+                                mixins.DestroyModelMixin,
+                                viewsets.GenericViewSet):
+    """
+    Почти одинаковые отзывы и комментарии (reviews/duplicates.py),
+    новые первыми. Скрыть тексты можно задачей /moderation/jobs/
+    с target=kind и ids, DELETE снимает пару с проверки.
+    Права доступа: Модератор, Администратор.
+    """
+
+    queryset = DuplicateCandidate.objects.all()
+    serializer_class = DuplicateCandidateSerializer
+    permission_classes = (IsAdminOrModerator,)
+    pagination_class = CountModeLimitOffsetPagination
+    filter_backends = ()
+
+    def paginate_queryset(self, queryset):
+        return attach_texts(super().paginate_queryset(queryset))
+
+
+class ChangeViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Журнал изменений категорий, жанров, произведений, отзывов
+    и комментариев для синхронизации копий каталога: ?since=<cursor>.
+    Права доступа: Доступно без токена.
+    """
+
+    serializer_class = ChangeSerializer
+    permission_classes = (IsAdminOrReadOnly,)
+    pagination_class = ChangeFeedPagination
+    filter_backends = ()
+
+    def get_queryset(self):
+        queryset = Change.objects.order_by('txid', 'id')
+        if connection.vendor != 'postgresql':
+            return queryset
+        # Только транзакции старше самой старой незавершенной: запись
+        # транзакции с меньшим txid, зафиксированной позже, иначе
+        # оказалась бы позади курсора клиента.
+        return queryset.filter(txid__lt=RawSQL(
+            'txid_snapshot_xmin(txid_current_snapshot())', ()
+        ))
+
+
+class ProfileReportViewSet(viewsets.ViewSet):
+    """
+    Отчеты профилирования запросов: список, текстовый отчет
+    и файл статистики cProfile (stats/). Права доступа: Администратор.
+    """
+
+    permission_classes = (SuperUserOrAdmin,)
+    lookup_value_regex = r'[\w-]+'
+
+    def list(self, request):
+        return Response(profiling.list_reports())
+
+    def get_report_file(self, name, suffix):
+        path = profiling.get_report_path(name, suffix)
+        if not os.path.exists(path):
+            raise Http404
+        return open(path, 'rb')
+
+    def retrieve(self, request, pk=None):
+        return FileResponse(
+            self.get_report_file(pk, profiling.REPORT_SUFFIX),
+            content_type='text/plain; charset=utf-8'
+        )
+
+    @action(detail=True)
+    def stats(self, request, pk=None):
+        return FileResponse(
+            self.get_report_file(pk, profiling.STATS_SUFFIX),
+            as_attachment=True,
+            filename=f'{pk}{profiling.STATS_SUFFIX}'
+        )
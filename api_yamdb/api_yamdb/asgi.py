@@ -4,4 +4,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.stream import EventStreamMiddleware  # noqa: E402
+
+application = EventStreamMiddleware(django_application)
@@ -0,0 +1,87 @@
+import os
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.views.generic import TemplateView
+
+SCHEMA_FORMATS = {
+    '.json': 'application/json',
+    '.yaml': 'application/yaml',
+}
+SCHEMA_FILE_NAME = 'swagger{format}'
+
+_schema_cache = {}
+
+
+def get_schema_path(format):
+    return os.path.join(
+        settings.API_SCHEMA_DIR, SCHEMA_FILE_NAME.format(format=format)
+    )
+
+
+def get_spec_url():
+    """
+    Адрес схемы для страниц документации: собранный файл раздается
+    как статика, иначе схема генерируется приложением.
+    """
+    if os.path.exists(get_schema_path('.json')):
+        return (
+            f'{settings.STATIC_URL}schema/'
+            f'{SCHEMA_FILE_NAME.format(format=".json")}'
+        )
+    return '/swagger.json'
+
+
+def render_schema(format):
+    """
+    Генерация схемы через drf_yasg.
+    Импорт выполняется здесь, чтобы воркеры не загружали drf_yasg
+    при старте.
+    """
+    from drf_yasg import openapi
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.views import APIView
+
+    info = openapi.Info(
+        title='Yatube API',
+        default_version='v1',
+        description='Документация для приложения Yambd',
+        contact=openapi.Contact(email='yamdb17@gmail.com'),
+        license=openapi.License(name='BSD License'),
+    )
+    request = APIView().initialize_request(
+        APIRequestFactory().get(f'/swagger{format}')
+    )
+    schema = OpenAPISchemaGenerator(info).get_schema(
+        request=request, public=True
+    )
+    codec = OpenAPICodecJson if format == '.json' else OpenAPICodecYaml
+    return codec(validators=[]).encode(schema)
+
+
+def schema_view(request, format):
+    """
+    Отдает собранную командой build_schema схему,
+    при её отсутствии - сгенерированную один раз на процесс.
+    """
+    path = get_schema_path(format)
+    if os.path.exists(path):
+        return FileResponse(
+            open(path, 'rb'), content_type=SCHEMA_FORMATS[format]
+        )
+    if format not in _schema_cache:
+        _schema_cache[format] = render_schema(format)
+    return HttpResponse(
+        _schema_cache[format], content_type=SCHEMA_FORMATS[format]
+    )
+
+
+class DocsView(TemplateView):
+    """Страница документации, загружающая схему по get_spec_url()."""
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['spec_url'] = get_spec_url()
+        return context
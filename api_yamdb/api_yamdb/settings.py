@@ -22,7 +22,6 @@ INSTALLED_APPS = [
     'api',
     'users',
     'reviews',
-    'drf_yasg',
     'rest_framework_simplejwt',
     'django_filters',
     'django.contrib.admin',
@@ -41,6 +40,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'api_yamdb.urls'
@@ -74,7 +74,11 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'postgres'),
         'HOST': os.getenv('DB_HOST', 'db'),
-        'PORT': os.getenv('DB_PORT', '5432')
+        'PORT': os.getenv('DB_PORT', '5432'),
+        # Постоянные соединения: воркер не открывает соединение
+        # на каждый запрос. Перед повторным использованием соединение
+        # проверяется в начале запроса (api/signals.py).
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
     }
 }
 
@@ -133,23 +137,143 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Отзыв JWT (users/revocation.py): отозванные токены проверяются
+# по фильтру Блума в памяти процесса, который дочитывает новые записи
+# из БД не чаще раза в REVOCATION_REFRESH_SECONDS секунд.
+
+REVOCATION_REFRESH_SECONDS = 2
+REVOCATION_REBUILD_SECONDS = 3600
+REVOCATION_BLOOM_CAPACITY = 100000
+REVOCATION_BLOOM_ERROR_RATE = 0.001
+
 # REST - FRAMEWORK
 
 REST_FRAMEWORK = {
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.RevocableJWTAuthentication',
     ),
 
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
 
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.CountModePageNumberPagination",
     "PAGE_SIZE": 5,
 
 }
 
+# Наибольшее число ключей пакетного запроса ?ids= и ?usernames=
+# (api/mixins.py).
+
+BATCH_GET_MAX_SIZE = int(os.getenv('BATCH_GET_MAX_SIZE', 100))
+
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Время жизни копии slug -> id категорий и жанров в процессе
+# (reviews/slugs.py), если версия в общем кеше не менялась.
+SLUG_CACHE_TIMEOUT = int(os.getenv('SLUG_CACHE_TIMEOUT', 60))
+
+# Подсказки /titles/autocomplete/ (reviews/autocomplete.py): размер ответа,
+# число произведений в индексе процесса и период учета новых отзывов.
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_TITLES = int(os.getenv('AUTOCOMPLETE_MAX_TITLES', 100000))
+AUTOCOMPLETE_REFRESH_SECONDS = int(
+    os.getenv('AUTOCOMPLETE_REFRESH_SECONDS', 300)
+)
+
+# Поиск почти одинаковых отзывов и комментариев (reviews/duplicates.py).
+# NUM_PERM должно делиться на BANDS; при 16 полосах по 8 значений пара
+# попадает в кандидаты с вероятностью 1/2 при сходстве около 0.7.
+
+DUPLICATE_NUM_PERM = 128
+DUPLICATE_BANDS = 16
+DUPLICATE_SHINGLE_SIZE = 3
+DUPLICATE_MIN_WORDS = 8
+DUPLICATE_THRESHOLD = 0.8
+DUPLICATE_MAX_CANDIDATES = 50
+
+# Кеширование ответов каталога на nginx (infra/nginx/default.conf).
+# CACHE_REFRESH_URL - служебный адрес nginx для сброса кеша;
+# PUBLIC_BASE_URL - адрес API в ссылках перезапрошенных страниц.
+
+CATALOG_CACHE_MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', 60))
+CACHE_REFRESH_URL = os.getenv('CACHE_REFRESH_URL', '')
+PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL', 'http://localhost')
+
+# Фоновые задачи (reviews/jobs.py): воркер отмечает выполняющуюся задачу
+# раз в JOB_HEARTBEAT_SECONDS, задача без отметки дольше JOB_STALE_SECONDS
+# возвращается в очередь, но не больше JOB_MAX_ATTEMPTS раз.
+
+JOB_HEARTBEAT_SECONDS = 30
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 300))
+JOB_MAX_ATTEMPTS = 3
+
+# Снимки каталога в статических файлах (api/snapshots.py). nginx отдает
+# их из SNAPSHOT_ROOT; SNAPSHOT_BASE_URL - адрес API в ссылках снимков.
+
+SNAPSHOTS_ENABLED = os.getenv('SNAPSHOTS_ENABLED', 'False') == 'True'
+SNAPSHOT_ROOT = os.getenv('SNAPSHOT_ROOT', os.path.join(BASE_DIR, 'snapshots'))
+SNAPSHOT_BASE_URL = os.getenv('SNAPSHOT_BASE_URL', PUBLIC_BASE_URL)
+SNAPSHOT_PAGES = int(os.getenv('SNAPSHOT_PAGES', 10))
+
+# Конфигурация полнотекстового поиска Postgres по отзывам и комментариям.
+# При изменении нужна миграция, пересоздающая триггеры search_vector.
+
+SEARCH_CONFIG = 'russian'
+
+# Число похожих произведений, сохраняемых командой build_similar_titles.
+
+SIMILAR_TITLES_TOP_K = int(os.getenv('SIMILAR_TITLES_TOP_K', 10))
+
+# Число отзывов и комментариев к каждому из них в ответе
+# /titles/{id}/?include=reviews,comments (api/embedding.py).
+
+TITLE_EMBEDDED_REVIEWS = int(os.getenv('TITLE_EMBEDDED_REVIEWS', 5))
+TITLE_EMBEDDED_COMMENTS = int(os.getenv('TITLE_EMBEDDED_COMMENTS', 3))
+
+# Поток событий отзывов и комментариев /titles/{id}/events/
+# (api/events.py, api/stream.py). PostgresBackend доставляет события
+# от воркеров gunicorn в ASGI-процесс через LISTEN/NOTIFY.
+
+EVENTS_BACKEND = os.getenv(
+    'EVENTS_BACKEND',
+    'api.events.PostgresBackend'
+    if 'postgresql' in DATABASES['default']['ENGINE']
+    else 'api.events.LocalBackend'
+)
+EVENTS_CHANNEL = 'yamdb_events'
+EVENTS_BUFFER_SIZE = int(os.getenv('EVENTS_BUFFER_SIZE', 1000))
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
+EVENTS_HEARTBEAT = int(os.getenv('EVENTS_HEARTBEAT', 15))
+EVENTS_RETRY_MS = int(os.getenv('EVENTS_RETRY_MS', 3000))
+
+# Журнал изменений /changes/: размер страницы и возраст записей,
+# после которого compact_changes оставляет только последнюю запись объекта.
+
+CHANGES_PAGE_SIZE = int(os.getenv('CHANGES_PAGE_SIZE', 100))
+CHANGES_MAX_PAGE_SIZE = 1000
+CHANGES_COMPACT_AFTER_DAYS = int(os.getenv('CHANGES_COMPACT_AFTER_DAYS', 7))
+
+# Профилирование запросов (api/profiling.py): по ?_profile=1 от администратора
+# и доля PROFILE_SAMPLE_RATE (0..1) всех запросов.
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True') == 'True'
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 200))
+
 # Internationalization
 
 LANGUAGE_CODE = 'en-us'
@@ -173,10 +297,24 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Постеры произведений (reviews/posters.py): ширина вариантов в пикселях,
+# качество WebP, число процессов обработки в воркере run_jobs.
+
+POSTER_SIZES = {'small': 160, 'medium': 320, 'large': 640}
+POSTER_QUALITY = 80
+POSTER_MAX_SIZE = 10 * 1024 * 1024
+POSTER_PROCESSES = 2
+POSTER_TIMEOUT = 60
+
 AUTH_USER_MODEL = 'users.User'
 
 # Swagger
 
+# Документация (/swagger/, /redoc/) и генерация схемы через drf_yasg.
+# Собранная командой build_schema схема раздается как статика.
+API_DOCS_ENABLED = os.getenv('API_DOCS_ENABLED', 'True') == 'True'
+API_SCHEMA_DIR = os.path.join(STATIC_ROOT, 'schema')
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'Bearer': {
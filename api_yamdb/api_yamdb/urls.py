@@ -4,39 +4,35 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import TemplateView
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework.permissions import AllowAny
+
+from .schema import DocsView, schema_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('users.urls')),
     path('api/', include('api.urls')),
-    path(
-        'redoc/',
-        TemplateView.as_view(template_name='redoc.html'),
-        name='redoc'
-    ),
 ]
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Yatube API",
-        default_version='v1',
-        description="Документация для приложения Yambd",
-        contact=openapi.Contact(email="yamdb17@gmail.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=(AllowAny,),
-)
-
-urlpatterns += [
-    re_path(r'^swagger(?P<format>\.json|\.yaml)$',
-            schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    re_path(r'^swagger/$', schema_view.with_ui('swagger', cache_timeout=0),
-            name='schema-swagger-ui'),
-]
+if settings.API_DOCS_ENABLED:
+    urlpatterns += [
+        path(
+            'redoc/',
+            DocsView.as_view(template_name='redoc.html'),
+            name='redoc'
+        ),
+        re_path(r'^swagger(?P<format>\.json|\.yaml)$',
+                schema_view, name='schema-json'),
+        path('swagger/', DocsView.as_view(template_name='swagger.html'),
+             name='schema-swagger-ui'),
+    ]
+else:
+    urlpatterns += [
+        path(
+            'redoc/',
+            TemplateView.as_view(template_name='redoc.html'),
+            name='redoc'
+        ),
+    ]
 
 if settings.DEBUG:
     urlpatterns += static(
@@ -0,0 +1,76 @@
+"""
+Конфигурация gunicorn для production.
+
+Значения по умолчанию рассчитаны на контейнер с приложением:
+число воркеров определяется по доступным контейнеру ядрам,
+каждый воркер обслуживает несколько запросов потоками (gthread).
+Любой параметр переопределяется переменной окружения GUNICORN_*.
+"""
+import os
+
+
+def cpu_count():
+    """Число ядер с учетом cpuset и квоты CPU контейнера (cgroup v1/v2)."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    quota_files = (
+        ('/sys/fs/cgroup/cpu.max', None),
+        ('/sys/fs/cgroup/cpu/cpu.cfs_quota_us',
+         '/sys/fs/cgroup/cpu/cpu.cfs_period_us'),
+    )
+    for quota_file, period_file in quota_files:
+        try:
+            with open(quota_file) as file:
+                values = file.read().split()
+            if period_file is not None:
+                with open(period_file) as file:
+                    values.append(file.read().strip())
+        except OSError:
+            continue
+        if values[0] not in ('max', '-1'):
+            count = min(count, max(1, int(values[0]) // int(values[1])))
+        break
+    return count
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+workers = int(os.getenv('GUNICORN_WORKERS', cpu_count() * 2 + 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Приложение загружается в мастер-процессе до fork: воркеры разделяют
+# память с импортированным кодом (copy-on-write) и быстрее стартуют.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Перезапуск воркеров после N запросов ограничивает рост памяти,
+# jitter не дает всем воркерам перезапуститься одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Heartbeat-файлы воркеров в tmpfs: запись на overlayfs контейнера
+# может блокировать воркер.
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOGLEVEL', 'info')
+
+
+def pre_fork(server, worker):
+    """
+    Соединения с БД, открытые мастером при preload_app, закрываются
+    в мастере до fork: воркер не наследует сокет, общий с мастером
+    и другими воркерами, и открывает собственное соединение.
+    """
+    from django.db import connections
+
+    for connection in connections.all():
+        connection.close()
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Category, Comment, Genre, Review, Title
+from .models import Category, Comment, Genre, Job, Review, Title
+from .search import search_texts
 
 
 @admin.register(Title)
@@ -68,7 +69,7 @@ class ReviewAdmin(admin.ModelAdmin):
 
     Attributes:
         list_display: отображаемые поля.
-        search_fields: интерфейс для поиска по дате.
+        search_fields: интерфейс для полнотекстового поиска по тексту.
         list_filter: возможность фильтрации по дате.
     """
 
@@ -77,11 +78,20 @@ class ReviewAdmin(admin.ModelAdmin):
         'text',
         'author',
         'score',
+        'is_hidden',
     )
-    search_fields = ('pub_date',)
-    list_filter = ('pub_date',)
+    search_fields = ('text',)
+    list_filter = ('pub_date', 'is_hidden')
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        return Review.all_objects.all()
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_texts(queryset, search_term), False
+
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
@@ -89,7 +99,7 @@ class CommentAdmin(admin.ModelAdmin):
 
     Attributes:
         list_display: отображаемые поля.
-        search_fields: интерфейс для поиска по отзыву.
+        search_fields: интерфейс для полнотекстового поиска по тексту.
         list_filter: возможность фильтрации по отзыву.
     """
 
@@ -98,7 +108,38 @@ class CommentAdmin(admin.ModelAdmin):
         'text',
         'author',
         'pub_date',
+        'is_hidden',
     )
-    search_fields = ('review',)
-    list_filter = ('review',)
+    search_fields = ('text',)
+    list_filter = ('review', 'is_hidden')
     empty_value_display = '-пусто-'
+
+    def get_queryset(self, request):
+        return Comment.all_objects.all()
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_texts(queryset, search_term), False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Конфигурация отображения данных.
+
+    Attributes:
+        list_display: отображаемые поля.
+        list_filter: возможность фильтрации по типу и состоянию.
+    """
+
+    list_display = (
+        'id',
+        'kind',
+        'status',
+        'processed',
+        'total',
+        'created',
+        'finished',
+    )
+    list_filter = ('kind', 'status')
+    readonly_fields = ('started', 'finished', 'heartbeat', 'attempts')
@@ -0,0 +1,155 @@
+"""
+Подсказки произведений по началу названия.
+
+Процесс держит в памяти индекс: названия в нижнем регистре,
+отсортированные для bisect, и место каждого произведения в порядке
+популярности (число отзывов, затем id). Названия с общим началом
+лежат подряд; из их мест numpy выбирает AUTOCOMPLETE_LIMIT наименьших,
+поэтому запрос не обращается к БД. В индекс попадают
+AUTOCOMPLETE_MAX_TITLES самых популярных произведений.
+
+Индекс строится при первом запросе и перестраивается, когда меняется
+версия в кеше Django (сохранение и удаление произведений) или
+начинается новый период AUTOCOMPLETE_REFRESH_SECONDS, за который
+накопились новые отзывы. Периоды отсчитываются от начала эпохи.
+Версия читается из кеша не чаще раза в VERSION_CHECK_SECONDS.
+
+Устаревший индекс перестраивается в фоновом потоке, запросы до конца
+перестройки отвечают по старому. Поток начинает со случайной задержки
+до REBUILD_JITTER_SECONDS, чтобы процессы не читали произведения
+из БД одновременно.
+"""
+import bisect
+import logging
+import operator
+import random
+import threading
+import time
+import uuid
+from functools import lru_cache, reduce
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, IntegerField
+from django.db.models.functions import Coalesce
+
+from .models import ScoreHistogram, Title
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'title-autocomplete'
+VERSION_CHECK_SECONDS = 1
+REBUILD_JITTER_SECONDS = 5
+# Больше любого символа названия: конец диапазона названий с началом.
+PREFIX_END = '\U0010ffff'
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def get_popularity():
+    """Число видимых отзывов произведения по счетчикам ScoreHistogram."""
+    return Coalesce(
+        reduce(operator.add, (
+            F(f'score_histogram__{ScoreHistogram.field_name(score)}')
+            for score in ScoreHistogram.SCORES
+        )),
+        0,
+        output_field=IntegerField()
+    )
+
+
+class TitleAutocomplete:
+    """Индекс названий произведений одного процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.version = None
+        self.checked_at = None
+        self.rebuilding = False
+
+    def get_version(self):
+        period = int(time.time() // settings.AUTOCOMPLETE_REFRESH_SECONDS)
+        return cache.get(VERSION_KEY), period
+
+    def build(self):
+        """(названия по алфавиту, места произведений, (id, название))."""
+        titles = list(Title.objects.annotate(
+            popularity=get_popularity()
+        ).order_by('-popularity', 'pk').values_list('pk', 'name')[
+            :settings.AUTOCOMPLETE_MAX_TITLES
+        ])
+        names = [normalize(name) for _, name in titles]
+        order = sorted(range(len(titles)), key=names.__getitem__)
+        return (
+            [names[rank] for rank in order],
+            np.array(order, dtype=np.int32),
+            titles,
+        )
+
+    def refresh(self):
+        """
+        Первый индекс строится в запросе, остальные потоки ждут его.
+        Устаревший индекс перестраивается в фоновом потоке.
+        """
+        now = time.monotonic()
+        if (
+            self.checked_at is not None
+            and now - self.checked_at < VERSION_CHECK_SECONDS
+        ):
+            return
+        version = self.get_version()
+        self.checked_at = now
+        if version == self.version:
+            return
+        with self.lock:
+            if self.index is None:
+                self.index, self.version = self.build(), version
+                return
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(target=self.rebuild, daemon=True).start()
+
+    def rebuild(self):
+        """Перестройка в фоне; версия читается после задержки."""
+        try:
+            time.sleep(random.uniform(0, REBUILD_JITTER_SECONDS))
+            version = self.get_version()
+            index = self.build()
+            with self.lock:
+                self.index, self.version = index, version
+        except DatabaseError:
+            logger.exception('Title autocomplete rebuild failed')
+        finally:
+            self.rebuilding = False
+            connection.close()
+
+    def search(self, prefix, limit):
+        """До limit пар (id, название) по убыванию популярности."""
+        self.refresh()
+        names, ranks, titles = self.index
+        prefix = normalize(prefix)
+        start = bisect.bisect_left(names, prefix)
+        end = bisect.bisect_left(names, prefix + PREFIX_END, start)
+        found = ranks[start:end]
+        if len(found) > limit:
+            found = np.partition(found, limit - 1)[:limit]
+        return [titles[rank] for rank in np.sort(found)]
+
+    def invalidate(self):
+        """Новая версия после фиксации транзакции."""
+        def set_version():
+            cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+            self.checked_at = None
+
+        transaction.on_commit(set_version)
+
+
+@lru_cache(maxsize=None)
+def get_title_autocomplete():
+    return TitleAutocomplete()
@@ -0,0 +1,21 @@
+from django.db.models import Exists, OuterRef
+
+from .models import Change
+
+
+def compact_changes(before):
+    """
+    Сжатие журнала изменений: из записей старше before удаляются те,
+    у объекта которых есть более поздняя запись. Последняя запись
+    каждого объекта, в том числе об удалении, остается, поэтому клиент
+    с любым старым курсором получает актуальное состояние.
+    """
+    newer = Change.objects.filter(
+        model=OuterRef('model'),
+        object_id=OuterRef('object_id'),
+        id__gt=OuterRef('id')
+    )
+    deleted, _ = Change.objects.filter(
+        Exists(newer), changed_at__lt=before
+    ).delete()
+    return deleted
@@ -0,0 +1,67 @@
+"""
+Фоновое удаление пользователей и произведений.
+
+Запрос на удаление только помечает объект is_deleted (менеджер objects
+его больше не возвращает) и ставит задачу. Задача удаляет отзывы
+и комментарии пачками теми же операциями, что и массовая модерация,
+а затем сам объект, у которого к этому моменту остаются только
+немногочисленные связи.
+
+Отзывы и комментарии удаляемого пользователя менеджеры objects
+не возвращают сразу: они фильтруют объекты по author__is_deleted,
+поэтому запрос не зависит от числа отзывов пользователя.
+"""
+from django.db import transaction
+from users.models import User
+
+from .jobs import enqueue_job, job_handler, report_progress
+from .models import Comment, Review, Title
+from .moderation import DELETE, moderate_in_chunks
+
+PURGE_JOB = 'purge'
+
+PURGE_MODELS = {
+    'title': Title,
+    'user': User,
+}
+
+
+def schedule_deletion(instance, user=None):
+    """
+    Пометка объекта удаленным и постановка задачи на удаление.
+    У пользователя освобождаются username и email, чтобы их можно
+    было занять до окончания удаления; новое имя не проходит
+    validate_username и не совпадет с именем живого пользователя.
+    """
+    instance.is_deleted = True
+    fields = ['is_deleted']
+    if isinstance(instance, User):
+        instance.username = f'~deleted-{instance.pk}'
+        instance.email = f'deleted-{instance.pk}@deleted.invalid'
+        fields += ['username', 'email']
+    with transaction.atomic():
+        instance.save(update_fields=fields)
+        return enqueue_job(
+            PURGE_JOB,
+            {'model': instance._meta.model_name, 'id': instance.pk},
+            user=user
+        )
+
+
+@job_handler(PURGE_JOB)
+def run_purge(job):
+    model = PURGE_MODELS[job.params['model']]
+    pk = job.params['id']
+    if model is Title:
+        reviews = Review.all_objects.filter(title_id=pk)
+        comments = Comment.all_objects.none()
+    else:
+        reviews = Review.all_objects.filter(author_id=pk)
+        comments = Comment.all_objects.filter(author_id=pk)
+    report_progress(job, 0, reviews.count() + comments.count() + 1)
+    processed = moderate_in_chunks(job, reviews.order_by('pk'), DELETE)
+    processed = moderate_in_chunks(
+        job, comments.order_by('pk'), DELETE, processed
+    )
+    model.all_objects.filter(pk=pk, is_deleted=True).delete()
+    report_progress(job, processed + 1)
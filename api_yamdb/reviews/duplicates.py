@@ -0,0 +1,289 @@
+"""
+Поиск почти одинаковых отзывов и комментариев (MinHash + LSH).
+
+Текст разбивается на шинглы из DUPLICATE_SHINGLE_SIZE слов, сигнатура -
+минимумы DUPLICATE_NUM_PERM хеш-функций (a * x + b) mod p по хешам
+шинглов. Доля совпавших значений двух сигнатур оценивает коэффициент
+Жаккара их множеств шинглов.
+
+Сигнатура делится на DUPLICATE_BANDS полос, хеш каждой полосы - ключ
+корзины TextBucket. Кандидаты для нового текста - тексты, совпавшие
+с ним хотя бы в одной полосе: один запрос по индексу корзин, число строк
+зависит от числа похожих текстов, а не от размера корпуса. Пары
+со сходством не ниже DUPLICATE_THRESHOLD сохраняются в DuplicateCandidate
+для модераторов. Тексты короче DUPLICATE_MIN_WORDS слов не проверяются.
+"""
+import re
+import zlib
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import (Comment, DuplicateCandidate, Review, TextBucket,
+                     TextSignature)
+
+TEXT_MODELS = {
+    'reviews': Review,
+    'comments': Comment,
+}
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+# Параметры хеш-функций одинаковы во всех процессах.
+PERMUTATIONS_SEED = 1
+BAND_MULTIPLIER = 0x100000001B3
+
+WORD = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=None)
+def get_permutations():
+    generator = np.random.RandomState(PERMUTATIONS_SEED)
+    size = settings.DUPLICATE_NUM_PERM
+    return (
+        generator.randint(1, 1 << 31, size=size, dtype=np.uint64),
+        generator.randint(0, 1 << 31, size=size, dtype=np.uint64),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_band_weights():
+    rows = settings.DUPLICATE_NUM_PERM // settings.DUPLICATE_BANDS
+    return np.array(
+        [pow(BAND_MULTIPLIER, power, 1 << 64) for power in range(rows)],
+        dtype=np.uint64
+    )
+
+
+def get_shingles(text):
+    """Хеши шинглов текста или None для коротких текстов."""
+    words = WORD.findall(text.lower())
+    if len(words) < settings.DUPLICATE_MIN_WORDS:
+        return None
+    size = settings.DUPLICATE_SHINGLE_SIZE
+    return np.array(sorted({
+        zlib.crc32(' '.join(words[start:start + size]).encode())
+        for start in range(len(words) - size + 1)
+    }), dtype=np.uint64)
+
+
+def compute_signatures(texts):
+    """
+    Сигнатуры пачки текстов: хеши шинглов всех текстов обрабатываются
+    одной матричной операцией, минимумы по текстам - reduceat.
+    Для коротких текстов - None.
+    """
+    shingles = [get_shingles(text) for text in texts]
+    rows = [row for row, hashes in enumerate(shingles) if hashes is not None]
+    signatures = [None] * len(texts)
+    if not rows:
+        return signatures
+    hashes = np.concatenate([shingles[row] for row in rows])
+    offsets = np.cumsum([0] + [len(shingles[row]) for row in rows[:-1]])
+    a, b = get_permutations()
+    values = ((hashes[:, None] * a + b) % MERSENNE_PRIME) & MAX_HASH
+    minimums = np.minimum.reduceat(values, offsets, axis=0)
+    for row, signature in zip(rows, minimums.astype(np.uint32)):
+        signatures[row] = signature
+    return signatures
+
+
+def get_buckets(signatures):
+    """
+    Ключи корзин: матрица число сигнатур × DUPLICATE_BANDS.
+    Номер полосы входит в хеш, поэтому индекс нужен по одной колонке.
+    """
+    bands = settings.DUPLICATE_BANDS
+    parts = signatures.astype(np.uint64).reshape(len(signatures), bands, -1)
+    band_numbers = np.arange(1, bands + 1, dtype=np.uint64)
+    hashes = (parts * get_band_weights()).sum(axis=2, dtype=np.uint64)
+    return (hashes + band_numbers * np.uint64(BAND_MULTIPLIER)).view(
+        np.int64
+    )
+
+
+def delete_signatures(signatures):
+    """Удаление сигнатур с корзинами без загрузки объектов."""
+    TextBucket.objects.filter(signature__in=signatures).delete()
+    signatures.delete()
+
+
+def find_duplicates(signature_ids, matrix, buckets):
+    """
+    Пары (id сигнатуры, id похожей сигнатуры, сходство) для сигнатур
+    пачки и загруженные похожие сигнатуры. Кандидаты - сигнатуры
+    из общих корзин, не больше DUPLICATE_MAX_CANDIDATES на текст.
+    """
+    members = {}
+    for bucket, signature_id in TextBucket.objects.filter(
+        bucket__in={int(bucket) for bucket in buckets.ravel()}
+    ).values_list('bucket', 'signature_id'):
+        members.setdefault(bucket, set()).add(signature_id)
+    candidates = {}
+    for signature_id, row in zip(signature_ids, buckets):
+        found = set().union(*(members.get(int(key), ()) for key in row))
+        found.discard(signature_id)
+        candidates[signature_id] = sorted(found, reverse=True)[
+            :settings.DUPLICATE_MAX_CANDIDATES
+        ]
+    others = TextSignature.objects.in_bulk(
+        set().union(*candidates.values())
+    )
+    pairs = []
+    for signature_id, signature in zip(signature_ids, matrix):
+        for other_id in candidates[signature_id]:
+            other = np.frombuffer(others[other_id].signature, np.uint32)
+            similarity = float((signature == other).mean())
+            if similarity >= settings.DUPLICATE_THRESHOLD:
+                pairs.append((signature_id, other_id, similarity))
+    return pairs, others
+
+
+def save_candidates(pairs, signatures):
+    """
+    Запись пар: каждая один раз, более новым считается текст
+    с большим id сигнатуры.
+    """
+    candidates = {}
+    for first, second, similarity in pairs:
+        newer = signatures[max(first, second)]
+        older = signatures[min(first, second)]
+        candidates[(newer.kind, newer.object_id, older.kind,
+                    older.object_id)] = similarity
+    DuplicateCandidate.objects.bulk_create(
+        [
+            DuplicateCandidate(
+                kind=kind, object_id=object_id, duplicate_kind=other_kind,
+                duplicate_id=other_id, similarity=similarity
+            )
+            for (kind, object_id, other_kind, other_id), similarity
+            in candidates.items()
+        ],
+        ignore_conflicts=True
+    )
+    return len(candidates)
+
+
+def index_texts(kind, objects, replace=True):
+    """
+    Сигнатуры, корзины и почти дубликаты для отзывов или комментариев.
+    С replace прежние сигнатуры и найденные пары объектов заменяются.
+    Возвращает число найденных пар.
+    """
+    object_ids = [obj.pk for obj in objects]
+    signed = [
+        (obj.pk, signature)
+        for obj, signature in zip(
+            objects, compute_signatures([obj.text for obj in objects])
+        )
+        if signature is not None
+    ]
+    with transaction.atomic():
+        if replace:
+            delete_signatures(TextSignature.objects.filter(
+                kind=kind, object_id__in=object_ids
+            ))
+            DuplicateCandidate.objects.filter(
+                kind=kind, object_id__in=object_ids
+            ).delete()
+            DuplicateCandidate.objects.filter(
+                duplicate_kind=kind, duplicate_id__in=object_ids
+            ).delete()
+        if not signed:
+            return 0
+        TextSignature.objects.bulk_create([
+            TextSignature(
+                kind=kind, object_id=pk, signature=signature.tobytes()
+            )
+            for pk, signature in signed
+        ])
+        signatures = {
+            signature.object_id: signature
+            for signature in TextSignature.objects.filter(
+                kind=kind, object_id__in=[pk for pk, _ in signed]
+            ).only('id', 'kind', 'object_id')
+        }
+        signature_ids = [signatures[pk].pk for pk, _ in signed]
+        matrix = np.stack([signature for _, signature in signed])
+        buckets = get_buckets(matrix)
+        TextBucket.objects.bulk_create([
+            TextBucket(signature_id=signature_id, bucket=int(bucket))
+            for signature_id, row in zip(signature_ids, buckets)
+            for bucket in row
+        ])
+        pairs, others = find_duplicates(signature_ids, matrix, buckets)
+        others.update(
+            (signature.pk, signature) for signature in signatures.values()
+        )
+        return save_candidates(pairs, others)
+
+
+def index_text(instance, created):
+    """Проверка сохраненного отзыва или комментария."""
+    kind = 'reviews' if isinstance(instance, Review) else 'comments'
+    return index_texts(kind, [instance], replace=not created)
+
+
+def prune_signatures(kind):
+    """Удаление сигнатур и пар удаленных объектов."""
+    existing = TEXT_MODELS[kind].all_objects.values('id')
+    delete_signatures(TextSignature.objects.filter(kind=kind).exclude(
+        object_id__in=existing
+    ))
+    DuplicateCandidate.objects.filter(kind=kind).exclude(
+        object_id__in=existing
+    ).delete()
+    DuplicateCandidate.objects.filter(duplicate_kind=kind).exclude(
+        duplicate_id__in=existing
+    ).delete()
+
+
+def build_text_signatures(kind, chunk_size, rebuild=False):
+    """
+    Сигнатуры существующих текстов пачками по chunk_size.
+    Без rebuild обрабатываются только тексты без сигнатуры.
+    Возвращает (число текстов, число найденных пар).
+    """
+    model = TEXT_MODELS[kind]
+    if rebuild:
+        delete_signatures(TextSignature.objects.filter(kind=kind))
+        DuplicateCandidate.objects.filter(kind=kind).delete()
+    else:
+        prune_signatures(kind)
+    processed = found = 0
+    last_id = 0
+    while True:
+        objects = list(model.all_objects.filter(pk__gt=last_id).exclude(
+            pk__in=TextSignature.objects.filter(kind=kind).values(
+                'object_id'
+            )
+        ).only('id', 'text').order_by('pk')[:chunk_size])
+        if not objects:
+            return processed, found
+        last_id = objects[-1].pk
+        found += index_texts(kind, objects, replace=False)
+        processed += len(objects)
+
+
+def attach_texts(candidates):
+    """Тексты обеих сторон пар; у удаленных объектов - None."""
+    ids = {}
+    for candidate in candidates:
+        ids.setdefault(candidate.kind, set()).add(candidate.object_id)
+        ids.setdefault(candidate.duplicate_kind, set()).add(
+            candidate.duplicate_id
+        )
+    texts = {
+        kind: dict(TEXT_MODELS[kind].all_objects.filter(
+            pk__in=object_ids
+        ).values_list('id', 'text'))
+        for kind, object_ids in ids.items()
+    }
+    for candidate in candidates:
+        candidate.text = texts[candidate.kind].get(candidate.object_id)
+        candidate.duplicate_text = texts[candidate.duplicate_kind].get(
+            candidate.duplicate_id
+        )
+    return candidates
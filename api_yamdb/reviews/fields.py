@@ -0,0 +1,79 @@
+from django.db import models
+
+
+class IntegerSetField(models.Field):
+    """
+    Множество целых чисел в одной колонке.
+
+    На Postgres - integer[] (индексируется GIN), на остальных СУБД -
+    строка вида ',1,5,'. Поиск по множеству - лукапами all и any.
+    """
+
+    description = 'Set of integers'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('default', list)
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'integer[]'
+        return 'text'
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is None:
+            return None
+        value = sorted({int(item) for item in value})
+        if connection.vendor == 'postgresql':
+            return value
+        return ',' + ''.join(f'{item},' for item in value)
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, str):
+            return [int(item) for item in value.split(',') if item]
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            return [int(item) for item in value.split(',') if item]
+        return value
+
+
+class IntegerSetLookup(models.Lookup):
+    """Проверка вхождения в множество всех (all) или любого (any) из чисел."""
+
+    pg_operator = None
+    connector = None
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        lhs, params = self.process_lhs(compiler, connection)
+        values = sorted({int(item) for item in self.rhs})
+        if not values:
+            return '1 = 1' if self.connector == 'AND' else '1 = 0', []
+        if connection.vendor == 'postgresql':
+            return f'{lhs} {self.pg_operator} %s::integer[]', [
+                *params, values
+            ]
+        condition = f' {self.connector} '.join(
+            f'{lhs} LIKE %s' for _ in values
+        )
+        sql_params = []
+        for item in values:
+            sql_params += [*params, f'%,{item},%']
+        return f'({condition})', sql_params
+
+
+@IntegerSetField.register_lookup
+class ContainsAll(IntegerSetLookup):
+    lookup_name = 'all'
+    pg_operator = '@>'
+    connector = 'AND'
+
+
+@IntegerSetField.register_lookup
+class ContainsAny(IntegerSetLookup):
+    lookup_name = 'any'
+    pg_operator = '&&'
+    connector = 'OR'
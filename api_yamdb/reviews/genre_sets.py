@@ -0,0 +1,15 @@
+from .models import Title
+
+GenreTitle = Title.genre.through
+
+
+def refresh_genre_ids(title_ids):
+    """Пересчет Title.genre_ids по связям произведений с жанрами."""
+    title_ids = {int(title_id) for title_id in title_ids}
+    genre_ids = {title_id: [] for title_id in title_ids}
+    for title_id, genre_id in GenreTitle.objects.filter(
+        title_id__in=title_ids
+    ).values_list('title_id', 'genre_id'):
+        genre_ids[title_id].append(genre_id)
+    for title_id, ids in genre_ids.items():
+        Title.all_objects.filter(pk=title_id).update(genre_ids=ids)
@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Review, ScoreHistogram
+
+
+def change_score_count(title_id, score, delta):
+    """Изменение счетчика оценки score произведения на delta."""
+    field = ScoreHistogram.field_name(score)
+    value = Greatest(F(field) + delta, 0)
+    updated = ScoreHistogram.objects.filter(title_id=title_id).update(
+        **{field: value}
+    )
+    if not updated and delta > 0:
+        ScoreHistogram.objects.get_or_create(title_id=title_id)
+        ScoreHistogram.objects.filter(title_id=title_id).update(
+            **{field: value}
+        )
+
+
+def rebuild_histograms(title_ids=None):
+    """
+    Пересчет гистограмм по отзывам.
+    Без title_ids пересчитываются все произведения с отзывами.
+    """
+    reviews = Review.objects.all()
+    if title_ids is not None:
+        reviews = reviews.filter(title_id__in=title_ids)
+    histograms = {}
+    for row in reviews.values('title_id', 'score').annotate(
+        count=Count('id')
+    ).order_by():
+        histogram = histograms.setdefault(
+            row['title_id'], ScoreHistogram(title_id=row['title_id'])
+        )
+        setattr(
+            histogram, ScoreHistogram.field_name(row['score']), row['count']
+        )
+
+    with transaction.atomic():
+        stale = ScoreHistogram.objects.all()
+        if title_ids is not None:
+            stale = stale.filter(title_id__in=title_ids)
+        stale.delete()
+        ScoreHistogram.objects.bulk_create(histograms.values())
+    return len(histograms)
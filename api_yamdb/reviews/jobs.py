@@ -0,0 +1,139 @@
+"""
+Фоновые задачи.
+
+Задача - строка Job с типом и параметрами. Обработчики регистрируются
+декоратором job_handler и выполняются командой run_jobs вне веб-воркеров.
+Обработчик сам делит работу на короткие транзакции и сообщает прогресс
+через report_progress.
+
+Пока задача выполняется, отдельный поток воркера раз в
+JOB_HEARTBEAT_SECONDS обновляет Job.heartbeat. Задачу без отметки дольше
+JOB_STALE_SECONDS (воркер остановлен или упал) следующий claim_job
+возвращает в очередь, после JOB_MAX_ATTEMPTS захватов - завершает
+с ошибкой. Поэтому обработчики должны допускать повторный запуск:
+уже обработанные объекты не выбираются снова.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Регистрация обработчика задач типа kind."""
+
+    def register(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+
+    return register
+
+
+def enqueue_job(kind, params, user=None):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    return Job.objects.create(kind=kind, params=params, created_by=user)
+
+
+def report_progress(job, processed, total=None):
+    job.processed = processed
+    fields = ['processed']
+    if total is not None:
+        job.total = total
+        fields.append('total')
+    Job.objects.filter(pk=job.pk).update(
+        **{field: getattr(job, field) for field in fields}
+    )
+
+
+def requeue_stale_jobs():
+    """Возврат в очередь задач, воркер которых перестал отмечаться."""
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    stale = Job.objects.filter(
+        Q(heartbeat__lt=stale_before)
+        | Q(heartbeat__isnull=True, started__lt=stale_before),
+        status=Job.RUNNING
+    )
+    failed = stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+        status=Job.FAILED,
+        error='Воркер остановился во время выполнения задачи.',
+        finished=now
+    )
+    requeued = stale.update(status=Job.PENDING)
+    if failed or requeued:
+        logger.warning(
+            'Stale jobs: %s requeued, %s failed', requeued, failed
+        )
+
+
+def claim_job():
+    """
+    Захват самой старой задачи в очереди.
+    SKIP LOCKED позволяет запускать несколько воркеров.
+    """
+    requeue_stale_jobs()
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            status=Job.PENDING
+        ).order_by('id').first()
+        if job is None:
+            return None
+        job.status = Job.RUNNING
+        job.started = job.heartbeat = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=('status', 'started', 'heartbeat', 'attempts'))
+    return job
+
+
+class Heartbeat(threading.Thread):
+    """Отметки выполняющейся задачи из отдельного потока."""
+
+    def __init__(self, job):
+        super().__init__(daemon=True)
+        self.job_id = job.pk
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.JOB_HEARTBEAT_SECONDS):
+                try:
+                    Job.objects.filter(
+                        pk=self.job_id, status=Job.RUNNING
+                    ).update(heartbeat=timezone.now())
+                except DatabaseError:
+                    logger.exception('Job %s heartbeat failed', self.job_id)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job):
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        JOB_HANDLERS[job.kind](job)
+    except Exception as error:
+        logger.exception('Job %s failed', job.pk)
+        job.status = Job.FAILED
+        job.error = str(error)
+    else:
+        job.status = Job.DONE
+    finally:
+        heartbeat.stop()
+    job.finished = timezone.now()
+    job.save(update_fields=('status', 'error', 'finished'))
+    return job
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from reviews.similarity import (build_similar_titles,
+                                refresh_stale_similar_titles)
+
+
+class Command(BaseCommand):
+    help = 'Расчет похожих произведений по отзывам, жанрам и категориям'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='пересчитать только произведения с изменившимися отзывами'
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=settings.SIMILAR_TITLES_TOP_K,
+            help='число сохраняемых похожих произведений'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100,
+            help='число произведений, обрабатываемых за один шаг'
+        )
+
+    def handle(self, *args, **options):
+        if options['incremental']:
+            count = refresh_stale_similar_titles(
+                options['top_k'], options['chunk_size']
+            )
+        else:
+            count = build_similar_titles(
+                top_k=options['top_k'], chunk_size=options['chunk_size']
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано произведений: {count}')
+        )
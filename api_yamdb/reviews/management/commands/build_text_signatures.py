@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from reviews.duplicates import TEXT_MODELS, build_text_signatures
+
+
+class Command(BaseCommand):
+    help = (
+        'MinHash-сигнатуры существующих отзывов и комментариев '
+        'и поиск почти дубликатов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            choices=list(TEXT_MODELS),
+            action='append',
+            help='обрабатывать только reviews или comments'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='число текстов, обрабатываемых за один шаг'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='пересчитать сигнатуры всех текстов'
+        )
+
+    def handle(self, *args, **options):
+        for kind in options['kind'] or TEXT_MODELS:
+            processed, found = build_text_signatures(
+                kind, options['chunk_size'], options['rebuild']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'{kind}: обработано {processed}, найдено пар {found}'
+            ))
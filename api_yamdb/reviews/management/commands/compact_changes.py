@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from reviews.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = 'Сжатие журнала изменений каталога /changes/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.CHANGES_COMPACT_AFTER_DAYS,
+            help='сжимать записи старше N дней'
+        )
+
+    def handle(self, *args, **options):
+        count = compact_changes(
+            timezone.now() - timedelta(days=options['days'])
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено записей журнала: {count}')
+        )
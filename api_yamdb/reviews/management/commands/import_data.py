@@ -1,10 +1,21 @@
 import csv
+import json
 import os
+from hashlib import md5
+from itertools import islice
 
 import django.db.utils
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.management.base import BaseCommand
-from reviews.models import Category, Comment, Genre, Review, Title
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Q
+from reviews.autocomplete import get_title_autocomplete
+from reviews.genre_sets import refresh_genre_ids
+from reviews.histograms import rebuild_histograms
+from reviews.models import (Category, Comment, Genre, ImportCheckpoint,
+                            ImportRowHash, Review, StaleSimilarTitle, Title)
+from reviews.slugs import get_slug_lookup
 from users.models import User
 
 DATA_TABLES = {
@@ -15,6 +26,13 @@ DATA_TABLES = {
     Review: 'review.csv',
     Comment: 'comments.csv'
 }
+# Команда работает со всеми строками таблиц через _base_manager:
+# менеджеры objects не возвращают скрытые и ожидающие удаления объекты.
+
+
+GenreTitle = Title.genre.through
+GENRE_TITLE_FILE = 'genre_title.csv'
+BATCH_SIZE = 1000
 
 
 def read_csv(name_file):
@@ -22,10 +40,23 @@ def read_csv(name_file):
     Считывание данных из csv и возвращение списока строк таблицы.
     """
 
+    return list(iter_csv(name_file))
+
+
+def iter_csv(name_file):
+    """Построчное чтение csv без загрузки файла в память."""
+
     path = os.path.join('static/data', name_file)
     with open(path, encoding='utf-8') as csv_file:
-        reader = csv.DictReader(csv_file, delimiter=',')
-        return list(reader)
+        yield from csv.DictReader(csv_file, delimiter=',')
+
+
+def iter_batches(rows, size):
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
 
 
 def get_list_fields_model(model):
@@ -58,7 +89,7 @@ def load_data(model, name_file):
 
     table = read_csv(name_file)
     changes_fields(get_list_fields_model(model), table)
-    model.objects.bulk_create(model(**row) for row in table)
+    model._base_manager.bulk_create(model(**row) for row in table)
 
 
 def load_genre_title():
@@ -68,7 +99,7 @@ def load_genre_title():
     """
 
     data_list = read_csv('genre_title.csv')
-    [Title.objects.get(id=row['title_id']).genre.add(
+    [Title._base_manager.get(id=row['title_id']).genre.add(
         row['genre_id']) for row in data_list]
 
 
@@ -76,7 +107,208 @@ def del_data():
     """Удаление всех таблиц из базы данных."""
 
     for model in DATA_TABLES:
-        model.objects.all().delete()
+        model._base_manager.all().delete()
+    ImportRowHash.objects.all().delete()
+    ImportCheckpoint.objects.all().delete()
+
+
+def reset_sequences():
+    """
+    Сдвиг последовательностей id после вставки строк с явными id,
+    иначе следующие объекты получат уже занятые id.
+    """
+
+    sql_list = connection.ops.sequence_reset_sql(
+        no_style(), [*DATA_TABLES, GenreTitle]
+    )
+    with connection.cursor() as cursor:
+        for sql in sql_list:
+            cursor.execute(sql)
+
+
+def row_hash(row):
+    return md5(
+        json.dumps(row, sort_keys=True, ensure_ascii=False).encode()
+    ).hexdigest()
+
+
+def genre_title_key(row):
+    return f'{row["title_id"]}:{row["genre_id"]}'
+
+
+def get_stored_hashes(name_file, keys):
+    return dict(
+        ImportRowHash.objects.filter(
+            table=name_file, key__in=keys
+        ).values_list('key', 'hash')
+    )
+
+
+def save_hashes(name_file, hashes):
+    ImportRowHash.objects.filter(table=name_file, key__in=hashes).delete()
+    ImportRowHash.objects.bulk_create(
+        ImportRowHash(table=name_file, key=key, hash=value)
+        for key, value in hashes.items()
+    )
+
+
+def mark_titles_changed(title_ids, histograms=False):
+    """
+    Обновление производных данных произведений, которые не обновляются
+    сигналами при bulk-операциях.
+    """
+
+    title_ids = {int(title_id) for title_id in title_ids}
+    if not title_ids:
+        return
+    StaleSimilarTitle.objects.bulk_create(
+        [StaleSimilarTitle(title_id=title_id) for title_id in title_ids],
+        ignore_conflicts=True
+    )
+    if histograms:
+        rebuild_histograms(title_ids)
+
+
+def upsert_batch(model, name_file, rows):
+    """
+    Вставка новых и обновление изменившихся строк пачки.
+    Строки, уже существующие в БД без сохраненного хеша
+    (загруженные через --load), обновляются.
+    """
+
+    hashes = {row['id']: row_hash(row) for row in rows}
+    stored = get_stored_hashes(name_file, list(hashes))
+    changed = [
+        row for row in rows if stored.get(row['id']) != hashes[row['id']]
+    ]
+    if not changed:
+        return 0
+    pk = model._meta.pk
+    existing = set(model._base_manager.filter(
+        pk__in=[pk.to_python(row['id']) for row in changed]
+    ).values_list('pk', flat=True))
+    fields = [name for name in changed[0] if name != 'id']
+    created, updated = [], []
+    for row in changed:
+        target = updated if pk.to_python(row['id']) in existing else created
+        target.append(model(**row))
+    model._base_manager.bulk_create(created)
+    model._base_manager.bulk_update(updated, fields)
+    save_hashes(name_file, {row['id']: hashes[row['id']] for row in changed})
+    if model is Title:
+        mark_titles_changed(row['id'] for row in changed)
+    elif model is Review:
+        mark_titles_changed(
+            (row['title_id'] for row in changed), histograms=True
+        )
+    return len(changed)
+
+
+def upsert_genre_title_batch(rows):
+    """Добавление связей произведение-жанр, которых еще нет."""
+
+    keys = {genre_title_key(row): row for row in rows}
+    stored = get_stored_hashes(GENRE_TITLE_FILE, list(keys))
+    changed = [row for key, row in keys.items() if key not in stored]
+    if not changed:
+        return 0
+    GenreTitle.objects.bulk_create(
+        [
+            GenreTitle(title_id=row['title_id'], genre_id=row['genre_id'])
+            for row in changed
+        ],
+        ignore_conflicts=True
+    )
+    save_hashes(
+        GENRE_TITLE_FILE,
+        {genre_title_key(row): row_hash(row) for row in changed}
+    )
+    mark_titles_changed(row['title_id'] for row in changed)
+    refresh_genre_ids(row['title_id'] for row in changed)
+    return len(changed)
+
+
+def delete_missing(model, name_file, keys, batch_size):
+    """
+    Удаление ранее загруженных строк, которых больше нет в csv.
+    Строки без сохраненного хеша (созданные через API) не удаляются.
+    """
+
+    missing = (
+        key for key in ImportRowHash.objects.filter(
+            table=name_file
+        ).values_list('key', flat=True).iterator()
+        if key not in keys
+    )
+    deleted = 0
+    for batch in iter_batches(list(missing), batch_size):
+        with transaction.atomic():
+            if model is GenreTitle:
+                pairs = [key.split(':') for key in batch]
+                condition = Q()
+                for title_id, genre_id in pairs:
+                    condition |= Q(title_id=title_id, genre_id=genre_id)
+                GenreTitle.objects.filter(condition).delete()
+                mark_titles_changed(title_id for title_id, _ in pairs)
+                refresh_genre_ids(title_id for title_id, _ in pairs)
+            else:
+                model._base_manager.filter(pk__in=batch).delete()
+            ImportRowHash.objects.filter(
+                table=name_file, key__in=batch
+            ).delete()
+        deleted += len(batch)
+    return deleted
+
+
+def upsert_table(model, name_file, batch_size):
+    """
+    Синхронизация таблицы с csv пачками по batch_size строк.
+    После каждой пачки сохраняется позиция в ImportCheckpoint,
+    повторный запуск продолжает с неё.
+    """
+
+    checkpoint, _ = ImportCheckpoint.objects.get_or_create(table=name_file)
+    if checkpoint.done:
+        return None
+    fields_model = get_list_fields_model(model)
+    position = checkpoint.position
+    changed = 0
+    for batch in iter_batches(
+        islice(iter_csv(name_file), position, None), batch_size
+    ):
+        with transaction.atomic():
+            if model is GenreTitle:
+                changed += upsert_genre_title_batch(batch)
+            else:
+                changes_fields(fields_model, batch)
+                changed += upsert_batch(model, name_file, batch)
+            position += len(batch)
+            ImportCheckpoint.objects.filter(table=name_file).update(
+                position=position
+            )
+
+    key = genre_title_key if model is GenreTitle else (lambda row: row['id'])
+    keys = {key(row) for row in iter_csv(name_file)}
+    deleted = delete_missing(model, name_file, keys, batch_size)
+    ImportCheckpoint.objects.filter(table=name_file).update(done=True)
+    return changed, deleted
+
+
+def upsert_data(batch_size, stdout):
+    """Синхронизация всех таблиц с csv."""
+
+    for model, name_file in [
+        *DATA_TABLES.items(), (GenreTitle, GENRE_TITLE_FILE)
+    ]:
+        result = upsert_table(model, name_file, batch_size)
+        if result is None:
+            stdout.write(f'"{name_file}" уже синхронизирован, пропуск')
+            continue
+        stdout.write(
+            f'"{name_file}": изменено {result[0]}, удалено {result[1]}'
+        )
+    reset_sequences()
+    ImportCheckpoint.objects.all().delete()
 
 
 class Command(BaseCommand):
@@ -93,28 +325,64 @@ class Command(BaseCommand):
             action='store_true',
             help='Удаление всех данных из базы данных'
         )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help=(
+                'Синхронизация БД с csv: загружаются только изменившиеся '
+                'строки, прерванный запуск продолжается с места остановки'
+            )
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать --upsert заново, не продолжая прерванный запуск'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Размер пачки строк для --upsert'
+        )
+
+    def load(self):
+        for model, name_file in DATA_TABLES.items():
+            load_data(model, name_file)
+            print(f'Загрузка "{name_file}" выполнена')
+
+        try:
+            load_genre_title()
+        except Exception as error:
+            self.stdout.write(
+                self.style.ERROR(
+                    f'Ошибка при загрузке genre_title.csv: {error}'
+                )
+            )
+        else:
+            print('Загрузка "genre_title.csv" выполнена')
+        reset_sequences()
+        # bulk_create идет мимо сигналов: гистограммы строятся заново.
+        rebuild_histograms()
+
+        self.stdout.write(
+            self.style.SUCCESS('Данные загружены в базу данных.')
+        )
+
+    def upsert(self, batch_size, restart):
+        if restart:
+            ImportCheckpoint.objects.all().delete()
+        upsert_data(batch_size, self.stdout)
+        self.stdout.write(
+            self.style.SUCCESS('База данных синхронизирована с csv.')
+        )
 
     def handle(self, *args, **options):
         try:
             if options['load']:
-                for model, name_file in DATA_TABLES.items():
-                    load_data(model, name_file)
-                    print(f'Загрузка "{name_file}" выполнена')
-
-                try:
-                    load_genre_title()
-                except Exception as error:
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f'Ошибка при загрузке genre_title.csv: {error}'
-                        )
-                    )
-                else:
-                    print('Загрузка "genre_title.csv" выполнена')
+                self.load()
 
-                self.stdout.write(
-                    self.style.SUCCESS('Данные загружены в базу данных.')
-                )
+            elif options['upsert']:
+                self.upsert(options['batch_size'], options['restart'])
 
             elif options['delete']:
                 del_data()
@@ -144,3 +412,8 @@ class Command(BaseCommand):
             self.stdout.write(
                 self.style.ERROR(f'Ошибка загрузки данных: {error}')
             )
+        # Массовая загрузка идет мимо сигналов: кеш slug и индекс
+        # подсказок сбрасываются явно.
+        for model in (Category, Genre):
+            get_slug_lookup(model).invalidate()
+        get_title_autocomplete().invalidate()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from reviews.histograms import rebuild_histograms
+
+
+class Command(BaseCommand):
+    help = 'Пересчет гистограмм оценок произведений по отзывам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--title',
+            type=int,
+            nargs='*',
+            help='id произведений, по умолчанию - все'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_histograms(options['title'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано гистограмм: {count}')
+        )
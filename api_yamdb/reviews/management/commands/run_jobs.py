@@ -0,0 +1,39 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from reviews.jobs import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Выполнение фоновых задач из очереди Job'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='выполнить задачи из очереди и завершиться'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2,
+            help='пауза в секундах, когда очередь пуста'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        while not self.stopping:
+            job = claim_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            run_job(job)
+            self.stdout.write(f'{job}: {job.processed}/{job.total}')
+
+    def stop(self, signum, frame):
+        """Завершение после текущей задачи при остановке контейнера."""
+        self.stopping = True
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:35
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+SEARCH_TABLES = ('reviews_review', 'reviews_comment')
+
+
+def create_search_triggers(apps, schema_editor):
+    """
+    GIN-индекс и триггер, поддерживающий search_vector при записи text.
+    Только для Postgres, на остальных СУБД поиск идет по text.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    config = f'pg_catalog.{settings.SEARCH_CONFIG}'
+    for table in SEARCH_TABLES:
+        schema_editor.execute(
+            f'CREATE INDEX {table}_search_vector_gin '
+            f'ON {table} USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            f'CREATE TRIGGER {table}_search_vector_update '
+            f'BEFORE INSERT OR UPDATE OF text ON {table} '
+            f'FOR EACH ROW EXECUTE PROCEDURE '
+            f"tsvector_update_trigger(search_vector, '{config}', text)"
+        )
+        schema_editor.execute(
+            f'UPDATE {table} '
+            f"SET search_vector = to_tsvector('{config}', text)"
+        )
+
+
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in SEARCH_TABLES:
+        schema_editor.execute(
+            f'DROP TRIGGER IF EXISTS {table}_search_vector_update '
+            f'ON {table}'
+        )
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS {table}_search_vector_gin'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
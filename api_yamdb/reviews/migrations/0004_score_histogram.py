@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:36
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def build_histograms(apps, schema_editor):
+    Review = apps.get_model('reviews', 'Review')
+    ScoreHistogram = apps.get_model('reviews', 'ScoreHistogram')
+    histograms = {}
+    for row in Review.objects.values('title_id', 'score').annotate(
+        count=Count('id')
+    ).order_by():
+        histogram = histograms.setdefault(
+            row['title_id'], ScoreHistogram(title_id=row['title_id'])
+        )
+        setattr(histogram, f'score_{row["score"]}', row['count'])
+    ScoreHistogram.objects.bulk_create(histograms.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreHistogram',
+            fields=[
+                ('title', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score_histogram', serialize=False, to='reviews.title', verbose_name='Произведение')),
+                ('score_1', models.PositiveIntegerField(default=0, verbose_name='Оценка 1')),
+                ('score_2', models.PositiveIntegerField(default=0, verbose_name='Оценка 2')),
+                ('score_3', models.PositiveIntegerField(default=0, verbose_name='Оценка 3')),
+                ('score_4', models.PositiveIntegerField(default=0, verbose_name='Оценка 4')),
+                ('score_5', models.PositiveIntegerField(default=0, verbose_name='Оценка 5')),
+                ('score_6', models.PositiveIntegerField(default=0, verbose_name='Оценка 6')),
+                ('score_7', models.PositiveIntegerField(default=0, verbose_name='Оценка 7')),
+                ('score_8', models.PositiveIntegerField(default=0, verbose_name='Оценка 8')),
+                ('score_9', models.PositiveIntegerField(default=0, verbose_name='Оценка 9')),
+                ('score_10', models.PositiveIntegerField(default=0, verbose_name='Оценка 10')),
+            ],
+            options={
+                'verbose_name': 'Score histogram',
+                'verbose_name_plural': 'Score histograms',
+            },
+        ),
+        migrations.RunPython(build_histograms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_score_histogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleSimilarTitle',
+            fields=[
+                ('title_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Произведение')),
+            ],
+            options={
+                'verbose_name': 'Stale similar title',
+                'verbose_name_plural': 'Stale similar titles',
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarTitle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='reviews.title', verbose_name='Похожее произведение')),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_titles', to='reviews.title', verbose_name='Произведение')),
+            ],
+            options={
+                'verbose_name': 'Similar title',
+                'verbose_name_plural': 'Similar titles',
+                'ordering': ('title', 'rank'),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similartitle',
+            constraint=models.UniqueConstraint(fields=('title', 'rank'), name='unique similar title rank'),
+        ),
+    ]
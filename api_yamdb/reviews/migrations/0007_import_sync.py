@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0006_author_pub_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('table', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Таблица')),
+                ('position', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('done', models.BooleanField(default=False, verbose_name='Завершено')),
+            ],
+            options={
+                'verbose_name': 'Import checkpoint',
+                'verbose_name_plural': 'Import checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportRowHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=64, verbose_name='Таблица')),
+                ('key', models.CharField(max_length=64, verbose_name='Ключ')),
+                ('hash', models.CharField(max_length=32, verbose_name='Хеш')),
+            ],
+            options={
+                'verbose_name': 'Import row hash',
+                'verbose_name_plural': 'Import row hashes',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importrowhash',
+            constraint=models.UniqueConstraint(fields=('table', 'key'), name='unique import row'),
+        ),
+    ]
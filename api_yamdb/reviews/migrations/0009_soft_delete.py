@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0008_moderation_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='is_deleted',
+            field=models.BooleanField(default=False, verbose_name='Удалено'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:47
+
+from django.db import migrations
+import reviews.fields
+
+
+def fill_genre_ids(apps, schema_editor):
+    """
+    Заполнение genre_ids по связям с жанрами и GIN-индекс на Postgres.
+    """
+    Title = apps.get_model('reviews', 'Title')
+    genre_ids = {}
+    for title_id, genre_id in Title.genre.through.objects.values_list(
+        'title_id', 'genre_id'
+    ):
+        genre_ids.setdefault(title_id, []).append(genre_id)
+    for title_id, ids in genre_ids.items():
+        Title.objects.filter(pk=title_id).update(genre_ids=ids)
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX reviews_title_genre_ids_gin '
+            'ON reviews_title USING gin (genre_ids)'
+        )
+
+
+def drop_genre_ids_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS reviews_title_genre_ids_gin'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0009_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='genre_ids',
+            field=reviews.fields.IntegerSetField(default=list, editable=False, verbose_name='id жанров'),
+        ),
+        migrations.RunPython(fill_genre_ids, drop_genre_ids_index),
+    ]
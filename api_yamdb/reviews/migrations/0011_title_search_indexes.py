@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:56
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import reviews.validators
+
+
+def create_name_trigram_index(apps, schema_editor):
+    """
+    Триграммный индекс для фильтра ?name= (icontains сравнивает
+    UPPER(name) с LIKE '%...%'). Только для Postgres.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX reviews_title_name_trgm ON reviews_title '
+            'USING gin (UPPER(name::text) gin_trgm_ops)'
+        )
+
+
+def drop_name_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS reviews_title_name_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0010_title_genre_ids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='title',
+            name='year',
+            field=models.IntegerField(db_index=True, validators=[reviews.validators.validate_year], verbose_name='Год'),
+        ),
+        TrigramExtension(),
+        migrations.RunPython(
+            create_name_trigram_index, drop_name_trigram_index
+        ),
+    ]
@@ -0,0 +1,133 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:19
+
+from django.db import migrations, models
+
+# Таблица: (модель, выражения object_id, slug, title_id, review_id,
+# признак удаления, JOIN). n - строка переходной таблицы триггера.
+CHANGE_SOURCES = {
+    'reviews_category': (
+        'category', 'n.id, n.slug, NULL::bigint, NULL::bigint', 'false', ''
+    ),
+    'reviews_genre': (
+        'genre', 'n.id, n.slug, NULL::bigint, NULL::bigint', 'false', ''
+    ),
+    'reviews_title': (
+        'title', 'n.id, NULL, NULL::bigint, NULL::bigint', 'n.is_deleted', ''
+    ),
+    'reviews_review': (
+        'review', 'n.id, NULL, n.title_id, NULL::bigint', 'n.is_hidden', ''
+    ),
+    'reviews_comment': (
+        'comment', 'n.id, NULL, r.title_id, n.review_id', 'n.is_hidden',
+        'LEFT JOIN reviews_review r ON r.id = n.review_id'
+    ),
+}
+
+CHANGE_FUNCTION = """
+CREATE FUNCTION {table}_log_changes() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO reviews_change ({columns})
+        SELECT txid_current(), '{model}', 'deleted', {values}, now()
+        FROM old_rows n {join};
+    ELSIF TG_OP = 'INSERT' THEN
+        INSERT INTO reviews_change ({columns})
+        SELECT txid_current(), '{model}',
+               CASE WHEN {removed} THEN 'deleted' ELSE 'created' END,
+               {values}, now()
+        FROM new_rows n {join};
+    ELSE
+        INSERT INTO reviews_change ({columns})
+        SELECT txid_current(), '{model}',
+               CASE WHEN {removed} THEN 'deleted' ELSE 'updated' END,
+               {values}, now()
+        FROM new_rows n JOIN old_rows o ON o.id = n.id {join}
+        WHERE n IS DISTINCT FROM o;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+CHANGE_COLUMNS = (
+    'txid, model, action, object_id, slug, title_id, review_id, changed_at'
+)
+CHANGE_TRIGGERS = (
+    ('insert', 'INSERT', 'REFERENCING NEW TABLE AS new_rows'),
+    ('update', 'UPDATE', 'REFERENCING OLD TABLE AS old_rows '
+                         'NEW TABLE AS new_rows'),
+    ('delete', 'DELETE', 'REFERENCING OLD TABLE AS old_rows'),
+)
+
+
+def create_change_triggers(apps, schema_editor):
+    """
+    Триггеры уровня оператора с переходными таблицами: одна вставка
+    в журнал на UPDATE/DELETE любого числа строк. Только для Postgres.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, (model, values, removed, join) in CHANGE_SOURCES.items():
+        schema_editor.execute(CHANGE_FUNCTION.format(
+            table=table, model=model, values=values, removed=removed,
+            join=join, columns=CHANGE_COLUMNS
+        ))
+        for name, event, referencing in CHANGE_TRIGGERS:
+            schema_editor.execute(
+                f'CREATE TRIGGER {table}_log_{name} AFTER {event} '
+                f'ON {table} {referencing} FOR EACH STATEMENT '
+                f'EXECUTE PROCEDURE {table}_log_changes()'
+            )
+
+
+def drop_change_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in CHANGE_SOURCES:
+        for name, _, _ in CHANGE_TRIGGERS:
+            schema_editor.execute(
+                f'DROP TRIGGER IF EXISTS {table}_log_{name} ON {table}'
+            )
+        schema_editor.execute(
+            f'DROP FUNCTION IF EXISTS {table}_log_changes()'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_title_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('txid', models.BigIntegerField(verbose_name='Транзакция')),
+                ('model', models.CharField(choices=[('category', 'Категория'), ('genre', 'Жанр'), ('title', 'Произведение'), ('review', 'Отзыв'), ('comment', 'Комментарий')], max_length=16, verbose_name='Модель')),
+                ('action', models.CharField(choices=[('created', 'Создан'), ('updated', 'Изменен'), ('deleted', 'Удален')], max_length=8, verbose_name='Действие')),
+                ('object_id', models.BigIntegerField(verbose_name='Объект')),
+                ('slug', models.SlugField(db_index=False, null=True, verbose_name='Slug')),
+                ('title_id', models.BigIntegerField(null=True, verbose_name='Произведение')),
+                ('review_id', models.BigIntegerField(null=True, verbose_name='Отзыв')),
+                ('changed_at', models.DateTimeField(verbose_name='Время')),
+            ],
+            options={
+                'verbose_name': 'Change',
+                'verbose_name_plural': 'Changes',
+                'ordering': ('txid', 'id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['txid', 'id'], name='change_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['model', 'object_id'], name='change_object_idx'),
+        ),
+        migrations.RunPython(
+            create_change_triggers, drop_change_triggers
+        ),
+    ]
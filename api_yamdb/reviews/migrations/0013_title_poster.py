@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0012_change_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='title',
+            name='poster',
+            field=models.FileField(blank=True, upload_to='', verbose_name='Постер'),
+        ),
+        migrations.AddField(
+            model_name='title',
+            name='poster_variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Варианты постера'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0013_title_poster'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('reviews', 'Отзыв'), ('comments', 'Комментарий')], max_length=16, verbose_name='Тип')),
+                ('object_id', models.BigIntegerField(verbose_name='Объект')),
+                ('duplicate_kind', models.CharField(choices=[('reviews', 'Отзыв'), ('comments', 'Комментарий')], max_length=16, verbose_name='Тип дубликата')),
+                ('duplicate_id', models.BigIntegerField(verbose_name='Дубликат')),
+                ('similarity', models.FloatField(verbose_name='Сходство')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Найден')),
+            ],
+            options={
+                'verbose_name': 'Duplicate candidate',
+                'verbose_name_plural': 'Duplicate candidates',
+                'ordering': ('-id',),
+            },
+        ),
+        migrations.CreateModel(
+            name='TextBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField(db_index=True, verbose_name='Корзина')),
+            ],
+            options={
+                'verbose_name': 'Text bucket',
+                'verbose_name_plural': 'Text buckets',
+            },
+        ),
+        migrations.CreateModel(
+            name='TextSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('reviews', 'Отзыв'), ('comments', 'Комментарий')], max_length=16, verbose_name='Тип')),
+                ('object_id', models.BigIntegerField(verbose_name='Объект')),
+                ('signature', models.BinaryField(verbose_name='Сигнатура')),
+            ],
+            options={
+                'verbose_name': 'Text signature',
+                'verbose_name_plural': 'Text signatures',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='textsignature',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique text signature'),
+        ),
+        migrations.AddField(
+            model_name='textbucket',
+            name='signature',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, related_name='buckets', to='reviews.textsignature', verbose_name='Сигнатура'),
+        ),
+        migrations.AddIndex(
+            model_name='duplicatecandidate',
+            index=models.Index(fields=['duplicate_kind', 'duplicate_id'], name='duplicate_candidate_dup_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='duplicatecandidate',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id', 'duplicate_kind', 'duplicate_id'), name='unique duplicate candidate'),
+        ),
+    ]
@@ -1,9 +1,26 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from users.models import User
 
+from .fields import IntegerSetField
 from .validators import validate_year
 
+SCORE_MIN = 1
+SCORE_MAX = 10
+
+
+class VisibleManager(models.Manager):
+    """
+    Менеджер без скрытых модераторами объектов и объектов авторов,
+    ожидающих удаления в фоне.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(
+            is_hidden=False, author__is_deleted=False
+        )
+
 
 class Category(models.Model):
     """Модель для категорий.
@@ -53,6 +70,13 @@ class Genre(models.Model):
         return f'{self.name} {self.name}'
 
 
+class NotDeletedManager(models.Manager):
+    """Менеджер без объектов, ожидающих удаления в фоне."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class Title(models.Model):
     """Модель для произведений.
     Attributes:
@@ -61,6 +85,12 @@ class Title(models.Model):
         category: категория.
         description: описание.
         genre: жанр.
+        genre_ids: id жанров, копия genre для фильтрации без JOIN,
+            поддерживается сигналами m2m_changed.
+        is_deleted: удалено, зависимые объекты удаляются в фоне.
+        poster: оригинал постера, не отдается клиентам.
+        poster_variants: уменьшенные копии постера {имя: путь},
+            заполняются задачей poster (reviews/posters.py).
     """
     name = models.CharField(
         'Название произведения',
@@ -69,7 +99,8 @@ class Title(models.Model):
     )
     year = models.IntegerField(
         'Год',
-        validators=(validate_year, )
+        validators=(validate_year, ),
+        db_index=True
     )
     category = models.ForeignKey(
         Category,
@@ -90,6 +121,15 @@ class Title(models.Model):
         related_name='titles',
         verbose_name='Жанр'
     )
+    genre_ids = IntegerSetField('id жанров')
+    is_deleted = models.BooleanField('Удалено', default=False)
+    poster = models.FileField('Постер', blank=True)
+    poster_variants = models.JSONField(
+        'Варианты постера', default=dict, blank=True
+    )
+
+    objects = NotDeletedManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = 'Title'
@@ -107,6 +147,8 @@ class Review(models.Model):
         author: автор.
         score: оценка.
         pub_date: дата публикации.
+        search_vector: поисковый вектор текста, заполняется триггером БД.
+        is_hidden: скрыт модератором, менеджер objects его не возвращает.
     """
     title = models.ForeignKey(
         Title,
@@ -124,8 +166,12 @@ class Review(models.Model):
     score = models.IntegerField(
         'Оценка',
         validators=(
-            MinValueValidator(1, message="Оценка ниже 1, невозможна"),
-            MaxValueValidator(10, message="Оценка больше 10, невозможна")
+            MinValueValidator(
+                SCORE_MIN, message=f"Оценка ниже {SCORE_MIN}, невозможна"
+            ),
+            MaxValueValidator(
+                SCORE_MAX, message=f"Оценка больше {SCORE_MAX}, невозможна"
+            )
         )
     )
     pub_date = models.DateTimeField(
@@ -133,6 +179,15 @@ class Review(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
+
+    is_hidden = models.BooleanField('Скрыт модератором', default=False)
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['pub_date']
@@ -144,10 +199,24 @@ class Review(models.Model):
                 name='unique review'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='review_author_pub_date_idx'
+            )
+        ]
 
     def __str__(self):
         return self.text
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_score = instance.__dict__.get('score')
+        instance.loaded_hidden = instance.__dict__.get('is_hidden')
+        instance.loaded_text = instance.__dict__.get('text')
+        return instance
+
 
 class Comment(models.Model):
     """Модель для комментариев к отзывам.
@@ -156,6 +225,8 @@ class Comment(models.Model):
         text: текст комментария.
         author: автор.
         pub_date: дата публикации.
+        search_vector: поисковый вектор текста, заполняется триггером БД.
+        is_hidden: скрыт модератором, менеджер objects его не возвращает.
     """
     review = models.ForeignKey(
         Review,
@@ -175,10 +246,390 @@ class Comment(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
+
+    is_hidden = models.BooleanField('Скрыт модератором', default=False)
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='comment_author_pub_date_idx'
+            )
+        ]
 
     def __str__(self):
         return self.text
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_text = instance.__dict__.get('text')
+        return instance
+
+
+class ScoreHistogram(models.Model):
+    """Распределение оценок произведения.
+    Attributes:
+        title: произведение.
+        score_1 ... score_10: количество отзывов с оценкой, по одному
+            счетчику на каждое допустимое значение Review.score.
+    """
+    SCORES = range(SCORE_MIN, SCORE_MAX + 1)
+
+    title = models.OneToOneField(
+        Title,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score_histogram',
+        verbose_name='Произведение'
+    )
+
+    class Meta:
+        verbose_name = 'Score histogram'
+        verbose_name_plural = 'Score histograms'
+
+    def __str__(self):
+        return f'{self.title_id}: {self.counts()}'
+
+    @classmethod
+    def field_name(cls, score):
+        if score not in cls.SCORES:
+            raise ValueError(f'Недопустимая оценка: {score}')
+        return f'score_{score}'
+
+    def counts(self):
+        return {
+            str(score): getattr(self, self.field_name(score))
+            for score in self.SCORES
+        }
+
+
+def add_score_fields(model):
+    """Счетчики score_1 ... score_10 гистограммы."""
+    for score in model.SCORES:
+        model.add_to_class(
+            model.field_name(score),
+            models.PositiveIntegerField(f'Оценка {score}', default=0)
+        )
+
+
+add_score_fields(ScoreHistogram)
+
+
+class SimilarTitle(models.Model):
+    """Предрассчитанные похожие произведения.
+    Attributes:
+        title: произведение.
+        similar: похожее произведение.
+        rank: место в списке похожих, начиная с 1.
+        score: итоговая мера сходства.
+    """
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='similar_titles',
+        verbose_name='Произведение'
+    )
+    similar = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожее произведение'
+    )
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        ordering = ('title', 'rank')
+        verbose_name = 'Similar title'
+        verbose_name_plural = 'Similar titles'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['title', 'rank'],
+                name='unique similar title rank'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.title_id} -> {self.similar_id}'
+
+
+class StaleSimilarTitle(models.Model):
+    """Произведения, для которых нужно пересчитать похожие.
+    Attributes:
+        title_id: id произведения, у которого изменились отзывы, жанры
+            или категория. Не внешний ключ: отметка может появиться
+            при каскадном удалении произведения и будет пропущена
+            при пересчете.
+    """
+    title_id = models.BigIntegerField('Произведение', primary_key=True)
+
+    class Meta:
+        verbose_name = 'Stale similar title'
+        verbose_name_plural = 'Stale similar titles'
+
+    def __str__(self):
+        return str(self.title_id)
+
+
+class ImportRowHash(models.Model):
+    """Хеши строк csv, загруженных командой import_data --upsert.
+    Attributes:
+        table: имя csv-файла.
+        key: ключ строки: id, для genre_title - пара title_id:genre_id.
+        hash: md5 содержимого строки.
+    """
+    table = models.CharField('Таблица', max_length=64)
+    key = models.CharField('Ключ', max_length=64)
+    hash = models.CharField('Хеш', max_length=32)
+
+    class Meta:
+        verbose_name = 'Import row hash'
+        verbose_name_plural = 'Import row hashes'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['table', 'key'],
+                name='unique import row'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.table}:{self.key}'
+
+
+class ImportCheckpoint(models.Model):
+    """Прогресс import_data --upsert для продолжения после сбоя.
+    Attributes:
+        table: имя csv-файла.
+        position: число обработанных строк файла.
+        done: файл обработан полностью, включая удаление строк.
+    """
+    table = models.CharField('Таблица', max_length=64, primary_key=True)
+    position = models.PositiveIntegerField('Обработано строк', default=0)
+    done = models.BooleanField('Завершено', default=False)
+
+    class Meta:
+        verbose_name = 'Import checkpoint'
+        verbose_name_plural = 'Import checkpoints'
+
+    def __str__(self):
+        return f'{self.table}: {self.position}'
+
+
+class Job(models.Model):
+    """Фоновая задача, выполняемая командой run_jobs.
+    Attributes:
+        kind: тип задачи, по нему выбирается обработчик.
+        params: параметры задачи.
+        status: состояние выполнения.
+        total: сколько объектов нужно обработать.
+        processed: сколько объектов обработано.
+        error: текст ошибки, если задача завершилась неудачно.
+        created_by: пользователь, поставивший задачу.
+        heartbeat: последняя отметка воркера, выполняющего задачу.
+        attempts: сколько раз задача была захвачена воркером.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    kind = models.CharField('Тип', max_length=64)
+    params = models.JSONField('Параметры', default=dict)
+    status = models.CharField(
+        'Состояние', max_length=16, choices=STATUSES, default=PENDING
+    )
+    total = models.PositiveIntegerField('Всего', null=True, blank=True)
+    processed = models.PositiveIntegerField('Обработано', default=0)
+    error = models.TextField('Ошибка', blank=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    started = models.DateTimeField('Начата', null=True, blank=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+    heartbeat = models.DateTimeField('Отметка воркера', null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+
+    class Meta:
+        ordering = ('-id',)
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        indexes = [
+            models.Index(fields=['status', 'id'], name='job_status_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk}: {self.status}'
+
+
+class Change(models.Model):
+    """Запись журнала изменений каталога для /changes/.
+    Заполняется триггерами БД (только Postgres, миграция 0012),
+    поэтому видит и массовые изменения через QuerySet.update().
+    Attributes:
+        txid: транзакция, внесшая изменение. Записи упорядочены
+            по (txid, id), это и есть курсор ленты.
+        model: тип объекта.
+        action: created, updated или deleted. Скрытый модератором
+            или мягко удаленный объект отмечается как deleted.
+        object_id: id объекта.
+        slug: slug категории или жанра.
+        title_id: произведение отзыва или комментария.
+        review_id: отзыв комментария.
+        changed_at: время изменения.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (CREATED, 'Создан'),
+        (UPDATED, 'Изменен'),
+        (DELETED, 'Удален'),
+    )
+    MODELS = (
+        ('category', 'Категория'),
+        ('genre', 'Жанр'),
+        ('title', 'Произведение'),
+        ('review', 'Отзыв'),
+        ('comment', 'Комментарий'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    txid = models.BigIntegerField('Транзакция')
+    model = models.CharField('Модель', max_length=16, choices=MODELS)
+    action = models.CharField('Действие', max_length=8, choices=ACTIONS)
+    object_id = models.BigIntegerField('Объект')
+    slug = models.SlugField('Slug', null=True, db_index=False)
+    title_id = models.BigIntegerField('Произведение', null=True)
+    review_id = models.BigIntegerField('Отзыв', null=True)
+    changed_at = models.DateTimeField('Время')
+
+    class Meta:
+        ordering = ('txid', 'id')
+        verbose_name = 'Change'
+        verbose_name_plural = 'Changes'
+        indexes = [
+            models.Index(fields=['txid', 'id'], name='change_cursor_idx'),
+            models.Index(
+                fields=['model', 'object_id'], name='change_object_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.model} #{self.object_id}: {self.action}'
+
+
+TEXT_KINDS = (
+    ('reviews', 'Отзыв'),
+    ('comments', 'Комментарий'),
+)
+
+
+class TextSignature(models.Model):
+    """MinHash-сигнатура текста отзыва или комментария.
+    Attributes:
+        kind: reviews или comments.
+        object_id: id отзыва или комментария. Не внешний ключ: сигнатуры
+            удаленных объектов удаляет команда build_text_signatures.
+        signature: значения MinHash, массив uint32.
+    """
+    kind = models.CharField('Тип', max_length=16, choices=TEXT_KINDS)
+    object_id = models.BigIntegerField('Объект')
+    signature = models.BinaryField('Сигнатура')
+
+    class Meta:
+        verbose_name = 'Text signature'
+        verbose_name_plural = 'Text signatures'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                name='unique text signature'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.object_id}'
+
+
+class TextBucket(models.Model):
+    """Корзина LSH: хеш одной полосы сигнатуры.
+    Attributes:
+        signature: сигнатура текста. Строки удаляются вместе
+            с сигнатурой явно, чтобы удаление сигнатур было быстрым.
+        bucket: хеш полосы вместе с ее номером.
+    """
+    signature = models.ForeignKey(
+        TextSignature,
+        on_delete=models.DO_NOTHING,
+        related_name='buckets',
+        verbose_name='Сигнатура'
+    )
+    bucket = models.BigIntegerField('Корзина', db_index=True)
+
+    class Meta:
+        verbose_name = 'Text bucket'
+        verbose_name_plural = 'Text buckets'
+
+    def __str__(self):
+        return str(self.bucket)
+
+
+class DuplicateCandidate(models.Model):
+    """Почти одинаковые тексты для проверки модератором.
+    Attributes:
+        kind, object_id: более новый текст.
+        duplicate_kind, duplicate_id: текст, на который он похож.
+        similarity: оценка коэффициента Жаккара по сигнатурам.
+    """
+    kind = models.CharField('Тип', max_length=16, choices=TEXT_KINDS)
+    object_id = models.BigIntegerField('Объект')
+    duplicate_kind = models.CharField(
+        'Тип дубликата', max_length=16, choices=TEXT_KINDS
+    )
+    duplicate_id = models.BigIntegerField('Дубликат')
+    similarity = models.FloatField('Сходство')
+    created = models.DateTimeField('Найден', auto_now_add=True)
+
+    class Meta:
+        ordering = ('-id',)
+        verbose_name = 'Duplicate candidate'
+        verbose_name_plural = 'Duplicate candidates'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id', 'duplicate_kind', 'duplicate_id'],
+                name='unique duplicate candidate'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['duplicate_kind', 'duplicate_id'],
+                name='duplicate_candidate_dup_idx'
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f'{self.kind} #{self.object_id} ~ '
+            f'{self.duplicate_kind} #{self.duplicate_id}'
+        )
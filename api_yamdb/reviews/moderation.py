@@ -0,0 +1,125 @@
+"""
+Массовая модерация отзывов и комментариев в фоне.
+
+Объекты выбираются по автору, произведению или списку id и
+обрабатываются пачками по MODERATION_CHUNK_SIZE: каждая пачка -
+отдельная короткая транзакция с одним UPDATE или DELETE по списку id,
+без загрузки объектов в память.
+"""
+from api.caching import purge_surrogate_keys
+from django.db import transaction
+
+from .histograms import rebuild_histograms
+from .jobs import job_handler, report_progress
+from .models import Comment, Review, StaleSimilarTitle
+
+MODERATION_JOB = 'moderation'
+MODERATION_CHUNK_SIZE = 1000
+
+DELETE = 'delete'
+HIDE = 'hide'
+RESTORE = 'restore'
+MODERATION_ACTIONS = (DELETE, HIDE, RESTORE)
+
+MODERATION_TARGETS = {
+    'reviews': Review,
+    'comments': Comment,
+}
+
+
+def get_moderation_queryset(params):
+    model = MODERATION_TARGETS[params['target']]
+    queryset = model.all_objects.all()
+    if params.get('author') is not None:
+        queryset = queryset.filter(author_id=params['author'])
+    if params.get('title') is not None:
+        if model is Review:
+            queryset = queryset.filter(title_id=params['title'])
+        else:
+            queryset = queryset.filter(review__title_id=params['title'])
+    if params.get('ids'):
+        queryset = queryset.filter(pk__in=params['ids'])
+    if params['action'] == HIDE:
+        queryset = queryset.filter(is_hidden=False)
+    elif params['action'] == RESTORE:
+        queryset = queryset.filter(is_hidden=True)
+    return queryset.order_by('pk')
+
+
+def refresh_titles(title_ids):
+    """Пересчет оценок и сброс кеша каталога для произведений."""
+    if not title_ids:
+        return
+    rebuild_histograms(title_ids)
+    StaleSimilarTitle.objects.bulk_create(
+        [StaleSimilarTitle(title_id=title_id) for title_id in title_ids],
+        ignore_conflicts=True
+    )
+    purge_surrogate_keys(
+        ['titles', *(f'title-{title_id}' for title_id in title_ids)]
+    )
+
+
+def get_title_ids(model, ids):
+    """Произведения, оценки которых зависят от объектов пачки."""
+    if model is not Review:
+        return set()
+    return set(
+        Review.all_objects.filter(pk__in=ids).values_list(
+            'title_id', flat=True
+        )
+    )
+
+
+def publish_deleted(model, action, ids):
+    """
+    События deleted для открытых потоков: при удалении отзывов -
+    и для их комментариев. Отправляются после фиксации пачки.
+    """
+    # api.events импортирует сериализаторы, которые импортируют этот модуль.
+    from api.events import get_deleted_messages, publish_messages
+
+    if action in (DELETE, HIDE):
+        publish_messages(get_deleted_messages(
+            model, ids, with_comments=action == DELETE
+        ))
+
+
+def moderate_chunk(model, action, ids):
+    objects = model.all_objects.filter(pk__in=ids)
+    if action == DELETE:
+        if model is Review:
+            comments = Comment.all_objects.filter(review_id__in=ids)
+            comments._raw_delete(comments.db)
+        objects._raw_delete(objects.db)
+    else:
+        objects.update(is_hidden=action == HIDE)
+
+
+def moderate_in_chunks(job, queryset, action, processed=0):
+    """
+    Применение action ко всем объектам queryset пачками.
+    queryset должен исключать уже обработанные объекты.
+    Возвращает общее число обработанных объектов.
+    """
+    model = queryset.model
+    while True:
+        ids = list(
+            queryset.values_list('pk', flat=True)[:MODERATION_CHUNK_SIZE]
+        )
+        if not ids:
+            return processed
+        with transaction.atomic():
+            title_ids = get_title_ids(model, ids)
+            publish_deleted(model, action, ids)
+            moderate_chunk(model, action, ids)
+            refresh_titles(title_ids)
+        processed += len(ids)
+        report_progress(job, processed)
+
+
+@job_handler(MODERATION_JOB)
+def run_moderation(job):
+    queryset = get_moderation_queryset(job.params)
+    report_progress(job, 0, queryset.count())
+    moderate_in_chunks(job, queryset, job.params['action'])
@@ -0,0 +1,162 @@
+"""
+Постеры произведений.
+
+Загрузка постера только сохраняет оригинал и ставит задачу poster.
+Изображение декодирует и уменьшает воркер run_jobs в пуле процессов
+POSTER_PROCESSES, веб-воркеры изображения не открывают. Варианты
+POSTER_SIZES в WebP сохраняются по адресу из хеша содержимого
+(posters/ab/<sha256>.webp): новый постер получает новые адреса,
+поэтому nginx отдает их из /media/ с бессрочным кешированием.
+"""
+import hashlib
+import io
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from api.caching import purge_surrogate_keys
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .jobs import enqueue_job, job_handler, report_progress
+from .models import Title
+
+POSTER_JOB = 'poster'
+ORIGINALS_DIR = 'posters/originals'
+VARIANTS_DIR = 'posters'
+
+# Формат определяется по первым байтам файла, без декодирования.
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+)
+
+
+def get_image_extension(upload):
+    """Расширение по сигнатуре файла или None, если это не изображение."""
+    head = upload.read(12)
+    upload.seek(0)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return '.webp'
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def get_poster_keys(title_id):
+    return ['titles', f'title-{title_id}']
+
+
+def set_poster(title, upload, user=None):
+    """
+    Сохранение оригинала и постановка задачи на варианты.
+    До ее выполнения у произведения нет постера.
+    """
+    old_poster = title.poster.name
+    name = default_storage.save(
+        f'{ORIGINALS_DIR}/{uuid.uuid4().hex}{get_image_extension(upload)}',
+        upload
+    )
+    with transaction.atomic():
+        Title.all_objects.filter(pk=title.pk).update(
+            poster=name, poster_variants={}
+        )
+        enqueue_job(
+            POSTER_JOB, {'title': title.pk, 'original': name}, user
+        )
+        purge_surrogate_keys(get_poster_keys(title.pk))
+    title.poster.name, title.poster_variants = name, {}
+    if old_poster:
+        default_storage.delete(old_poster)
+
+
+def delete_poster(title):
+    """
+    Удаление оригинала. Варианты остаются: по адресу из хеша
+    их может использовать другое произведение.
+    """
+    old_poster = title.poster.name
+    Title.all_objects.filter(pk=title.pk).update(
+        poster='', poster_variants={}
+    )
+    purge_surrogate_keys(get_poster_keys(title.pk))
+    title.poster.name, title.poster_variants = '', {}
+    if old_poster:
+        default_storage.delete(old_poster)
+
+
+def encode_variant(image, width, quality):
+    variant = image.copy()
+    variant.thumbnail((width, width * 2), Image.LANCZOS)
+    output = io.BytesIO()
+    variant.save(output, 'WEBP', quality=quality, method=6)
+    return output.getvalue()
+
+
+def render_variants(content, sizes, quality):
+    """
+    Уменьшенные копии в WebP: {имя: байты}. Выполняется в процессе пула;
+    слишком большие изображения Pillow отклоняет (DecompressionBombError).
+    """
+    with Image.open(io.BytesIO(content)) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        return {
+            name: encode_variant(image, width, quality)
+            for name, width in sizes.items()
+        }
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ProcessPoolExecutor(max_workers=settings.POSTER_PROCESSES)
+
+
+def save_variant(content):
+    digest = hashlib.sha256(content).hexdigest()
+    name = f'{VARIANTS_DIR}/{digest[:2]}/{digest}.webp'
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(content))
+    return name
+
+
+@job_handler(POSTER_JOB)
+def process_poster(job):
+    """
+    Варианты постера. Если за это время загружен другой постер,
+    результат не записывается: его варианты подготовит своя задача.
+    """
+    title_id, original = job.params['title'], job.params['original']
+    current = Title.all_objects.filter(pk=title_id, poster=original)
+    if not current.exists():
+        return
+    report_progress(job, 0, total=len(settings.POSTER_SIZES))
+    with default_storage.open(original) as upload:
+        content = upload.read()
+    rendered = get_executor().submit(
+        render_variants, content, settings.POSTER_SIZES,
+        settings.POSTER_QUALITY
+    ).result(timeout=settings.POSTER_TIMEOUT)
+    variants = {
+        name: save_variant(variant) for name, variant in rendered.items()
+    }
+    with transaction.atomic():
+        if current.update(poster_variants=variants):
+            purge_surrogate_keys(get_poster_keys(title_id))
+    report_progress(job, len(variants))
+
+
+def get_poster_urls(title):
+    """Адреса вариантов постера или None, пока они не готовы."""
+    if not title.poster_variants:
+        return None
+    return {
+        name: default_storage.url(path)
+        for name, path in title.poster_variants.items()
+    }
@@ -0,0 +1,84 @@
+"""
+Полнотекстовый поиск по отзывам и комментариям.
+
+На Postgres поиск идет по колонке search_vector с GIN-индексом,
+которую заполняет триггер БД при записи текста (миграция 0003).
+На остальных СУБД (SQLite в тестах) используется icontains,
+а фрагменты с подсветкой строятся в Python.
+
+Текст пишут пользователи, поэтому совпадения отмечаются управляющими
+символами, а HTML с <b> собирает render_headline после экранирования.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank)
+from django.db import connections
+from django.db.models import F
+from django.utils.html import escape
+
+HIGHLIGHT_START = '<b>'
+HIGHLIGHT_STOP = '</b>'
+MARK_START = '\x02'
+MARK_STOP = '\x03'
+HEADLINE_WORDS = 35
+
+
+def is_full_text_supported(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def search_texts(queryset, query):
+    """
+    Фильтрует queryset моделей с полями text и search_vector по запросу.
+    Результат упорядочен по релевантности и содержит аннотацию headline.
+    """
+    if not is_full_text_supported(queryset):
+        words = query.split()
+        for word in words:
+            queryset = queryset.filter(text__icontains=word)
+        return queryset.order_by('-pub_date', '-id')
+
+    search_query = SearchQuery(
+        query, config=settings.SEARCH_CONFIG, search_type='websearch'
+    )
+    return queryset.filter(search_vector=search_query).annotate(
+        rank=SearchRank(F('search_vector'), search_query),
+        headline=SearchHeadline(
+            'text',
+            search_query,
+            config=settings.SEARCH_CONFIG,
+            start_sel=MARK_START,
+            stop_sel=MARK_STOP,
+            max_words=HEADLINE_WORDS,
+        ),
+    ).order_by('-rank', '-pub_date', '-id')
+
+
+def render_headline(headline):
+    """HTML фрагмента с отметками совпадений: текст экранируется."""
+    return escape(headline).replace(MARK_START, HIGHLIGHT_START).replace(
+        MARK_STOP, HIGHLIGHT_STOP
+    )
+
+
+def highlight(text, query):
+    """
+    Фрагмент текста с отмеченными словами запроса
+    для СУБД без полнотекстового поиска.
+    """
+    text = text.replace(MARK_START, '').replace(MARK_STOP, '')
+    words = [re.escape(word) for word in query.split() if word]
+    if not words:
+        return text
+    pattern = re.compile('|'.join(words), re.IGNORECASE)
+    match = pattern.search(text)
+    tokens = text.split()
+    if match is not None:
+        start = max(0, len(text[:match.start()].split()) - 5)
+        tokens = tokens[start:]
+    fragment = ' '.join(tokens[:HEADLINE_WORDS])
+    return pattern.sub(
+        lambda word: f'{MARK_START}{word.group()}{MARK_STOP}', fragment
+    )
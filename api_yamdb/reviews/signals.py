@@ -0,0 +1,120 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .autocomplete import get_title_autocomplete
+from .duplicates import index_text
+from .genre_sets import refresh_genre_ids
+from .histograms import change_score_count, rebuild_histograms
+from .models import Category, Comment, Genre, Review, StaleSimilarTitle, Title
+from .slugs import get_slug_lookup
+
+
+def mark_similar_titles_stale(title_id):
+    """Отметка для пересчета build_similar_titles --incremental."""
+    StaleSimilarTitle.objects.bulk_create(
+        [StaleSimilarTitle(title_id=title_id)], ignore_conflicts=True
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_histogram_on_save(sender, instance, created, update_fields,
+                             **kwargs):
+    if update_fields is not None and not {'score', 'is_hidden'} & set(
+        update_fields
+    ):
+        return
+    old_score = getattr(instance, 'loaded_score', None)
+    if instance.is_hidden or getattr(instance, 'loaded_hidden', False):
+        # Скрытые отзывы не учитываются, счетчики пересчитываются целиком.
+        rebuild_histograms([instance.title_id])
+    elif created:
+        change_score_count(instance.title_id, instance.score, 1)
+    elif old_score is None:
+        # Прежняя оценка неизвестна (отложенное поле, объект собран
+        # вручную): счетчики произведения пересчитываются.
+        rebuild_histograms([instance.title_id])
+    elif old_score != instance.score:
+        change_score_count(instance.title_id, old_score, -1)
+        change_score_count(instance.title_id, instance.score, 1)
+    else:
+        return
+    instance.loaded_score = instance.score
+    instance.loaded_hidden = instance.is_hidden
+    mark_similar_titles_stale(instance.title_id)
+
+
+@receiver(post_delete, sender=Review)
+def update_histogram_on_delete(sender, instance, **kwargs):
+    if not instance.is_hidden:
+        change_score_count(instance.title_id, instance.score, -1)
+    mark_similar_titles_stale(instance.title_id)
+
+
+@receiver(post_save, sender=Title)
+def mark_title_stale_on_save(sender, instance, **kwargs):
+    mark_similar_titles_stale(instance.pk)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def mark_title_stale_on_genre_change(sender, instance, action, reverse,
+                                     pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        mark_similar_titles_stale(instance.pk)
+        return
+    for title_id in pk_set or ():
+        mark_similar_titles_stale(title_id)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def update_genre_ids(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        refresh_genre_ids([instance.pk])
+    elif action == 'post_clear':
+        refresh_genre_ids(getattr(instance, 'cleared_title_ids', ()))
+    else:
+        refresh_genre_ids(pk_set or ())
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def remember_cleared_titles(sender, instance, action, reverse, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance.cleared_title_ids = list(
+            instance.titles.values_list('pk', flat=True)
+        )
+
+
+@receiver(pre_delete, sender=Genre)
+def remember_genre_titles(sender, instance, **kwargs):
+    instance.cleared_title_ids = list(
+        Title.all_objects.filter(genre=instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Genre)
+def update_genre_ids_on_genre_delete(sender, instance, **kwargs):
+    refresh_genre_ids(instance.cleared_title_ids)
+
+
+@receiver((post_save, post_delete), sender=Category)
+@receiver((post_save, post_delete), sender=Genre)
+def invalidate_slug_lookup(sender, **kwargs):
+    get_slug_lookup(sender).invalidate()
+
+
+@receiver((post_save, post_delete), sender=Title)
+def invalidate_title_autocomplete(sender, **kwargs):
+    get_title_autocomplete().invalidate()
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_save, sender=Comment)
+def index_text_on_save(sender, instance, created, **kwargs):
+    """Поиск почти дубликатов нового или измененного текста."""
+    if created or instance.text != getattr(instance, 'loaded_text', None):
+        index_text(instance, created)
+        instance.loaded_text = instance.text
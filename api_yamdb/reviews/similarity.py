@@ -0,0 +1,204 @@
+"""
+Расчет похожих произведений.
+
+Сходство произведения с остальными складывается из:
+- косинусной близости строк разреженной матрицы оценок
+  произведение × пользователь, центрированных по средней оценке
+  пользователя;
+- косинусной близости наборов жанров;
+- совпадения категории.
+Для каждого произведения сохраняются top_k соседей в SimilarTitle.
+"""
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from .models import Review, SimilarTitle, StaleSimilarTitle, Title
+
+REVIEWS_WEIGHT = 0.6
+GENRES_WEIGHT = 0.3
+CATEGORY_WEIGHT = 0.1
+
+
+def normalize_rows(matrix):
+    """Нормировка строк разреженной матрицы на единичную длину."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def index_of(ids):
+    """Соответствие id -> номер строки/столбца матрицы."""
+    return {pk: index for index, pk in enumerate(ids)}
+
+
+def build_score_matrix(title_index):
+    """
+    Матрица оценок произведение × пользователь. Отзывы произведений,
+    ожидающих удаления, не учитываются: их нет в title_index.
+    """
+    reviews = np.fromiter(
+        (
+            value
+            for review in Review.objects.filter(
+                title__is_deleted=False
+            ).values_list(
+                'title_id', 'author_id', 'score'
+            ).iterator(chunk_size=10000)
+            for value in review
+        ),
+        dtype=np.int64
+    ).reshape(-1, 3)
+    author_ids = reviews[:, 1]
+    scores = reviews[:, 2].astype(np.float64)
+    rows = np.array(
+        [title_index[title_id] for title_id in reviews[:, 0]], dtype=np.int64
+    )
+
+    authors, columns = np.unique(author_ids, return_inverse=True)
+    author_mean = (
+        np.bincount(columns, weights=scores, minlength=len(authors))
+        / np.maximum(np.bincount(columns, minlength=len(authors)), 1)
+    )
+    return sparse.csr_matrix(
+        (scores - author_mean[columns], (rows, columns)),
+        shape=(len(title_index), len(authors))
+    )
+
+
+def build_genre_matrix(title_index):
+    """Матрица принадлежности произведений жанрам."""
+    pairs = np.array(
+        list(Title.genre.through.objects.filter(
+            title__is_deleted=False
+        ).values_list('title_id', 'genre_id')),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    genres, columns = np.unique(pairs[:, 1], return_inverse=True)
+    rows = np.array(
+        [title_index[title_id] for title_id in pairs[:, 0]], dtype=np.int64
+    )
+    return sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)),
+        shape=(len(title_index), len(genres))
+    )
+
+
+def build_category_matrix(title_ids):
+    """Матрица принадлежности произведений категориям."""
+    categories = dict(
+        Title.objects.filter(category__isnull=False).values_list(
+            'id', 'category_id'
+        )
+    )
+    rows = np.array(
+        [row for row, pk in enumerate(title_ids) if pk in categories],
+        dtype=np.int64
+    )
+    values = np.array(
+        [categories[title_ids[row]] for row in rows], dtype=np.int64
+    )
+    _, columns = np.unique(values, return_inverse=True)
+    return sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)),
+        shape=(len(title_ids), columns.max() + 1 if len(columns) else 0)
+    )
+
+
+def top_neighbours(similarity, rows, top_k):
+    """
+    Индексы и значения top_k наибольших элементов каждой строки
+    без самого произведения и без нулевого сходства.
+    """
+    dense = similarity.toarray()
+    dense[np.arange(len(rows)), rows] = -np.inf
+    top_k = min(top_k, dense.shape[1] - 1)
+    if top_k <= 0:
+        return [[] for _ in rows]
+    candidates = np.argpartition(-dense, top_k - 1, axis=1)[:, :top_k]
+    result = []
+    for line, columns in zip(dense, candidates):
+        columns = columns[np.argsort(-line[columns], kind='stable')]
+        result.append([
+            (column, line[column]) for column in columns if line[column] > 0
+        ])
+    return result
+
+
+def build_similar_titles(title_ids=None, top_k=10, chunk_size=100):
+    """
+    Пересчет похожих произведений.
+    Без title_ids пересчитываются все произведения.
+    Возвращает количество пересчитанных произведений.
+    """
+    all_ids = list(Title.objects.order_by('id').values_list('id', flat=True))
+    title_index = index_of(all_ids)
+    if title_ids is None:
+        title_ids = all_ids
+        StaleSimilarTitle.objects.all().delete()
+    targets = np.array(
+        sorted(title_index[pk] for pk in set(title_ids) if pk in title_index),
+        dtype=np.int64
+    )
+    if not len(targets):
+        return 0
+
+    reviews = normalize_rows(build_score_matrix(title_index))
+    genres = normalize_rows(build_genre_matrix(title_index))
+    categories = build_category_matrix(all_ids)
+    reviews_t = reviews.T.tocsr()
+    genres_t = genres.T.tocsr()
+    categories_t = categories.T.tocsr()
+
+    for start in range(0, len(targets), chunk_size):
+        rows = targets[start:start + chunk_size]
+        similarity = (
+            REVIEWS_WEIGHT * (reviews[rows] @ reviews_t)
+            + GENRES_WEIGHT * (genres[rows] @ genres_t)
+            + CATEGORY_WEIGHT * (categories[rows] @ categories_t)
+        )
+        chunk_ids = [all_ids[row] for row in rows]
+        neighbours = [
+            SimilarTitle(
+                title_id=all_ids[row],
+                similar_id=all_ids[column],
+                rank=rank,
+                score=float(score),
+            )
+            for row, row_neighbours in zip(
+                rows, top_neighbours(similarity, rows, top_k)
+            )
+            for rank, (column, score) in enumerate(row_neighbours, start=1)
+        ]
+        with transaction.atomic():
+            SimilarTitle.objects.filter(title_id__in=chunk_ids).delete()
+            SimilarTitle.objects.bulk_create(neighbours)
+    return len(targets)
+
+
+def refresh_stale_similar_titles(top_k=10, chunk_size=100):
+    """
+    Пересчет произведений, отмеченных в StaleSimilarTitle,
+    и произведений, у которых они входят в список похожих.
+    """
+    stale_ids = set(
+        StaleSimilarTitle.objects.values_list('title_id', flat=True)
+    )
+    if not stale_ids:
+        return 0
+    affected_ids = stale_ids | set(
+        SimilarTitle.objects.filter(similar_id__in=stale_ids).values_list(
+            'title_id', flat=True
+        )
+    )
+    # Отметки снимаются до расчета, чтобы не потерять новые,
+    # появившиеся во время него; при ошибке они возвращаются.
+    StaleSimilarTitle.objects.filter(title_id__in=stale_ids).delete()
+    try:
+        return build_similar_titles(affected_ids, top_k, chunk_size)
+    except Exception:
+        StaleSimilarTitle.objects.bulk_create(
+            [StaleSimilarTitle(title_id=pk) for pk in stale_ids],
+            ignore_conflicts=True
+        )
+        raise
@@ -0,0 +1,82 @@
+"""
+Кеш slug -> id категорий и жанров в памяти процесса.
+
+Таблицы маленькие и почти не меняются, а slug разрешаются при каждой
+записи произведения. Процесс читает таблицу целиком одним запросом
+и помечает копию версией из кеша Django: сохранение и удаление
+категории или жанра меняют версию, и при следующем обращении таблица
+перечитывается. Отсутствующие в копии slug дочитываются одним
+запросом на все. С LocMemCache версия не видна другим процессам,
+поэтому копия живет не дольше SLUG_CACHE_TIMEOUT секунд, а запись
+со ссылкой на уже удаленный объект сбрасывает копию (forget).
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+_lookups = {}
+
+
+class SlugLookup:
+    """slug -> id одной модели."""
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = f'slug-lookup:{model._meta.label_lower}'
+        self.lock = threading.Lock()
+        self.ids = {}
+        self.version = None
+        self.loaded_at = None
+
+    def is_fresh(self, version):
+        return (
+            self.loaded_at is not None
+            and version == self.version
+            and time.monotonic() - self.loaded_at
+            < settings.SLUG_CACHE_TIMEOUT
+        )
+
+    def refresh(self):
+        version = cache.get(self.version_key)
+        if self.is_fresh(version):
+            return
+        ids = dict(self.model.objects.values_list('slug', 'id'))
+        with self.lock:
+            self.ids, self.version = ids, version
+            self.loaded_at = time.monotonic()
+
+    def resolve(self, slugs):
+        """{slug: id} для существующих slug из переданных."""
+        self.refresh()
+        missing = [slug for slug in slugs if slug not in self.ids]
+        if missing:
+            found = dict(self.model.objects.filter(
+                slug__in=missing
+            ).values_list('slug', 'id'))
+            with self.lock:
+                self.ids.update(found)
+        return {slug: self.ids[slug] for slug in slugs if slug in self.ids}
+
+    def forget(self):
+        """Сброс копии процесса: следующее обращение перечитает таблицу."""
+        with self.lock:
+            self.ids = {}
+            self.loaded_at = None
+
+    def invalidate(self):
+        """Новая версия после фиксации транзакции."""
+        def set_version():
+            cache.set(self.version_key, uuid.uuid4().hex, None)
+            self.loaded_at = None
+
+        transaction.on_commit(set_version)
+
+
+def get_slug_lookup(model):
+    if model not in _lookups:
+        _lookups[model] = SlugLookup(model)
+    return _lookups[model]
@@ -0,0 +1,17 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .revocation import is_revoked
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication с проверкой отзыва токена (users.revocation)."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise InvalidToken({
+                'detail': 'Токен отозван.',
+                'code': 'token_revoked',
+            })
+        return token
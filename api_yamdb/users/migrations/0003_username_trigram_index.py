@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:57
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+def create_username_trigram_index(apps, schema_editor):
+    """
+    Триграммный индекс для поиска ?search= (icontains сравнивает
+    UPPER(username) с LIKE '%...%'). Только для Postgres.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX users_user_username_trgm ON users_user '
+            'USING gin (UPPER(username::text) gin_trgm_ops)'
+        )
+
+
+def drop_username_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS users_user_username_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_soft_delete'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(
+            create_username_trigram_index, drop_username_trigram_index
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_username_trigram_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=64, null=True, unique=True, verbose_name='jti')),
+                ('issued_before', models.DateTimeField(null=True, verbose_name='Выданные раньше')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Истекает')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Создана')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Token revocation',
+                'verbose_name_plural': 'Token revocations',
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.contrib.auth.models import AbstractUser
-from django.db.models import CharField, EmailField, TextField
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db.models import (CASCADE, BooleanField, CharField, DateTimeField,
+                              EmailField, ForeignKey, Model, TextField)
 
 from .validators import validate_username
 
@@ -14,6 +15,13 @@ ROLE_PERMISSION = [
 ]
 
 
+class NotDeletedUserManager(UserManager):
+    """Менеджер без пользователей, ожидающих удаления в фоне."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class User(AbstractUser):
     """Модель для пользователей.
 
@@ -24,6 +32,7 @@ class User(AbstractUser):
         last_name: фамилия.
         bio: биография.
         role: роль(права доступа).
+        is_deleted: удален, отзывы и комментарии удаляются в фоне.
     """
 
     username = CharField(
@@ -60,6 +69,10 @@ class User(AbstractUser):
         default=USER,
         blank=True,
     )
+    is_deleted = BooleanField('Удален', default=False)
+
+    objects = NotDeletedUserManager()
+    all_objects = UserManager()
 
     @property
     def is_user(self):
@@ -80,3 +93,38 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+
+class TokenRevocation(Model):
+    """Отозванные JWT, проверяются через users.revocation.
+
+    Attributes:
+        jti: идентификатор отозванного токена.
+        user: пользователь, все токены которого, выданные раньше
+            issued_before, недействительны.
+        issued_before: граница отзыва токенов пользователя.
+        expires_at: после этого времени отозванные записью токены
+            истекли и запись удаляется.
+        created: время записи, по нему процессы дочитывают новые записи.
+    """
+
+    jti = CharField('jti', max_length=64, unique=True, null=True)
+    user = ForeignKey(
+        User,
+        on_delete=CASCADE,
+        null=True,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    issued_before = DateTimeField('Выданные раньше', null=True)
+    expires_at = DateTimeField('Истекает', db_index=True)
+    created = DateTimeField('Создана', auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = ('Token revocation')
+        verbose_name_plural = ('Token revocations')
+
+    def __str__(self):
+        if self.jti:
+            return self.jti
+        return f'{self.user_id} < {self.issued_before}'
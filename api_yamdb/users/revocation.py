@@ -0,0 +1,222 @@
+"""
+Отзыв JWT без запроса к БД на каждый запрос.
+
+TokenRevocation хранит отозванные jti и отметки "токены пользователя,
+выданные раньше issued_before, недействительны". Каждый процесс держит
+в памяти фильтр Блума по jti и словарь отметок пользователей и не чаще
+раза в REVOCATION_REFRESH_SECONDS дочитывает новые записи, раз
+в REVOCATION_REBUILD_SECONDS строит их заново без истекших.
+Совпадение с фильтром проверяется запросом к БД, поэтому ложные
+срабатывания фильтра не отзывают чужие токены.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Q
+from django.utils import timezone as django_timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import TokenRevocation
+
+logger = logging.getLogger(__name__)
+
+# Записи дочитываются с запасом: запись, созданная на сервере с отстающими
+# часами или зафиксированная позже, не будет пропущена.
+REFRESH_OVERLAP = timedelta(seconds=60)
+ISSUED_AT_CLAIM = 'iat'
+
+
+class BloomFilter:
+    """Фильтр Блума с двойным хешированием blake2b."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(
+            8, int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return (
+            (first + index * second) % self.size
+            for index in range(self.hash_count)
+        )
+
+    def add(self, key):
+        for position in self.positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(key)
+        )
+
+
+def add_revocation(jtis, cutoffs, jti=None, user_id=None,
+                   issued_before=None):
+    if jti:
+        jtis.add(jti)
+    if user_id is not None:
+        cutoff = issued_before.timestamp()
+        cutoffs[user_id] = max(cutoff, cutoffs.get(user_id, cutoff))
+
+
+class RevocationList:
+    """Отозванные токены в памяти процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jtis = None
+        self.cutoffs = {}
+        self.synced_until = None
+        self.rebuilt_at = None
+        self.refreshed_at = None
+
+    def needs_refresh(self, now):
+        return (
+            self.refreshed_at is None
+            or now - self.refreshed_at >= settings.REVOCATION_REFRESH_SECONDS
+        )
+
+    def needs_rebuild(self, now):
+        return (
+            self.jtis is None
+            or now - self.rebuilt_at >= settings.REVOCATION_REBUILD_SECONDS
+            or self.jtis.count > self.jtis.capacity
+        )
+
+    def add(self, jti=None, user_id=None, issued_before=None):
+        add_revocation(self.jtis, self.cutoffs, jti, user_id, issued_before)
+
+    def load(self, revocations, jtis, cutoffs):
+        for jti, user_id, issued_before in revocations.values_list(
+            'jti', 'user_id', 'issued_before'
+        ).iterator():
+            add_revocation(jtis, cutoffs, jti, user_id, issued_before)
+
+    def rebuild(self):
+        """
+        Новые фильтр и отметки строятся отдельно и подменяют текущие
+        целиком: потоки, проверяющие токены без блокировки, не видят
+        недостроенного списка.
+        """
+        started = django_timezone.now()
+        TokenRevocation.objects.filter(expires_at__lte=started).delete()
+        revocations = TokenRevocation.objects.all()
+        jtis = BloomFilter(
+            max(settings.REVOCATION_BLOOM_CAPACITY, 2 * revocations.count()),
+            settings.REVOCATION_BLOOM_ERROR_RATE
+        )
+        cutoffs = {}
+        self.load(revocations, jtis, cutoffs)
+        self.jtis, self.cutoffs = jtis, cutoffs
+        self.synced_until = started
+        self.rebuilt_at = time.monotonic()
+
+    def refresh(self):
+        """
+        Дочитывание новых записей. Пока один поток обновляет список,
+        остальные проверяют токены по текущему.
+        """
+        now = time.monotonic()
+        if not self.needs_refresh(now):
+            return
+        if not self.lock.acquire(blocking=self.jtis is None):
+            return
+        try:
+            if not self.needs_refresh(now):
+                return
+            if self.needs_rebuild(now):
+                self.rebuild()
+            else:
+                started = django_timezone.now()
+                self.load(TokenRevocation.objects.filter(
+                    created__gte=self.synced_until - REFRESH_OVERLAP
+                ), self.jtis, self.cutoffs)
+                self.synced_until = started
+            self.refreshed_at = now
+        finally:
+            self.lock.release()
+
+
+revocations = RevocationList()
+
+
+def get_issued_at(token):
+    """
+    Время выдачи токена. Токены без iat, выданные до появления отзыва,
+    считаются выданными за ACCESS_TOKEN_LIFETIME до истечения.
+    """
+    issued_at = token.get(ISSUED_AT_CLAIM)
+    if issued_at is not None:
+        return issued_at
+    return token['exp'] - api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+
+
+def is_revoked_in_db(token):
+    """Проверка по БД, пока список в памяти не построен."""
+    issued_at = datetime.fromtimestamp(get_issued_at(token), timezone.utc)
+    return TokenRevocation.objects.filter(
+        Q(jti=token.get(api_settings.JTI_CLAIM))
+        | Q(
+            user_id=token.get(api_settings.USER_ID_CLAIM),
+            issued_before__gte=issued_at
+        )
+    ).exists()
+
+
+def is_revoked(token):
+    try:
+        revocations.refresh()
+    except DatabaseError:
+        logger.exception('Не удалось обновить список отозванных токенов')
+    jtis, cutoffs = revocations.jtis, revocations.cutoffs
+    if jtis is None:
+        return is_revoked_in_db(token)
+    cutoff = cutoffs.get(token.get(api_settings.USER_ID_CLAIM))
+    if cutoff is not None and get_issued_at(token) <= cutoff:
+        return True
+    jti = token.get(api_settings.JTI_CLAIM)
+    return jti in jtis and TokenRevocation.objects.filter(jti=jti).exists()
+
+
+def revoke_token(token):
+    """Отзыв одного токена до истечения его срока."""
+    jti = token[api_settings.JTI_CLAIM]
+    TokenRevocation.objects.get_or_create(jti=jti, defaults={
+        'expires_at': datetime.fromtimestamp(token['exp'], timezone.utc),
+    })
+    revocations.refresh()
+    revocations.add(jti=jti)
+
+
+def revoke_user_tokens(user):
+    """
+    Отзыв всех токенов пользователя, выданных до текущего момента.
+    iat хранится с точностью до секунды, поэтому токен, полученный
+    в ту же секунду после отзыва, тоже недействителен.
+    """
+    issued_before = django_timezone.now()
+    TokenRevocation.objects.create(
+        user=user,
+        issued_before=issued_before,
+        expires_at=issued_before + max(
+            api_settings.ACCESS_TOKEN_LIFETIME,
+            api_settings.REFRESH_TOKEN_LIFETIME
+        )
+    )
+    revocations.refresh()
+    revocations.add(user_id=user.pk, issued_before=issued_before)
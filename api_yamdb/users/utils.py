@@ -1,15 +1,20 @@
 from django.core.mail import send_mail
 from django.template.loader import get_template
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_to_epoch
+
+from .revocation import ISSUED_AT_CLAIM
 
 
 def get_tokens_for_user(user):
-    """Получение JWT токенов."""
+    """Получение JWT токенов. iat нужен для отзыва всех токенов."""
     refresh = RefreshToken.for_user(user)
+    access = refresh.access_token
+    access[ISSUED_AT_CLAIM] = datetime_to_epoch(access.current_time)
 
     return {
         'refresh': str(refresh),
-        'access': str(refresh.access_token),
+        'access': str(access),
     }
 
 
@@ -1,16 +1,22 @@
+from api.mixins import BatchGetMixin
+from api.pagination import (COUNT_ESTIMATED, ActivityCursorPagination,
+                            CountModePageNumberPagination)
+from api.serializers import UserCommentSerializer, UserReviewSerializer
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
 from rest_framework.mixins import (CreateModelMixin, DestroyModelMixin,
                                    ListModelMixin, RetrieveModelMixin,
                                    UpdateModelMixin)
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-from rest_framework.status import HTTP_200_OK
+from rest_framework.status import HTTP_200_OK, HTTP_204_NO_CONTENT
 from rest_framework.viewsets import GenericViewSet
 from rest_framework_simplejwt.views import TokenObtainPairView
+from reviews.deletion import schedule_deletion
+from reviews.models import Comment, Review
 
 from .models import User
 from .permissions import SuperUserOrAdmin, UserIsAuthenticated
+from .revocation import revoke_token, revoke_user_tokens
 from .serializers import (ReceiveJWTSerializer, SignUpSerializer,
                           UserIsNotAdminSerializer, UserSerializer)
 
@@ -25,11 +31,12 @@ class BaseUserViewSet(CreateModelMixin,
     ...
 
 
-class UserViewSet(BaseUserViewSet):
+class UserViewSet(BatchGetMixin, BaseUserViewSet):
     """
     /users/
 
     GET - Получить список всех пользователей. Права доступа: Администратор.
+          ?usernames=a,b - пользователи по списку username.
     POST - Добавить нового пользователя.
            Права доступа: Администратор
            Поля email и username должны быть уникальными.
@@ -49,15 +56,38 @@ class UserViewSet(BaseUserViewSet):
     PATCH - Изменить данные своей учетной записи
             Права доступа: Любой авторизованный пользователь
             Поля email и username должны быть уникальными.
+
+    /users/me/reviews/, /users/me/comments/
+
+    GET - Отзывы и комментарии своей учетной записи, новые первыми.
+          Права доступа: Любой авторизованный пользователь
+
+    /users/{username}/reviews/
+
+    GET - Отзывы пользователя по username. Права доступа: Администратор
+
+    /users/me/logout/
+
+    POST - Отозвать токен, с которым выполнен запрос.
+           Права доступа: Любой авторизованный пользователь
+
+    /users/{username}/revoke_tokens/
+
+    POST - Отозвать все выданные пользователю токены.
+           Права доступа: Администратор
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
     http_method_names = ('get', 'post', 'patch', 'delete',)
     permission_classes = (SuperUserOrAdmin,)
-    pagination_class = PageNumberPagination
+    pagination_class = CountModePageNumberPagination
+    pagination_count_mode = COUNT_ESTIMATED
     lookup_field = 'username'
     filter_backends = (SearchFilter,)
     search_fields = ('username',)
+    batch_query_param = 'usernames'
+    batch_field = 'username'
+    batch_key_type = str
 
     @action(
         methods=('GET', 'PATCH'),
@@ -79,6 +109,65 @@ class UserViewSet(BaseUserViewSet):
         serializer.save()
         return Response(serializer.data, status=HTTP_200_OK)
 
+    @action(
+        methods=('POST',),
+        detail=False,
+        permission_classes=(UserIsAuthenticated,),
+        url_path='me/logout')
+    def logout(self, request):
+        revoke_token(request.auth)
+        return Response(status=HTTP_204_NO_CONTENT)
+
+    @action(methods=('POST',), detail=True, url_path='revoke_tokens')
+    def revoke_tokens(self, request, username=None):
+        revoke_user_tokens(self.get_object())
+        return Response(status=HTTP_204_NO_CONTENT)
+
+    def perform_destroy(self, instance):
+        schedule_deletion(instance, self.request.user)
+
+    def get_activity_response(self, queryset, serializer_class):
+        """Страница ленты пользователя с keyset-пагинацией."""
+        paginator = ActivityCursorPagination()
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        serializer = serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def get_user_reviews(self, user):
+        return Review.objects.filter(
+            author=user, title__is_deleted=False
+        ).select_related(
+            'title'
+        ).only('id', 'title', 'title__name', 'text', 'score', 'pub_date')
+
+    @action(
+        detail=False,
+        permission_classes=(UserIsAuthenticated,),
+        url_path='me/reviews')
+    def me_reviews(self, request):
+        return self.get_activity_response(
+            self.get_user_reviews(request.user), UserReviewSerializer
+        )
+
+    @action(
+        detail=False,
+        permission_classes=(UserIsAuthenticated,),
+        url_path='me/comments')
+    def me_comments(self, request):
+        comments = Comment.objects.filter(
+            author=request.user, review__title__is_deleted=False
+        ).select_related('review__title').only(
+            'id', 'review', 'review__title', 'review__title__name',
+            'text', 'pub_date'
+        )
+        return self.get_activity_response(comments, UserCommentSerializer)
+
+    @action(detail=True, url_path='reviews')
+    def reviews(self, request, username=None):
+        return self.get_activity_response(
+            self.get_user_reviews(self.get_object()), UserReviewSerializer
+        )
+
 
 class SignUpViewSet(BaseUserViewSet):
     """
@@ -0,0 +1,81 @@
+"""
+Нагрузочный тест каталога YaMDb.
+
+Запускает N потоков, которые в течение заданного времени
+последовательно запрашивают эндпойнты каталога, и выводит
+пропускную способность и задержки.
+
+Пример:
+    python loadtest.py --base-url http://localhost:8000 -c 32 -d 30
+"""
+import argparse
+import itertools
+import threading
+import time
+from urllib.error import URLError
+from urllib.request import urlopen
+
+DEFAULT_PATHS = (
+    '/api/v1/titles/',
+    '/api/v1/titles/?limit=10&offset=10',
+    '/api/v1/titles/1/',
+    '/api/v1/titles/1/reviews/',
+    '/api/v1/categories/',
+    '/api/v1/genres/',
+)
+
+
+def worker(base_url, paths, deadline, latencies, errors, lock):
+    for path in itertools.cycle(paths):
+        if time.monotonic() >= deadline:
+            return
+        started = time.monotonic()
+        try:
+            with urlopen(base_url + path, timeout=30) as response:
+                response.read()
+        except (URLError, OSError):
+            with lock:
+                errors.append(path)
+            continue
+        with lock:
+            latencies.append(time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('-c', '--concurrency', type=int, default=32)
+    parser.add_argument('-d', '--duration', type=int, default=30)
+    parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+    args = parser.parse_args()
+
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(args.base_url, args.paths, deadline,
+                  latencies, errors, lock)
+        )
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if not latencies:
+        print(f'Нет успешных запросов, ошибок: {len(errors)}')
+        return
+    latencies.sort()
+    print(f'запросов: {len(latencies)}, ошибок: {len(errors)}')
+    print(f'RPS: {len(latencies) / args.duration:.1f}')
+    print(', '.join(
+        f'p{percent}: '
+        f'{latencies[len(latencies) * percent // 100] * 1000:.1f} мс'
+        for percent in (50, 95, 99)
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Перезапрос страниц каталога для кеша nginx.
+
+Служебный server nginx передает приложению Host из запроса
+(infra/nginx/default.conf), поэтому приложение должно отправлять
+публичный Host: ссылки next и previous попадают в кеш и отдаются
+всем клиентам. Без доступной базы тесты пропускаются.
+"""
+import re
+from unittest import mock
+
+import pytest
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, transaction
+from django.test import override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from .conftest import infra_dir_path
+
+PUBLIC_BASE_URL = 'http://yamdb.example.com:8000'
+
+
+@pytest.fixture
+def titles(django_db_blocker):
+    from django.conf import settings
+    from reviews.models import Title
+
+    with django_db_blocker.unblock():
+        try:
+            connection.ensure_connection()
+        except DatabaseError as error:
+            pytest.skip(f'База данных недоступна: {error}')
+        finally:
+            connection.close()
+        db_config = setup_databases(
+            verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS}
+        )
+        try:
+            with transaction.atomic():
+                yield Title.objects.bulk_create(
+                    Title(name=f'Произведение {number}', year=2000)
+                    for number in range(
+                        settings.REST_FRAMEWORK['PAGE_SIZE'] + 1
+                    )
+                )
+                transaction.set_rollback(True)
+        finally:
+            teardown_databases(db_config, verbosity=0)
+
+
+def replay(request):
+    """Ответ приложения на перезапрос, как его проксирует nginx."""
+    from rest_framework.test import APIClient
+
+    return APIClient().get(
+        request.selector, HTTP_HOST=request.get_header('Host')
+    )
+
+
+class TestCacheRefresh:
+
+    def test_refresh_server_forwards_host(self):
+        with open(f'{infra_dir_path}/nginx/default.conf') as conf:
+            refresh_server = conf.read().split('listen 8080;')[1]
+
+        assert re.search(
+            r'proxy_set_header\s+Host\s+\$http_host;', refresh_server
+        )
+
+    @override_settings(
+        CACHE_REFRESH_URL='http://nginx:8080', PUBLIC_BASE_URL=PUBLIC_BASE_URL
+    )
+    def test_refreshed_page_links_are_public(self, titles,
+                                             django_db_blocker):
+        from api.caching import refresh_urls
+
+        with mock.patch('api.caching.urlopen') as urlopen:
+            refresh_urls(['/api/v1/titles/'])
+        request = urlopen.call_args[0][0]
+        with django_db_blocker.unblock():
+            response = replay(request)
+
+        assert request.full_url == 'http://nginx:8080/api/v1/titles/'
+        assert response.status_code == 200
+        assert response.data['next'].startswith(
+            f'{PUBLIC_BASE_URL}/api/v1/titles/'
+        )
@@ -0,0 +1,127 @@
+"""
+Число запросов списков отзывов и комментариев.
+
+Для каждого списка запросы считаются на странице из одного объекта
+и на полной странице: число не должно зависеть от размера страницы
+и превышать QUERY_BUDGETS. Тесты работают на любой настроенной базе;
+без доступной базы пропускаются.
+"""
+import pytest
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, transaction
+from django.test.utils import (CaptureQueriesContext, setup_databases,
+                               teardown_databases)
+
+# Объект-родитель, COUNT(*) пагинации и страница с авторами.
+QUERY_BUDGETS = {
+    'reviews': 3,
+    'comments': 3,
+    'comments-review-text': 3,
+}
+URLS = {
+    'reviews': '/api/v1/titles/{title}/reviews/',
+    'comments': '/api/v1/titles/{title}/reviews/{review}/comments/',
+    'comments-review-text': (
+        '/api/v1/titles/{title}/reviews/{review}/comments/'
+        '?include=review_text'
+    ),
+}
+
+
+def seed_database(page_size):
+    """
+    Контексты адресов: single - один отзыв и комментарий,
+    full - полная страница отзывов и комментариев разных авторов.
+    """
+    from reviews.models import Comment, Review, Title
+    from users.models import User
+
+    authors = [
+        User.objects.create(
+            username=f'author{number}', email=f'author{number}@example.com'
+        )
+        for number in range(page_size)
+    ]
+    contexts = {}
+    for name, size in (('single', 1), ('full', page_size)):
+        title = Title.objects.create(name=f'Произведение {name}', year=2000)
+        reviews = [
+            Review.objects.create(
+                title=title, author=author, text='Отзыв', score=5
+            )
+            for author in authors[:size]
+        ]
+        for author in authors[:size]:
+            Comment.objects.create(
+                review=reviews[0], author=author, text='Комментарий'
+            )
+        contexts[name] = {'title': title.pk, 'review': reviews[0].pk}
+    return contexts
+
+
+@pytest.fixture(scope='module')
+def query_contexts(django_db_blocker):
+    from django.conf import settings
+
+    with django_db_blocker.unblock():
+        try:
+            connection.ensure_connection()
+        except DatabaseError as error:
+            pytest.skip(f'База данных недоступна: {error}')
+        finally:
+            connection.close()
+        db_config = setup_databases(
+            verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS}
+        )
+        try:
+            with transaction.atomic():
+                yield seed_database(settings.REST_FRAMEWORK['PAGE_SIZE'])
+                transaction.set_rollback(True)
+        finally:
+            teardown_databases(db_config, verbosity=0)
+
+
+def count_queries(url):
+    from rest_framework.test import APIClient
+
+    with CaptureQueriesContext(connection) as context:
+        response = APIClient().get(url)
+    assert response.status_code == 200, (
+        f'{url} вернул {response.status_code}'
+    )
+    return len(context.captured_queries), response.data['results']
+
+
+class TestQueryCounts:
+
+    @pytest.mark.parametrize('case', sorted(URLS))
+    def test_query_count(self, case, query_contexts, django_db_blocker):
+        with django_db_blocker.unblock():
+            single, single_results = count_queries(
+                URLS[case].format(**query_contexts['single'])
+            )
+            full, full_results = count_queries(
+                URLS[case].format(**query_contexts['full'])
+            )
+
+        assert len(single_results) == 1
+        assert len(full_results) > 1
+        assert single == full, (
+            f'{case}: {single} запросов на странице из одного объекта, '
+            f'{full} на полной странице'
+        )
+        assert full <= QUERY_BUDGETS[case], (
+            f'{case}: {full} запросов, допустимо {QUERY_BUDGETS[case]}'
+        )
+
+    def test_comment_review_text_on_request(self, query_contexts,
+                                            django_db_blocker):
+        context = query_contexts['single']
+        with django_db_blocker.unblock():
+            _, results = count_queries(URLS['comments'].format(**context))
+            _, with_text = count_queries(
+                URLS['comments-review-text'].format(**context)
+            )
+
+        assert results[0]['review'] == context['review']
+        assert 'review_text' not in results[0]
+        assert with_text[0]['review_text'] == 'Отзыв'
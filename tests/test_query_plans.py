@@ -0,0 +1,495 @@
+"""
+Регрессионные тесты планов запросов API.
+
+Тестовая база Postgres заполняется синтетическими данными объемом,
+при котором планировщик выбирает те же планы, что и на рабочей базе
+(SEED_SIZES). Для каждого эндпоинта и каждого поддерживаемого
+параметра запроса выполняется запрос к API, все SELECT-запросы
+проходят через EXPLAIN.
+
+Проверяется, что:
+- по таблицам LARGE_TABLES нет полного сканирования (Seq Scan или
+  Index Scan без условия по индексу, не ограниченного LIMIT), кроме
+  явно разрешенных в случае full_scans;
+- используются индексы из indexes случая - это и есть требования
+  эндпоинта к индексам;
+- набор сканирований совпадает с одобренным в query_plans.json.
+
+Без доступного Postgres тесты пропускаются. Одобрить новые планы:
+    APPROVE_QUERY_PLANS=1 pytest tests/test_query_plans.py
+"""
+import json
+import os
+from collections import namedtuple
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, transaction
+from django.test.utils import (CaptureQueriesContext, setup_databases,
+                               teardown_databases)
+
+from .conftest import root_dir
+
+APPROVED_PLANS_PATH = os.path.join(root_dir, 'tests', 'query_plans.json')
+APPROVE_PLANS = os.getenv('APPROVE_QUERY_PLANS') == '1'
+
+SEED_SIZES = {
+    'users': 50000,
+    'categories': 10,
+    'genres': 50,
+    'titles': 50000,
+    'reviews': 100000,
+    'comments': 100000,
+}
+LARGE_TABLES = {
+    'reviews_change',
+    'reviews_title',
+    'reviews_title_genre',
+    'reviews_review',
+    'reviews_comment',
+    'reviews_scorehistogram',
+    'reviews_similartitle',
+    'users_user',
+}
+SCAN_NODES = {'Seq Scan', 'Index Scan', 'Index Only Scan'}
+
+PlanCase = namedtuple(
+    'PlanCase', ('url', 'client', 'indexes', 'full_scans'),
+    defaults=('anon', frozenset(), frozenset())
+)
+
+# Адреса подставляются из get_plan_context, client - anon, admin или
+# author (автор отзыва из контекста).
+PLAN_CASES = {
+    # count без фильтров - оценка планировщика из pg_class.
+    'titles': PlanCase('/api/v1/titles/'),
+    'titles-name': PlanCase(
+        '/api/v1/titles/?name={title_word}',
+        indexes={'reviews_title_name_trgm'}
+    ),
+    'titles-category': PlanCase(
+        '/api/v1/titles/?category={category}',
+        indexes={'reviews_title_category_id_f88f4f1e'}
+    ),
+    'titles-genre-any': PlanCase(
+        '/api/v1/titles/?genre={genres}&genre_mode=any',
+        indexes={'reviews_title_genre_ids_gin'}
+    ),
+    'titles-genre-all': PlanCase(
+        '/api/v1/titles/?genre={genres}&genre_mode=all',
+        indexes={'reviews_title_genre_ids_gin'}
+    ),
+    'titles-year': PlanCase(
+        '/api/v1/titles/?year={year}',
+        indexes={'reviews_title_year_25306d5f'}
+    ),
+    'titles-include-histogram': PlanCase(
+        '/api/v1/titles/?include=histogram',
+        indexes={'reviews_scorehistogram_pkey'}
+    ),
+    'titles-ids': PlanCase(
+        '/api/v1/titles/?ids={title},2,3',
+        indexes={'reviews_title_pkey'}
+    ),
+    'title': PlanCase(
+        '/api/v1/titles/{title}/',
+        indexes={'reviews_title_pkey'}
+    ),
+    'title-include-reviews': PlanCase(
+        '/api/v1/titles/{title}/?include=reviews,comments',
+        indexes={
+            'reviews_title_pkey', 'reviews_review_title_id_a695a85f',
+            'reviews_comment_review_id_43f1c708'
+        }
+    ),
+    'title-histogram': PlanCase(
+        '/api/v1/titles/{title}/histogram/',
+        indexes={'reviews_scorehistogram_pkey'}
+    ),
+    'title-similar': PlanCase(
+        '/api/v1/titles/{title}/similar/',
+        indexes={'unique similar title rank'}
+    ),
+    'categories': PlanCase('/api/v1/categories/'),
+    'categories-search': PlanCase('/api/v1/categories/?search={category}'),
+    'genres': PlanCase('/api/v1/genres/'),
+    'genres-search': PlanCase('/api/v1/genres/?search={genre}'),
+    'reviews': PlanCase(
+        '/api/v1/titles/{title}/reviews/',
+        indexes={'reviews_review_title_id_a695a85f'}
+    ),
+    'reviews-after': PlanCase(
+        '/api/v1/titles/{title}/reviews/?after={review}',
+        indexes={'reviews_review_title_id_a695a85f'}
+    ),
+    'reviews-ids': PlanCase(
+        '/api/v1/titles/{title}/reviews/?ids={review},2,3',
+        indexes={'reviews_review_title_id_a695a85f'}
+    ),
+    'review': PlanCase(
+        '/api/v1/titles/{title}/reviews/{review}/',
+        indexes={'reviews_review_pkey'}
+    ),
+    'comments': PlanCase(
+        '/api/v1/titles/{title}/reviews/{review}/comments/',
+        indexes={'reviews_comment_review_id_43f1c708'}
+    ),
+    'comments-after': PlanCase(
+        '/api/v1/titles/{title}/reviews/{review}/comments/?after={comment}',
+        indexes={'reviews_comment_review_id_43f1c708'}
+    ),
+    'comment': PlanCase(
+        '/api/v1/titles/{title}/reviews/{review}/comments/{comment}/',
+        indexes={'reviews_comment_review_id_43f1c708'}
+    ),
+    'changes': PlanCase(
+        '/api/v1/changes/',
+        indexes={'change_cursor_idx'}
+    ),
+    'changes-since': PlanCase(
+        '/api/v1/changes/?since=1.1',
+        indexes={'change_cursor_idx'}
+    ),
+    'users': PlanCase('/api/v1/users/', 'admin'),
+    'users-search': PlanCase(
+        '/api/v1/users/?search={username}', 'admin',
+        indexes={'users_user_username_trgm'}
+    ),
+    'users-usernames': PlanCase(
+        '/api/v1/users/?usernames={username},admin', 'admin',
+        indexes={'users_user_username_06e46fe6_like'}
+    ),
+    'user': PlanCase(
+        '/api/v1/users/{username}/', 'admin',
+        indexes={'users_user_username_06e46fe6_like'}
+    ),
+    'user-reviews': PlanCase(
+        '/api/v1/users/{username}/reviews/', 'admin',
+        indexes={'review_author_pub_date_idx'}
+    ),
+    'me-reviews': PlanCase(
+        '/api/v1/users/me/reviews/', 'author',
+        indexes={'review_author_pub_date_idx'}
+    ),
+    'me-comments': PlanCase(
+        '/api/v1/users/me/comments/', 'author',
+        indexes={'comment_author_pub_date_idx'}
+    ),
+    'search-reviews-q': PlanCase(
+        '/api/v1/search/reviews/?q={word}', 'admin',
+        indexes={'reviews_review_search_vector_gin'}
+    ),
+    'search-reviews-title': PlanCase(
+        '/api/v1/search/reviews/?title={title}', 'admin',
+        indexes={'reviews_review_title_id_a695a85f'}
+    ),
+    'search-reviews-author': PlanCase(
+        '/api/v1/search/reviews/?author={username}', 'admin',
+        indexes={'reviews_review_author_id_ed71e278'}
+    ),
+    'search-reviews-dates': PlanCase(
+        '/api/v1/search/reviews/?date_from={date_from}&date_to={date_to}',
+        'admin',
+        indexes={'reviews_review_pub_date_b50c59a9'}
+    ),
+    'search-comments-q': PlanCase(
+        '/api/v1/search/comments/?q={word}', 'admin',
+        indexes={'reviews_comment_search_vector_gin'}
+    ),
+    'search-comments-title': PlanCase(
+        '/api/v1/search/comments/?title={title}', 'admin',
+        indexes={'reviews_comment_review_id_43f1c708'}
+    ),
+    'search-comments-review': PlanCase(
+        '/api/v1/search/comments/?review={review}', 'admin',
+        indexes={'reviews_comment_review_id_43f1c708'}
+    ),
+    'search-comments-author': PlanCase(
+        '/api/v1/search/comments/?author={username}', 'admin',
+        indexes={'reviews_comment_author_id_536ef402'}
+    ),
+    'search-comments-dates': PlanCase(
+        '/api/v1/search/comments/?date_from={date_from}&date_to={date_to}',
+        'admin',
+        indexes={'reviews_comment_pub_date_a5331a62'}
+    ),
+}
+
+SEED_SQL = (
+    """
+    INSERT INTO users_user (
+        id, password, is_superuser, is_staff, is_active, date_joined,
+        username, email, first_name, last_name, bio, role, is_deleted
+    )
+    SELECT g, '', false, false, true, now(), 'u' || md5(g::text),
+        'u' || g || '@example.com', '', '', '', 'user', false
+    FROM generate_series(1, %(users)s) g
+    """,
+    """
+    INSERT INTO reviews_category (id, name, slug)
+    SELECT g, 'Категория ' || g, 'category-' || g
+    FROM generate_series(1, %(categories)s) g
+    """,
+    """
+    INSERT INTO reviews_genre (id, name, slug)
+    SELECT g, 'Жанр ' || g, 'genre-' || g
+    FROM generate_series(1, %(genres)s) g
+    """,
+    """
+    INSERT INTO reviews_title (
+        id, name, year, category_id, description, genre_ids, is_deleted,
+        poster, poster_variants
+    )
+    SELECT g, 'Произведение ' || md5(g::text), 1900 + g %% 120,
+        1 + g %% %(categories)s, '',
+        ARRAY[1 + g %% (%(genres)s - 10)] || CASE WHEN g %% 100 = 0
+            THEN ARRAY[%(genres)s - g / 100 %% 10] ELSE '{}' END,
+        false, '', '{}'
+    FROM generate_series(1, %(titles)s) g
+    """,
+    """
+    INSERT INTO reviews_title_genre (title_id, genre_id)
+    SELECT id, unnest(genre_ids) FROM reviews_title
+    """,
+    """
+    INSERT INTO reviews_review (
+        id, title_id, text, author_id, score, pub_date, is_hidden
+    )
+    SELECT g + 1, 1 + g %% %(titles)s, 'Отзыв ' || md5(g::text),
+        1 + (g / %(titles)s * 1000 + g %% 1000) %% %(users)s, 1 + g %% 10,
+        timestamp '2000-01-01' + g * interval '5 minutes', false
+    FROM generate_series(0, %(reviews)s - 1) g
+    """,
+    """
+    INSERT INTO reviews_comment (
+        id, review_id, text, author_id, pub_date, is_hidden
+    )
+    SELECT g + 1, 1 + g %% %(reviews)s, 'Комментарий ' || md5(g::text),
+        1 + g %% 1000,
+        timestamp '2000-01-01' + g * interval '3 minutes', false
+    FROM generate_series(0, %(comments)s - 1) g
+    """,
+    """
+    INSERT INTO reviews_similartitle (title_id, similar_id, rank, score)
+    SELECT g, 1 + (g + r) %% %(titles)s, r, 1.0 / r
+    FROM generate_series(1, %(titles)s) g, generate_series(1, 3) r
+    """,
+    """
+    INSERT INTO reviews_scorehistogram (
+        title_id, score_1, score_2, score_3, score_4, score_5,
+        score_6, score_7, score_8, score_9, score_10
+    )
+    SELECT title_id,
+        count(*) FILTER (WHERE score = 1), count(*) FILTER (WHERE score = 2),
+        count(*) FILTER (WHERE score = 3), count(*) FILTER (WHERE score = 4),
+        count(*) FILTER (WHERE score = 5), count(*) FILTER (WHERE score = 6),
+        count(*) FILTER (WHERE score = 7), count(*) FILTER (WHERE score = 8),
+        count(*) FILTER (WHERE score = 9), count(*) FILTER (WHERE score = 10)
+    FROM reviews_review GROUP BY title_id
+    """,
+    'ANALYZE',
+)
+
+_observed_plans = {}
+
+
+def seed_database():
+    with connection.cursor() as cursor:
+        for sql in SEED_SQL:
+            cursor.execute(sql, SEED_SIZES)
+
+
+def get_plan_context():
+    """Значения для адресов случаев из заполненной базы."""
+    from reviews.models import Comment
+
+    comment = Comment.objects.select_related(
+        'review__title__category', 'review__author'
+    ).order_by('id').first()
+    review = comment.review
+    return {
+        'title': review.title_id,
+        'title_word': review.title.name.split()[-1][:8],
+        'year': review.title.year,
+        'category': review.title.category.slug,
+        'genres': 'genre-{0},genre-{1}'.format(
+            SEED_SIZES['genres'], SEED_SIZES['genres'] - 1
+        ),
+        'genre': 'genre-1',
+        'review': review.pk,
+        'comment': comment.pk,
+        'author': review.author,
+        'username': review.author.username,
+        'word': review.text.split()[-1],
+        'date_from': '2000-01-01',
+        'date_to': '2000-01-02',
+    }
+
+
+@pytest.fixture(scope='module')
+def plan_context(django_db_blocker):
+    with django_db_blocker.unblock():
+        try:
+            connection.ensure_connection()
+        except DatabaseError as error:
+            pytest.skip(f'База данных недоступна: {error}')
+        finally:
+            connection.close()
+        if connection.vendor != 'postgresql':
+            pytest.skip('Планы запросов проверяются только на Postgres')
+        db_config = setup_databases(
+            verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS}
+        )
+        try:
+            with transaction.atomic():
+                seed_database()
+                yield get_plan_context()
+                transaction.set_rollback(True)
+        finally:
+            teardown_databases(db_config, verbosity=0)
+    if APPROVE_PLANS and _observed_plans:
+        save_approved_plans({**load_approved_plans(), **_observed_plans})
+
+
+def load_approved_plans():
+    try:
+        with open(APPROVED_PLANS_PATH, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_approved_plans(plans):
+    with open(APPROVED_PLANS_PATH, 'w', encoding='utf-8') as file:
+        json.dump(plans, file, ensure_ascii=False, indent=2, sort_keys=True)
+        file.write('\n')
+
+
+def get_client(kind, context):
+    from rest_framework.test import APIClient
+    from users.models import ADMIN, User
+
+    client = APIClient()
+    if kind == 'admin':
+        client.force_authenticate(User(username='admin', role=ADMIN))
+    elif kind == 'author':
+        client.force_authenticate(context['author'])
+    return client
+
+
+Scan = namedtuple('Scan', ('node', 'table', 'index', 'full'))
+
+
+def get_scans(plan, limited=False):
+    """Сканирования из дерева EXPLAIN (FORMAT JSON)."""
+    limited = limited or plan['Node Type'] == 'Limit'
+    scans = []
+    if 'Relation Name' in plan or 'Index Name' in plan:
+        scans.append(Scan(
+            plan['Node Type'],
+            plan.get('Relation Name', ''),
+            plan.get('Index Name', ''),
+            plan['Node Type'] in SCAN_NODES
+            and 'Index Cond' not in plan
+            and not limited,
+        ))
+    for child in plan.get('Plans', ()):
+        scans += get_scans(child, limited)
+    return scans
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return get_scans(plan[0]['Plan'])
+
+
+def collect_scans(url, client):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f'{url} вернул {response.status_code}'
+    )
+    scans = []
+    for query in context.captured_queries:
+        if query['sql'].lstrip().upper().startswith('SELECT'):
+            scans += explain(query['sql'])
+    return scans
+
+
+def describe(scan):
+    text = scan.node
+    if scan.index:
+        text += f' using {scan.index}'
+    if scan.table:
+        text += f' on {scan.table}'
+    return text
+
+
+class TestQueryPlans:
+
+    @pytest.mark.parametrize('case', sorted(PLAN_CASES))
+    def test_query_plan(self, case, plan_context, django_db_blocker):
+        plan_case = PLAN_CASES[case]
+        url = plan_case.url.format(**plan_context)
+        with django_db_blocker.unblock():
+            scans = collect_scans(
+                url, get_client(plan_case.client, plan_context)
+            )
+
+        full_scans = sorted({
+            describe(scan) for scan in scans
+            if scan.full and scan.table in LARGE_TABLES
+            and scan.table not in plan_case.full_scans
+        })
+        assert not full_scans, (
+            f'{url}: полное сканирование больших таблиц {full_scans}, '
+            f'нужен индекс'
+        )
+        missing = plan_case.indexes - {scan.index for scan in scans}
+        assert not missing, (
+            f'{url}: не используются индексы {sorted(missing)}'
+        )
+
+        observed = sorted(set(map(describe, scans)))
+        if APPROVE_PLANS:
+            _observed_plans[case] = observed
+            return
+        approved = load_approved_plans().get(case)
+        assert observed == approved, (
+            f'{url}: план изменился.\n'
+            f'Одобрено: {approved}\nСейчас: {observed}\n'
+            f'Если изменение ожидаемо: '
+            f'APPROVE_QUERY_PLANS=1 pytest tests/test_query_plans.py'
+        )
+
+    @pytest.mark.parametrize('prefix, view_path', [
+        ('/api/v1/titles/', 'api.views.TitleViewSet'),
+        ('/api/v1/categories/', 'api.views.CategoryViewSet'),
+        ('/api/v1/genres/', 'api.views.GenreViewSet'),
+        ('/api/v1/users/', 'users.views.UserViewSet'),
+        ('/api/v1/search/reviews/', 'api.views.ReviewSearchViewSet'),
+        ('/api/v1/search/comments/', 'api.views.CommentSearchViewSet'),
+    ])
+    def test_every_query_param_has_plan_case(self, prefix, view_path):
+        from django.utils.module_loading import import_string
+
+        view = import_string(view_path)
+        params = set()
+        if getattr(view, 'filterset_class', None) is not None:
+            params |= set(view.filterset_class.base_filters)
+        if getattr(view, 'search_fields', None):
+            params.add('search')
+        covered = set()
+        for plan_case in PLAN_CASES.values():
+            parts = urlsplit(plan_case.url)
+            if parts.path == prefix:
+                covered |= {name for name, _ in parse_qsl(parts.query)}
+        missing = params - covered
+        assert not missing, (
+            f'Для параметров {prefix} {sorted(missing)} нет случаев '
+            f'в PLAN_CASES: добавьте случай и требования к индексам'
+        )
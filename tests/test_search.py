@@ -0,0 +1,52 @@
+"""
+Фрагменты с подсветкой в ответах поиска по отзывам и комментариям.
+
+Текст пишут пользователи: в headline он должен быть экранирован,
+теги <b> - только вокруг совпадений.
+"""
+from types import SimpleNamespace
+
+SCRIPT_TEXT = 'Фильм <script>alert("xss")</script> отличный, смотреть всем'
+
+
+def get_headline(obj, query):
+    from api.serializers import HeadlineMixin
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.views import APIView
+
+    request = APIView().initialize_request(
+        APIRequestFactory().get('/', {'q': query})
+    )
+    return HeadlineMixin(context={'request': request}).get_headline(obj)
+
+
+class TestHeadline:
+
+    def test_fallback_escapes_text(self):
+        headline = get_headline(SimpleNamespace(text=SCRIPT_TEXT), 'отличный')
+
+        assert '<script>' not in headline
+        assert '&lt;script&gt;' in headline
+        assert '<b>отличный</b>' in headline
+
+    def test_fallback_escapes_matched_markup(self):
+        headline = get_headline(SimpleNamespace(text=SCRIPT_TEXT), 'script')
+
+        assert '<script>' not in headline
+        assert '&lt;<b>script</b>&gt;' in headline
+
+    def test_postgres_headline_is_escaped(self):
+        from reviews.search import MARK_START, MARK_STOP
+
+        obj = SimpleNamespace(
+            text=SCRIPT_TEXT,
+            headline=(
+                f'Фильм <script>alert("xss")</script> '
+                f'{MARK_START}отличный{MARK_STOP}, смотреть всем'
+            )
+        )
+        headline = get_headline(obj, 'отличный')
+
+        assert '<script>' not in headline
+        assert '&lt;/script&gt;' in headline
+        assert '<b>отличный</b>' in headline
@@ -0,0 +1,74 @@
+"""
+Расчет похожих произведений.
+
+Произведение, ожидающее удаления в фоне, не участвует в расчете,
+хотя его отзывы и жанры удаляются позже. Без доступной базы тесты
+пропускаются.
+"""
+import pytest
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, transaction
+from django.test.utils import setup_databases, teardown_databases
+
+
+def seed_database():
+    """Три произведения одного жанра с отзывами двух авторов."""
+    from reviews.models import Genre, Review, Title
+    from users.models import User
+
+    genre = Genre.objects.create(name='Драма', slug='drama')
+    authors = [
+        User.objects.create(
+            username=f'author{number}', email=f'author{number}@example.com'
+        )
+        for number in range(2)
+    ]
+    titles = []
+    for number in range(3):
+        title = Title.objects.create(name=f'Произведение {number}', year=2000)
+        title.genre.set([genre])
+        for author in authors:
+            Review.objects.create(
+                title=title, author=author, text='Отзыв', score=8
+            )
+        titles.append(title)
+    return titles
+
+
+@pytest.fixture
+def titles(django_db_blocker):
+    with django_db_blocker.unblock():
+        try:
+            connection.ensure_connection()
+        except DatabaseError as error:
+            pytest.skip(f'База данных недоступна: {error}')
+        finally:
+            connection.close()
+        db_config = setup_databases(
+            verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS}
+        )
+        try:
+            with transaction.atomic():
+                yield seed_database()
+                transaction.set_rollback(True)
+        finally:
+            teardown_databases(db_config, verbosity=0)
+
+
+class TestSimilarTitles:
+
+    def test_deleted_title_is_skipped(self, titles, django_db_blocker):
+        from reviews.deletion import schedule_deletion
+        from reviews.models import SimilarTitle
+        from reviews.similarity import build_similar_titles
+
+        deleted = titles[0]
+        with django_db_blocker.unblock():
+            schedule_deletion(deleted)
+            built = build_similar_titles()
+            similar = set(
+                SimilarTitle.objects.values_list('title_id', 'similar_id')
+            )
+
+        assert built == len(titles) - 1
+        assert similar
+        assert all(deleted.pk not in pair for pair in similar)